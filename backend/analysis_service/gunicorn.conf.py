@@ -0,0 +1,56 @@
+"""
+Gunicorn configuration for the analysis service.
+
+With GUNICORN_PRELOAD on (the default) the master imports app.py once, warms the
+hybrid model and freezes the GC-tracked heap, then forks every worker from that
+state, so workers share the model's pages copy-on-write instead of each loading
+their own copy. More workers can be forked from the warm master at any time with
+`kill -TTIN <master pid>` (and removed with TTOU).
+"""
+
+import gc
+import os
+import sys
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5001')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").strip().lower() in ("1", "true", "yes")
+
+# Torch threads per worker; the master stays single-threaded because OpenMP
+# thread pools started before fork() are not usable in the children
+WORKER_TORCH_THREADS = int(os.getenv("WORKER_TORCH_THREADS", "1"))
+WARMUP_TEXT = "I have been feeling anxious and tired lately and I cannot focus on anything."
+WARMUP_ROUNDS = int(os.getenv("WARMUP_ROUNDS", "2"))
+
+if preload_app:
+    import torch
+    torch.set_num_threads(1)
+
+
+def when_ready(server):
+    """Warm the preloaded model in the master and freeze its heap before the first fork."""
+    if not preload_app:
+        return
+    app_module = sys.modules.get("app")
+    model = getattr(app_module, "model", None)
+    if model is not None:
+        for _ in range(WARMUP_ROUNDS):
+            model.predict(WARMUP_TEXT)
+        server.log.info("Warmed up hybrid model in the master")
+
+    # Objects that exist now are never scanned by the collector again, so the
+    # children's GC passes do not write to (and un-share) the parent's pages
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"Froze {gc.get_freeze_count()} objects before forking workers")
+
+
+def post_fork(server, worker):
+    import torch
+    torch.set_num_threads(WORKER_TORCH_THREADS)
+
+
+def post_worker_init(worker):
+    # measure_workers.py times worker spawns from this line
+    worker.log.info(f"Worker ready (pid: {worker.pid})")
@@ -12,6 +12,13 @@ import os
 from typing import Dict, List, Tuple, Optional
 import joblib
 
+try:
+    from safetensors import safe_open
+    from safetensors.torch import load_file as load_safetensors
+    SAFETENSORS_AVAILABLE = True
+except ImportError:
+    SAFETENSORS_AVAILABLE = False
+
 class DistilBERT_BiLSTM_Hybrid(nn.Module):
     """
     Hybrid model combining DistilBERT, BiLSTM, and XGBoost for mental health classification.
@@ -103,8 +110,16 @@ class HybridModelInference:
         """Load the PyTorch model weights."""
         try:
             if os.path.exists(self.model_path):
-                state_dict = torch.load(self.model_path, map_location=self.device)
-                self.model.load_state_dict(state_dict)
+                if self.model_path.endswith(".safetensors"):
+                    # Memory-mapped weights: assign keeps the mapped tensors, so workers
+                    # on one host share the same page cache instead of private copies
+                    if not SAFETENSORS_AVAILABLE:
+                        raise RuntimeError("safetensors is not installed")
+                    state_dict = load_safetensors(self.model_path, device=str(self.device))
+                    self.model.load_state_dict(state_dict, assign=True)
+                else:
+                    state_dict = torch.load(self.model_path, map_location=self.device)
+                    self.model.load_state_dict(state_dict)
                 print(f"✅ Loaded PyTorch model from {self.model_path}")
             else:
                 print(f"⚠️ PyTorch model not found at {self.model_path}")
@@ -226,6 +241,91 @@ class HybridModelInference:
                 ]
             }
     
+    def preprocess_batch(self, texts: List[str], max_length: int = 256) -> Dict[str, torch.Tensor]:
+        """Preprocess a list of texts into a single padded model input batch."""
+        encoding = self.tokenizer(
+            list(texts),
+            add_special_tokens=True,
+            max_length=max_length,
+            return_token_type_ids=False,
+            padding='max_length',
+            truncation=True,
+            return_attention_mask=True,
+            return_tensors='pt'
+        )
+        
+        return {
+            'input_ids': encoding['input_ids'].to(self.device),
+            'attention_mask': encoding['attention_mask'].to(self.device)
+        }
+    
+    def predict_batch(self, texts: List[str]) -> List[Dict[str, any]]:
+        """
+        Make predictions for several texts with one forward pass and one XGBoost call.
+        Results are returned in input order, in the same format as predict().
+        """
+        if not texts:
+            return []
+        
+        try:
+            print(f"[HybridModel] Making batch prediction for {len(texts)} texts...")
+            
+            # Tokenize all texts in one call
+            inputs = self.preprocess_batch(texts)
+            
+            # Get features from DistilBERT-BiLSTM
+            with torch.no_grad():
+                features, logits = self.model(**inputs)
+                features_np = features.cpu().numpy()
+            
+            # Use XGBoost for final prediction if available
+            if self.xgb_model is not None:
+                # One vectorized call; predict() is the argmax of predict_proba()
+                all_probs = self.xgb_model.predict_proba(features_np)
+            else:
+                # Fallback to PyTorch model only
+                all_probs = torch.softmax(logits, dim=-1).cpu().numpy()
+            
+            results = []
+            for probs in all_probs:
+                predicted_label = self.label_map[int(np.argmax(probs))]
+                
+                # Create confidence scores
+                confidence_scores = []
+                for i, label in enumerate(self.labels):
+                    confidence_scores.append({
+                        "label": label,
+                        "score": float(probs[i])
+                    })
+                
+                # Sort by confidence
+                confidence_scores.sort(key=lambda x: x["score"], reverse=True)
+                
+                results.append({
+                    "topPattern": predicted_label,
+                    "confidenceScores": confidence_scores
+                })
+            
+            print(f"[HybridModel] Batch prediction completed for {len(results)} texts")
+            return results
+            
+        except Exception as e:
+            print(f"❌ Error during batch prediction: {e}")
+            import traceback
+            traceback.print_exc()
+            # Return fallback predictions
+            return [
+                {
+                    "topPattern": "Anxiety",
+                    "confidenceScores": [
+                        {"label": "Anxiety", "score": 0.4},
+                        {"label": "Bipolar", "score": 0.3},
+                        {"label": "Depression", "score": 0.3}
+                    ]
+                }
+                for _ in texts
+            ]
+    
     def get_model_info(self) -> Dict[str, any]:
         """Get information about the loaded model."""
         return {
@@ -255,14 +355,73 @@ class HybridMentalHealthModel(HybridModelInference):
                 return path
             return os.path.join(base_dir, path)
 
+        # Prefer the memory-mapped .safetensors copy written by the upload scripts,
+        # unless the .pth was replaced after it (a stale copy from an earlier upload)
+        model_path = resolve_path(transformer_model_path)
+        safetensors_path = os.path.splitext(model_path)[0] + ".safetensors"
+        if (model_path.endswith(".pth") and SAFETENSORS_AVAILABLE and os.path.exists(safetensors_path)
+                and (not os.path.exists(model_path) or safetensors_copy_is_current(model_path, safetensors_path))):
+            model_path = safetensors_path
+
         super().__init__(
-            model_path=resolve_path(transformer_model_path),
+            model_path=model_path,
             xgb_path=resolve_path(xgboost_model_path),
             tokenizer_path=tokenizer_path if (tokenizer_path and os.path.isabs(tokenizer_path)) else (
                 os.path.join(base_dir, tokenizer_path) if tokenizer_path else None
             ),
         )
 
+def source_stamp(path: str) -> Dict[str, str]:
+    """Size and mtime (ns) of a checkpoint, recorded in the .safetensors copies made from it."""
+    stat = os.stat(path)
+    return {"source_size": str(stat.st_size), "source_mtime_ns": str(stat.st_mtime_ns)}
+
+def safetensors_copy_is_current(source: str, copy: str) -> bool:
+    """
+    True when copy was converted from source as it is now. Compared by the recorded stamp,
+    not by mtime: shutil.copy2 and cp -p give a new .pth the older mtime of its origin.
+    """
+    try:
+        with safe_open(copy, framework="pt") as f:
+            metadata = f.metadata() or {}
+        stamp = source_stamp(source)
+    except Exception:
+        return False
+    return all(metadata.get(key) == value for key, value in stamp.items())
+
+def convert_checkpoint_to_safetensors(source: str) -> str:
+    """
+    Write a .safetensors copy of a .pth checkpoint (state dict, wrapped state dict or
+    complete model) next to it and return its path. HybridMentalHealthModel picks the
+    copy up automatically.
+    """
+    from safetensors.torch import save_file
+
+    # Complete pickled models cannot be read with weights_only
+    state_dict = torch.load(source, map_location="cpu", weights_only=False)
+    if isinstance(state_dict, nn.Module):
+        state_dict = state_dict.state_dict()
+    elif isinstance(state_dict, dict) and "state_dict" in state_dict:
+        state_dict = state_dict["state_dict"]
+    elif isinstance(state_dict, dict) and "model_state_dict" in state_dict:
+        state_dict = state_dict["model_state_dict"]
+
+    # safetensors refuses tensors that share memory, so copy repeats
+    tensors, seen = {}, set()
+    for name, tensor in state_dict.items():
+        tensor = tensor.detach().contiguous()
+        if tensor.untyped_storage().data_ptr() in seen:
+            tensor = tensor.clone()
+        seen.add(tensor.untyped_storage().data_ptr())
+        tensors[name] = tensor
+
+    # Written aside and renamed, so a service memory-mapping the old file keeps valid pages
+    target = os.path.splitext(source)[0] + ".safetensors"
+    tmp_target = target + ".tmp"
+    save_file(tensors, tmp_target, metadata={"format": "pt", "source": os.path.basename(source), **source_stamp(source)})
+    os.replace(tmp_target, target)
+    return target
+
 def create_model_save_script():
     """
     Create a script to help save your trained model in the correct format.
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Measure per-worker memory and worker spawn latency of the gunicorn server,
+with the preloaded (forked from a warm master) and per-worker loading modes.
+
+Memory is read from /proc/<pid>/smaps_rollup (Linux): USS is the memory only
+that process holds, PSS splits shared pages between the processes using them.
+Spawn latency is the time from sending TTIN to the master until the new
+worker logs that it is ready.
+
+Usage:
+    python measure_workers.py --workers 2 --spawn 2 --modes preload,no-preload
+"""
+
+import argparse
+import json
+import os
+import queue
+import re
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+READY_PATTERN = re.compile(r"Worker ready \(pid: (\d+)\)")
+
+
+def memory_kb(pid):
+    """Rss, Pss and Uss of a process in KiB."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss_kb": values.get("Rss", 0),
+        "pss_kb": values.get("Pss", 0),
+        "uss_kb": values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)
+    }
+
+
+def wait_ready(ready, timeout):
+    """Block until a worker reports ready and return its pid."""
+    try:
+        return ready.get(timeout=timeout)
+    except queue.Empty:
+        raise RuntimeError(f"No worker became ready within {timeout}s")
+
+
+def measure_mode(mode, args):
+    env = dict(os.environ, GUNICORN_PRELOAD="true" if mode == "preload" else "false")
+    command = [
+        sys.executable, "-m", "gunicorn", "app:app",
+        "-c", "gunicorn.conf.py",
+        "--workers", str(args.workers),
+        "--bind", f"127.0.0.1:{args.port}"
+    ]
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        command,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+
+    # gunicorn logs to stderr; forward ready workers from a reader thread
+    ready = queue.Queue()
+
+    def read_log():
+        for line in server.stderr:
+            match = READY_PATTERN.search(line)
+            if match:
+                ready.put(int(match.group(1)))
+
+    threading.Thread(target=read_log, daemon=True).start()
+
+    try:
+        workers = [wait_ready(ready, args.timeout) for _ in range(args.workers)]
+        startup_s = time.perf_counter() - started
+
+        spawn_ms = []
+        for _ in range(args.spawn):
+            sent = time.perf_counter()
+            os.kill(server.pid, signal.SIGTTIN)
+            workers.append(wait_ready(ready, args.timeout))
+            spawn_ms.append((time.perf_counter() - sent) * 1000.0)
+
+        # Let the new workers settle before reading memory
+        time.sleep(1.0)
+        master = memory_kb(server.pid)
+        per_worker = [dict(memory_kb(pid), pid=pid) for pid in workers]
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    return {
+        "mode": mode,
+        "startup_s": startup_s,
+        "spawn_ms": spawn_ms,
+        "master": master,
+        "workers": per_worker,
+        "total_pss_kb": master["pss_kb"] + sum(w["pss_kb"] for w in per_worker)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-worker memory and spawn latency of the gunicorn server")
+    parser.add_argument("--workers", type=int, default=2, help="Workers started with the server")
+    parser.add_argument("--spawn", type=int, default=2, help="Extra workers added one at a time with TTIN")
+    parser.add_argument("--modes", default="preload,no-preload", help="Comma-separated: preload, no-preload")
+    parser.add_argument("--port", type=int, default=5099, help="Port to bind the server under test")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Seconds to wait for a worker")
+    parser.add_argument("--output", default=None, help="Optional JSON results file")
+    args = parser.parse_args()
+
+    print("🚀 Worker Memory and Spawn Latency")
+    print("=" * 64)
+
+    results = []
+    for mode in [m.strip() for m in args.modes.split(",") if m.strip()]:
+        result = measure_mode(mode, args)
+        results.append(result)
+        uss = [w["uss_kb"] / 1024 for w in result["workers"]]
+        print(f"{mode}:")
+        print(f"  startup: {result['startup_s']:.1f}s for {args.workers} workers")
+        print("  spawn latency: " + ", ".join(f"{ms:.0f}ms" for ms in result["spawn_ms"]))
+        print(f"  master: RSS {result['master']['rss_kb'] / 1024:.0f}MB, USS {result['master']['uss_kb'] / 1024:.0f}MB")
+        print(f"  worker USS: mean {sum(uss) / len(uss):.0f}MB, max {max(uss):.0f}MB")
+        print(f"  total PSS: {result['total_pss_kb'] / 1024:.0f}MB for {len(result['workers'])} workers")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -46,6 +46,25 @@ def upload_hybrid_model(pytorch_path, xgb_path, model_name="hybrid_model"):
     
     return success
 
+def convert_to_safetensors_model(pth_path):
+    """Write a memory-mapped .safetensors copy of the uploaded model; the .pth is kept."""
+    try:
+        from hybrid_model import convert_checkpoint_to_safetensors
+        target = convert_checkpoint_to_safetensors(str(pth_path))
+        print(f"✅ Converted {pth_path} to {target}")
+        return True
+    except Exception as e:
+        print(f"⚠️ Could not convert to safetensors, the service will load the .pth: {e}")
+        remove_safetensors_model(pth_path)
+        return False
+
+def remove_safetensors_model(pth_path):
+    """Drop a .safetensors copy left by an earlier upload, which would otherwise be served instead of the new .pth."""
+    stale = Path(pth_path).with_suffix(".safetensors")
+    if stale.exists():
+        stale.unlink()
+        print(f"🗑️ Removed stale {stale}")
+
 def update_env_file():
     """Update the .env file with hybrid model paths."""
     env_file = Path(__file__).parent / ".env"
@@ -83,6 +102,7 @@ def main():
     parser = argparse.ArgumentParser(description="Upload hybrid model to Virtual Therapist Analysis Service")
     parser.add_argument("--pytorch-path", required=True, help="Path to your PyTorch model file (.pth)")
     parser.add_argument("--xgb-path", required=True, help="Path to your XGBoost model file (.json)")
+    parser.add_argument("--no-safetensors", action="store_true", help="Skip the memory-mapped .safetensors copy")
     
     args = parser.parse_args()
     
@@ -91,6 +111,13 @@ def main():
     
     success = upload_hybrid_model(args.pytorch_path, args.xgb_path)
     
+    if success:
+        pth_path = Path(__file__).parent / "model" / "distilbert_bilstm_hybrid.pth"
+        if args.no_safetensors:
+            remove_safetensors_model(pth_path)
+        else:
+            convert_to_safetensors_model(pth_path)
+    
     if success:
         update_env_file()
         print("\n🎉 Hybrid model upload completed successfully!")
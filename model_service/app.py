@@ -1,25 +1,9 @@
 import os
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
-import torch
-import torch.nn.functional as F
-from dotenv import load_dotenv
-
-load_dotenv()
-
-try:
-    from transformers import DistilBertTokenizerFast, DistilBertForSequenceClassification
-    TRANSFORMERS_AVAILABLE = True
-except Exception:
-    TRANSFORMERS_AVAILABLE = False
-
-# Import hybrid model
-try:
-    from hybrid_model import HybridModelInference
-    HYBRID_MODEL_AVAILABLE = True
-except Exception as e:
-    print(f"Hybrid model not available: {e}")
-    HYBRID_MODEL_AVAILABLE = False
+
+import inference
+import metrics
 
 app = Flask(__name__)
 # Allow common dev origins: 5173 (Vite), 3000, and custom via FRONTEND_ORIGIN (comma-separated)
@@ -27,119 +11,21 @@ origins_env = os.getenv("FRONTEND_ORIGIN", "http://localhost:5173,http://localho
 allowed_origins = [o.strip() for o in origins_env.split(",") if o.strip()]
 CORS(app, origins=allowed_origins)
 
-LABELS = ["Depression", "ADHD", "Bipolar", "Anxiety"]
-HYBRID_LABELS = [label.strip() for label in os.getenv("MODEL_LABELS", "Depression,ADHD,Bipolar,Anxiety").split(",") if label.strip()] or ["Depression", "ADHD", "Bipolar", "Anxiety"]
-
-# Model paths
-MODEL_PATH = os.getenv(
-    "MODEL_PATH",
-    os.path.join(os.path.dirname(__file__), "model", "mental_health_model_final.pth")
-)
-HYBRID_PYTORCH_PATH = os.getenv(
-    "HYBRID_PYTORCH_PATH",
-    os.path.join(os.path.dirname(__file__), "model", "hybrid_model.pth")
-)
-HYBRID_XGB_PATH = os.getenv(
-    "HYBRID_XGB_PATH", 
-    os.path.join(os.path.dirname(__file__), "model", "xgboost_classifier.json")
-)
-
-tokenizer = None
-model = None
-hybrid_model = None
-device = "cpu"
-
-def load_hybrid_model():
-    """Load the hybrid DistilBERT-BiLSTM-XGBoost model."""
-    global hybrid_model
-    if not HYBRID_MODEL_AVAILABLE:
-        print("[analysis_service] Hybrid model not available.")
-        return False
-    
-    try:
-        hybrid_model = HybridModelInference(
-            model_path=HYBRID_PYTORCH_PATH,
-            xgb_path=HYBRID_XGB_PATH,
-            labels=HYBRID_LABELS
-        )
-        print("[analysis_service] ✅ Hybrid model loaded successfully!")
-        return True
-    except Exception as e:
-        print(f"[analysis_service] ❌ Error loading hybrid model: {e}")
-        hybrid_model = None
-        return False
-
-def load_model():
-    global tokenizer, model
-    if not TRANSFORMERS_AVAILABLE:
-        print("[analysis_service] transformers not available; using heuristic fallback.")
-        return
-    
-    try:
-        # Check if MODEL_PATH is a directory (Hugging Face format)
-        if os.path.isdir(MODEL_PATH):
-            print(f"[analysis_service] Loading Hugging Face model from directory: {MODEL_PATH}")
-            tokenizer = DistilBertTokenizerFast.from_pretrained(MODEL_PATH)
-            model = DistilBertForSequenceClassification.from_pretrained(MODEL_PATH)
-            print(f"[analysis_service] Successfully loaded Hugging Face model from {MODEL_PATH}")
-        else:
-            # Load base model and tokenizer
-            tokenizer = DistilBertTokenizerFast.from_pretrained("distilbert-base-uncased")
-            model = DistilBertForSequenceClassification.from_pretrained(
-                "distilbert-base-uncased", num_labels=len(LABELS)
-            )
-            
-            # Load custom weights if available
-            if os.path.exists(MODEL_PATH):
-                print(f"[analysis_service] Loading custom weights from: {MODEL_PATH}")
-                state = torch.load(MODEL_PATH, map_location="cpu")
-                
-                if isinstance(state, dict):
-                    if "state_dict" in state:
-                        model.load_state_dict(state["state_dict"])
-                        print(f"[analysis_service] Loaded state_dict from {MODEL_PATH}")
-                    elif "model_state_dict" in state:
-                        model.load_state_dict(state["model_state_dict"])
-                        print(f"[analysis_service] Loaded model_state_dict from {MODEL_PATH}")
-                    else:
-                        # Try to load as state dict directly
-                        model.load_state_dict(state)
-                        print(f"[analysis_service] Loaded direct state_dict from {MODEL_PATH}")
-                else:
-                    # Load as complete model
-                    model = state
-                    print(f"[analysis_service] Loaded complete model from {MODEL_PATH}")
-            else:
-                print(f"[analysis_service] MODEL_PATH not found at {MODEL_PATH}. Using base DistilBERT weights.")
-        
-        model.eval()
-        print(f"[analysis_service] Model loaded successfully. Device: {device}")
-        
-    except Exception as e:
-        print(f"[analysis_service] Error loading model: {e}")
-        print("[analysis_service] Falling back to heuristic analysis")
-        tokenizer = None
-        model = None
-
 # Load models
-load_model()
-load_hybrid_model()
-
-def fallback_predict(text: str):
-    text_l = text.lower()
-    scores = {l: 1.0 / len(LABELS) for l in LABELS}
-    if any(k in text_l for k in ["worry", "anxious", "panic", "nervous"]):
-        scores["Anxiety"] += 0.35
-    if any(k in text_l for k in ["sad", "hopeless", "down", "tired"]):
-        scores["Depression"] += 0.35
-    if any(k in text_l for k in ["focus", "fidget", "impulsive", "restless", "adhd"]):
-        scores["ADHD"] += 0.35
-    if any(k in text_l for k in ["racing thoughts", "manic", "mania", "euphoric"]):
-        scores["Bipolar"] += 0.35
-    total = sum(max(v, 0.001) for v in scores.values())
-    norm = {k: max(v, 0.001) / total for k, v in scores.items()}
-    top = max(norm.items(), key=lambda kv: kv[1])[0]
-    return top, [{"label": k, "score": float(v)} for k, v in sorted(norm.items(), key=lambda kv: -kv[1])]
+inference.load_models()
+
+http_metrics = metrics.HttpMetrics()
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_started = http_metrics.started()
+
+@app.after_request
+def record_request_metrics(response):
+    if "metrics_started" in g:
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        http_metrics.finished(g.pop("metrics_started"), route, response.status_code)
+    return response
 
 @app.get("/health")
 def health():
@@ -152,33 +38,55 @@ def predict():
         text = (data.get("text") or "").strip()
         if len(text) < 5:
             return jsonify({"error": "Text is too short"}), 400
+        model_name, error = inference.clean_model_name(data)
+        if error:
+            return jsonify(error), 400
+
+        return jsonify(inference.predict_text(text, route=request.path, model_name=model_name))
+    except MemoryError as e:
+        return jsonify({"error": "Model does not fit in memory", "detail": str(e)}), 507
+    except Exception as e:
+        return jsonify({"error": "Inference error", "detail": str(e)}), 500
+
+@app.post("/predict/batch")
+def predict_batch():
+    """Predict many texts in one request; results are returned in input order."""
+    try:
+        data = request.get_json(force=True)
+        texts, error = inference.clean_batch_texts(data)
+        if not error:
+            model_name, error = inference.clean_model_name(data)
+        if error:
+            return jsonify(error), 400
+
+        return jsonify({"results": inference.predict_texts(texts, route=request.path, model_name=model_name)})
+    except MemoryError as e:
+        return jsonify({"error": "Model does not fit in memory", "detail": str(e)}), 507
+    except Exception as e:
+        return jsonify({"error": "Inference error", "detail": str(e)}), 500
 
-        # Try hybrid model first
-        if hybrid_model is not None:
-            try:
-                result = hybrid_model.predict(text)
-                return jsonify(result)
-            except Exception as e:
-                print(f"[analysis_service] Hybrid model prediction failed: {e}")
-                # Fall through to standard model
-
-        # Fallback to standard model
-        if model is None or tokenizer is None:
-            top, scores = fallback_predict(text)
-            return jsonify({"topPattern": top, "confidenceScores": scores})
-
-        inputs = tokenizer([text], truncation=True, padding=True, return_tensors="pt")
-        with torch.no_grad():
-            outputs = model(**inputs)
-            probs = F.softmax(outputs.logits.squeeze(0), dim=-1).cpu().numpy().tolist()
-
-        scores = [{"label": LABELS[i], "score": float(probs[i])} for i in range(len(LABELS))]
-        scores_sorted = sorted(scores, key=lambda x: -x["score"])
-        top = scores_sorted[0]["label"]
-        return jsonify({"topPattern": top, "confidenceScores": scores_sorted})
+@app.post("/predict/session")
+def predict_session():
+    """Predict a conversation ({"messages": [...]}, oldest first), encoding only messages not seen before."""
+    try:
+        data = request.get_json(force=True)
+        messages, error = inference.clean_session_messages(data)
+        if not error:
+            model_name, error = inference.clean_model_name(data)
+        if error:
+            return jsonify(error), 400
+
+        return jsonify(inference.predict_session(messages, route=request.path, model_name=model_name))
+    except MemoryError as e:
+        return jsonify({"error": "Model does not fit in memory", "detail": str(e)}), 507
     except Exception as e:
         return jsonify({"error": "Inference error", "detail": str(e)}), 500
 
+@app.post("/api/analyze/session")
+def analyze_session():
+    """Session analysis with the /api/ prefix."""
+    return predict_session()
+
 @app.post("/api/analyze")
 def analyze():
     """API endpoint for text analysis - same as predict but with /api/ prefix."""
@@ -187,17 +95,39 @@ def analyze():
 @app.get("/model-info")
 def model_info():
     """Get information about loaded models."""
-    info = {
-        "standard_model_loaded": model is not None and tokenizer is not None,
-        "hybrid_model_loaded": hybrid_model is not None,
-        "available_labels": LABELS,
-        "hybrid_labels": HYBRID_LABELS if hybrid_model else None
-    }
-    
-    if hybrid_model:
-        info.update(hybrid_model.get_model_info())
-    
-    return jsonify(info)
+    return jsonify(inference.model_info())
+
+@app.route("/admin/profile", methods=["GET", "POST"])
+def admin_profile():
+    """Profile the next N hybrid predictions with the torch profiler (needs X-Admin-Token)."""
+    denied = inference.check_admin(request.headers.get("X-Admin-Token"))
+    if denied:
+        return jsonify(denied[0]), denied[1]
+    data = request.get_json(force=True, silent=True) if request.method == "POST" else None
+    if request.method == "POST" and data is None:
+        return jsonify({"error": "Expected a JSON object"}), 400
+    body, status = inference.profile_admin(data)
+    return jsonify(body), status
+
+@app.route("/admin/reload", methods=["GET", "POST"])
+def admin_reload():
+    """Reload the hybrid model from its files without downtime (needs X-Admin-Token)."""
+    denied = inference.check_admin(request.headers.get("X-Admin-Token"))
+    if denied:
+        return jsonify(denied[0]), denied[1]
+    data = None
+    if request.method == "POST":
+        # An empty body starts a reload too
+        data = request.get_json(force=True, silent=True) if request.get_data() else {}
+        if data is None:
+            return jsonify({"error": "Expected a JSON object"}), 400
+    body, status = inference.reload_admin(data)
+    return jsonify(body), status
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """Prometheus text-format metrics."""
+    return Response(metrics.REGISTRY.render(), mimetype=metrics.CONTENT_TYPE)
 
 if __name__ == "__main__":
     port = int(os.getenv("MODEL_SERVICE_PORT", "5002"))
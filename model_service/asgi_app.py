@@ -0,0 +1,216 @@
+"""
+ASGI entry point for the Virtual Therapist model service.
+Serves the same endpoints and responses as app.py, with CPU-bound inference run
+in a bounded thread pool so the event loop keeps answering /health and
+/model-info while the models are busy.
+
+Run with:
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5001
+"""
+
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
+
+import inference
+import metrics
+
+# Load models first: an autotune profile may change the micro-batch size sizing the pool below
+inference.load_models()
+
+# Inference threads; at least the micro-batch size so concurrent requests can share a batch
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", str(max(4, inference.HYBRID_BATCH_MAX_SIZE))))
+# Requests allowed in or waiting for the pool before new ones are turned away with 503
+INFERENCE_MAX_PENDING = int(os.getenv("INFERENCE_MAX_PENDING", "64"))
+
+executor = ThreadPoolExecutor(max_workers=INFERENCE_THREADS, thread_name_prefix="inference")
+pending = 0
+
+
+class ServerBusy(Exception):
+    pass
+
+
+async def run_inference(fn, *args):
+    """Run fn in the inference pool, refusing work beyond INFERENCE_MAX_PENDING."""
+    global pending
+    # Only touched from the event loop thread, so no lock is needed
+    if pending >= INFERENCE_MAX_PENDING:
+        raise ServerBusy()
+    pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+    finally:
+        pending -= 1
+
+
+def busy_response():
+    return JSONResponse({"error": "Server busy"}, status_code=503, headers={"Retry-After": "1"})
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    executor.shutdown(wait=False)
+
+
+app = FastAPI(title="Virtual Therapist Model Service", version="1.0.0", lifespan=lifespan)
+
+# Allow common dev origins: 5173 (Vite), 3000, and custom via FRONTEND_ORIGIN (comma-separated)
+origins_env = os.getenv("FRONTEND_ORIGIN", "http://localhost:5173,http://localhost:3000")
+allowed_origins = [o.strip() for o in origins_env.split(",") if o.strip()]
+app.add_middleware(CORSMiddleware, allow_origins=allowed_origins, allow_methods=["*"], allow_headers=["*"])
+
+http_metrics = metrics.HttpMetrics()
+metrics.REGISTRY.callback(
+    "model_service_executor_pending", "gauge", "Requests running in or waiting for the inference pool",
+    lambda: pending
+)
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = http_metrics.started()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        http_metrics.finished(started, route.path if route is not None else "unmatched", status)
+
+@app.get("/health")
+async def health():
+    return {"ok": True}
+
+
+@app.post("/predict")
+async def predict(request: Request):
+    try:
+        data = await request.json()
+        text = (data.get("text") or "").strip()
+        if len(text) < 5:
+            return JSONResponse({"error": "Text is too short"}, status_code=400)
+        model_name, error = inference.clean_model_name(data)
+        if error:
+            return JSONResponse(error, status_code=400)
+
+        return await run_inference(inference.predict_text, text, request.url.path, model_name)
+    except ServerBusy:
+        return busy_response()
+    except MemoryError as e:
+        return JSONResponse({"error": "Model does not fit in memory", "detail": str(e)}, status_code=507)
+    except Exception as e:
+        return JSONResponse({"error": "Inference error", "detail": str(e)}, status_code=500)
+
+
+@app.post("/predict/batch")
+async def predict_batch(request: Request):
+    """Predict many texts in one request; results are returned in input order."""
+    try:
+        data = await request.json()
+        texts, error = inference.clean_batch_texts(data)
+        if not error:
+            model_name, error = inference.clean_model_name(data)
+        if error:
+            return JSONResponse(error, status_code=400)
+
+        return {"results": await run_inference(inference.predict_texts, texts, request.url.path, model_name)}
+    except ServerBusy:
+        return busy_response()
+    except MemoryError as e:
+        return JSONResponse({"error": "Model does not fit in memory", "detail": str(e)}, status_code=507)
+    except Exception as e:
+        return JSONResponse({"error": "Inference error", "detail": str(e)}, status_code=500)
+
+
+@app.post("/predict/session")
+async def predict_session(request: Request):
+    """Predict a conversation ({"messages": [...]}, oldest first), encoding only messages not seen before."""
+    try:
+        data = await request.json()
+        messages, error = inference.clean_session_messages(data)
+        if not error:
+            model_name, error = inference.clean_model_name(data)
+        if error:
+            return JSONResponse(error, status_code=400)
+
+        return await run_inference(inference.predict_session, messages, request.url.path, model_name)
+    except ServerBusy:
+        return busy_response()
+    except MemoryError as e:
+        return JSONResponse({"error": "Model does not fit in memory", "detail": str(e)}, status_code=507)
+    except Exception as e:
+        return JSONResponse({"error": "Inference error", "detail": str(e)}, status_code=500)
+
+
+@app.post("/api/analyze/session")
+async def analyze_session(request: Request):
+    """Session analysis with the /api/ prefix."""
+    return await predict_session(request)
+
+
+@app.post("/api/analyze")
+async def analyze(request: Request):
+    """API endpoint for text analysis - same as predict but with /api/ prefix."""
+    return await predict(request)
+
+
+@app.get("/model-info")
+async def model_info():
+    """Get information about loaded models."""
+    info = inference.model_info()
+    info["executor"] = {"threads": INFERENCE_THREADS, "max_pending": INFERENCE_MAX_PENDING, "pending": pending}
+    return info
+
+
+@app.api_route("/admin/profile", methods=["GET", "POST"])
+async def admin_profile(request: Request):
+    """Profile the next N hybrid predictions with the torch profiler (needs X-Admin-Token)."""
+    denied = inference.check_admin(request.headers.get("X-Admin-Token"))
+    if denied:
+        return JSONResponse(denied[0], status_code=denied[1])
+    data = None
+    if request.method == "POST":
+        try:
+            data = await request.json()
+        except ValueError:
+            return JSONResponse({"error": "Expected a JSON object"}, status_code=400)
+    body, status = inference.profile_admin(data)
+    return JSONResponse(body, status_code=status)
+
+
+@app.api_route("/admin/reload", methods=["GET", "POST"])
+async def admin_reload(request: Request):
+    """Reload the hybrid model from its files without downtime (needs X-Admin-Token)."""
+    denied = inference.check_admin(request.headers.get("X-Admin-Token"))
+    if denied:
+        return JSONResponse(denied[0], status_code=denied[1])
+    data = None
+    if request.method == "POST":
+        body = await request.body()
+        try:
+            data = json.loads(body) if body.strip() else {}
+        except ValueError:
+            return JSONResponse({"error": "Expected a JSON object"}, status_code=400)
+    body, status = inference.reload_admin(data)
+    return JSONResponse(body, status_code=status)
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus text-format metrics."""
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    port = int(os.getenv("MODEL_SERVICE_PORT", "5002"))
+    uvicorn.run(app, host="0.0.0.0", port=port)
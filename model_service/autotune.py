@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Autotuner for the hybrid model service.
+Benchmarks HybridModelInference on this host across intra-op threads, max batch
+size and the available backends and saves the best profile as JSON. Tuning for
+the service fixes the worker count to the deployment's (AUTOTUNE_WORKERS) and
+only tries thread counts that fit the cores across those workers; --workers 0
+instead estimates throughput for every worker count that fits the cores, to
+help choose one. The service applies a saved profile at startup when it matches
+the host, the model and its worker count.
+
+Usage:
+    python autotune.py                       # tune with the service's .env settings
+    python autotune.py --latency-budget-ms 300 --batch-sizes 1,4,8,16
+    python autotune.py --workers 0           # also search the worker count
+"""
+
+import argparse
+import datetime
+import gc
+import itertools
+import json
+import os
+import platform
+import shutil
+import tempfile
+from typing import Dict, List, Optional
+
+import torch
+
+from benchmark_utils import make_texts, parse_int_list, time_call
+from hybrid_model import HybridModelInference
+from onnx_backend import ONNXRUNTIME_AVAILABLE
+
+PROFILE_VERSION = 1
+DEFAULT_BATCH_SIZES = (1, 4, 8, 16)
+# Words per benchmark text; every configuration is timed across all of them
+TEXT_LENGTHS = (16, 48, 128)
+DEFAULT_LATENCY_BUDGET_MS = 500.0
+
+# Keys copied from the winning result into the profile
+PROFILE_KEYS = ("backend", "compile_mode", "threads", "workers", "max_batch_size", "p50_ms", "throughput_rps")
+
+
+def cpu_count() -> int:
+    """Cores this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def host_info() -> Dict:
+    return {
+        "cpu_count": cpu_count(),
+        "machine": platform.machine(),
+        "torch_version": torch.__version__
+    }
+
+
+def model_stamp(model_path: str) -> Optional[Dict]:
+    """Cheap identity of the weights file, so a profile is dropped when the model changes."""
+    try:
+        stat = os.stat(model_path)
+    except OSError:
+        return None
+    return {"path": os.path.basename(model_path), "size": stat.st_size, "mtime": int(stat.st_mtime)}
+
+
+def thread_options(cores: int) -> List[int]:
+    options = {cores}
+    threads = 1
+    while threads < cores:
+        options.add(threads)
+        threads *= 2
+    return sorted(options)
+
+
+def candidate_backends(model_kwargs: Dict) -> List[Dict[str, str]]:
+    """Backend/compile-mode combinations the model configuration supports."""
+    candidates = [
+        {"backend": "torch", "compile_mode": "none"},
+        {"backend": "torch", "compile_mode": "torchscript"}
+    ]
+    onnx_ok = (
+        ONNXRUNTIME_AVAILABLE and model_kwargs.get("onnx_path")
+        and not model_kwargs.get("pack_sequences") and model_kwargs.get("quantize", "none") == "none"
+    )
+    if onnx_ok:
+        candidates.append({"backend": "onnx", "compile_mode": "none"})
+    return candidates
+
+
+def benchmark_batches(batch_size: int) -> List[List[str]]:
+    """
+    One batch per text length, each mixing the lengths: texts are interleaved by length
+    and every batch starts at a different one, so even batches of 1 cover all lengths.
+    """
+    count = batch_size + len(TEXT_LENGTHS)
+    interleaved = [text for group in zip(*(make_texts(words, count) for words in TEXT_LENGTHS)) for text in group]
+    return [interleaved[start:start + batch_size] for start in range(len(TEXT_LENGTHS))]
+
+
+def run_autotune(model_kwargs: Dict, batch_sizes=DEFAULT_BATCH_SIZES, threads: Optional[List[int]] = None,
+                 workers: Optional[int] = 1, max_workers: Optional[int] = None,
+                 latency_budget_ms: float = DEFAULT_LATENCY_BUDGET_MS, repeat: int = 5) -> Dict:
+    """
+    Benchmark every backend x threads x batch size combination and return the profile
+    with the highest estimated host throughput whose batch latency fits the budget.
+    With a fixed worker count, only thread counts up to cores / workers are tried. With
+    workers=None the worker count is searched too: throughput for several workers is
+    estimated as workers x single-worker throughput, only for worker counts where
+    workers x threads does not exceed the cores.
+    """
+    cores = cpu_count()
+    if workers:
+        threads = threads or thread_options(max(1, cores // workers))
+    else:
+        threads = threads or thread_options(cores)
+        max_workers = max_workers or cores
+
+    results = []
+    original_threads = torch.get_num_threads()
+    # The onnx candidate loads (or exports) its graph here, never next to the serving model
+    scratch = tempfile.TemporaryDirectory(prefix="autotune_")
+    for candidate in candidate_backends(model_kwargs):
+        kwargs = dict(model_kwargs, warmup_batch_sizes=list(batch_sizes), **candidate)
+        if candidate["backend"] == "onnx":
+            kwargs["onnx_path"] = os.path.join(scratch.name, os.path.basename(model_kwargs["onnx_path"]))
+            if os.path.exists(model_kwargs["onnx_path"]):
+                shutil.copy(model_kwargs["onnx_path"], kwargs["onnx_path"])
+        try:
+            inference = HybridModelInference(**kwargs)
+        except Exception as e:
+            print(f"⚠️ Skipping backend {candidate}: {e}")
+            continue
+
+        for num_threads in threads:
+            inference.set_num_threads(num_threads)
+            for batch_size in batch_sizes:
+                batches = benchmark_batches(batch_size)
+                next_batch = itertools.cycle(batches).__next__
+                timing = time_call(lambda: inference._predict_uncached(next_batch()),
+                                   repeat=repeat * len(batches), warmup=len(batches))
+                per_worker_rps = batch_size / (timing["p50_ms"] / 1000.0) if timing["p50_ms"] else 0.0
+                worker_counts = [workers] if workers else range(1, max(1, min(max_workers, cores // num_threads)) + 1)
+                for worker_count in worker_counts:
+                    results.append(dict(
+                        candidate,
+                        threads=num_threads,
+                        workers=worker_count,
+                        max_batch_size=batch_size,
+                        p50_ms=timing["p50_ms"],
+                        p95_ms=timing["p95_ms"],
+                        throughput_rps=worker_count * per_worker_rps
+                    ))
+                print(f"  {candidate['backend']}/{candidate['compile_mode']} threads={num_threads} "
+                      f"batch={batch_size}: p50 {timing['p50_ms']:.1f}ms, {per_worker_rps:.1f} texts/s per worker")
+
+        del inference
+        gc.collect()
+    scratch.cleanup()
+    torch.set_num_threads(original_threads)
+
+    if not results:
+        raise RuntimeError("No backend could be benchmarked")
+
+    within_budget = [r for r in results if r["p50_ms"] <= latency_budget_ms]
+    if within_budget:
+        # Fewer workers win ties: each one holds its own copy of the model
+        best = max(within_budget, key=lambda r: (r["throughput_rps"], -r["workers"]))
+    else:
+        best = min(results, key=lambda r: r["p50_ms"])
+
+    profile = {key: best[key] for key in PROFILE_KEYS}
+    profile.update({
+        "version": PROFILE_VERSION,
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "host": host_info(),
+        "model": model_stamp(model_kwargs.get("model_path", "")),
+        "latency_budget_ms": latency_budget_ms,
+        "within_budget": bool(within_budget),
+        "results": results
+    })
+    return profile
+
+
+def save_profile(profile: Dict, path: str):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(profile, f, indent=2)
+
+
+def load_profile(path: str, model_path: str, workers: Optional[int] = None) -> Optional[Dict]:
+    """Return the saved profile if it was tuned on this host for this model (and worker count), else None."""
+    try:
+        with open(path, "r") as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if profile.get("version") != PROFILE_VERSION:
+        return None
+    if profile.get("host") != host_info() or profile.get("model") != model_stamp(model_path):
+        print(f"⚠️ Autotune profile {path} was tuned for a different host or model, ignoring it")
+        return None
+    if workers is not None and profile.get("workers") != workers:
+        # Its threads per worker would over- or under-use the cores of this deployment
+        print(f"⚠️ Autotune profile {path} was tuned for {profile.get('workers')} worker(s), not {workers}, ignoring it")
+        return None
+    return profile
+
+
+def summarize(profile: Optional[Dict]) -> Optional[Dict]:
+    """The profile without the per-configuration results, for /model-info."""
+    if profile is None:
+        return None
+    return {key: value for key, value in profile.items() if key != "results"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Autotune threads, batch size and backend for the hybrid model")
+    parser.add_argument("--batch-sizes", default=",".join(str(b) for b in DEFAULT_BATCH_SIZES), help="Comma-separated max batch sizes")
+    parser.add_argument("--threads", default=None, help="Comma-separated intra-op thread counts (default: powers of two up to the cores)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Workers the service runs per host (default: AUTOTUNE_WORKERS); 0 searches the worker count")
+    parser.add_argument("--max-workers", type=int, default=None, help="Upper bound on workers per host with --workers 0")
+    parser.add_argument("--latency-budget-ms", type=float, default=DEFAULT_LATENCY_BUDGET_MS, help="Max p50 latency of one batch")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed iterations per configuration")
+    parser.add_argument("--output", default=None, help="Profile path (default: AUTOTUNE_PROFILE_PATH)")
+    args = parser.parse_args()
+
+    # Tune the model exactly as the service would load it
+    import inference
+
+    print("🚀 Autotuning hybrid model")
+    print("=" * 64)
+    profile = run_autotune(
+        inference.hybrid_model_kwargs(),
+        batch_sizes=parse_int_list(args.batch_sizes),
+        threads=parse_int_list(args.threads) if args.threads else None,
+        workers=inference.AUTOTUNE_WORKERS if args.workers is None else args.workers or None,
+        max_workers=args.max_workers,
+        latency_budget_ms=args.latency_budget_ms,
+        repeat=args.repeat
+    )
+    path = args.output or inference.AUTOTUNE_PROFILE_PATH
+    save_profile(profile, path)
+
+    print()
+    print(f"Best: backend={profile['backend']} compile_mode={profile['compile_mode']} threads={profile['threads']} "
+          f"workers={profile['workers']} max_batch_size={profile['max_batch_size']} "
+          f"(p50 {profile['p50_ms']:.1f}ms, ~{profile['throughput_rps']:.1f} texts/s)")
+    print(f"✅ Profile written to {path}; run the service with {profile['workers']} worker(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Dynamic micro-batching scheduler for the Virtual Therapist model service.
+Concurrent requests are held for a short window and served by one batched
+forward pass instead of one forward pass per HTTP request.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+
+class _PendingRequest:
+    """A single text waiting in the batch queue."""
+
+    __slots__ = ("text", "event", "result", "error", "enqueued_at")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    Collects texts from concurrent callers and runs them through `predict_batch_fn`
+    in batches of up to `max_batch_size`, waiting at most `max_wait_ms` for a batch to fill.
+    """
+
+    def __init__(
+        self,
+        predict_batch_fn: Callable[[List[str]], List[Any]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 5.0,
+        name: str = "hybrid"
+    ):
+        self.predict_batch_fn = predict_batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_ms = max(0.0, float(max_wait_ms))
+        self.name = name
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._running = True
+
+        # Tuning statistics
+        self._batches = 0
+        self._requests = 0
+        self._errors = 0
+        self._max_observed_batch = 0
+        self._batch_size_counts: Dict[int, int] = {}
+        self._total_queue_wait = 0.0
+        self._total_batch_time = 0.0
+        self._last_batch_ms = 0.0
+
+        self._worker = threading.Thread(target=self._run, name=f"{name}-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, text: str, timeout: Optional[float] = None) -> Any:
+        """Queue a text and block until its own result is ready."""
+        pending = _PendingRequest(text)
+        with self._cond:
+            if not self._running:
+                raise RuntimeError(f"{self.name} batcher is stopped")
+            self._queue.append(pending)
+            self._cond.notify()
+
+        if not pending.event.wait(timeout):
+            raise TimeoutError(f"{self.name} batcher did not answer within {timeout}s")
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _collect(self) -> List[_PendingRequest]:
+        """Wait for the first request, then for the batch window or a full batch."""
+        with self._cond:
+            while self._running and not self._queue:
+                self._cond.wait()
+            if not self._queue:
+                return []
+
+            deadline = time.monotonic() + self.max_wait_ms / 1000.0
+            while self._running and len(self._queue) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            size = min(len(self._queue), self.max_batch_size)
+            return [self._queue.popleft() for _ in range(size)]
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if not batch:
+                return
+
+            started = time.perf_counter()
+            try:
+                results = self.predict_batch_fn([pending.text for pending in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"predict_batch returned {len(results)} results for {len(batch)} texts")
+                for pending, result in zip(batch, results):
+                    pending.result = result
+            except Exception as e:
+                self._errors += 1
+                for pending in batch:
+                    pending.error = e
+            finally:
+                finished = time.perf_counter()
+                self._record(batch, started, finished)
+                for pending in batch:
+                    pending.event.set()
+
+    def _record(self, batch: List[_PendingRequest], started: float, finished: float):
+        size = len(batch)
+        self._batches += 1
+        self._requests += size
+        self._max_observed_batch = max(self._max_observed_batch, size)
+        self._batch_size_counts[size] = self._batch_size_counts.get(size, 0) + 1
+        self._total_queue_wait += sum(started - pending.enqueued_at for pending in batch)
+        self._total_batch_time += finished - started
+        self._last_batch_ms = (finished - started) * 1000.0
+
+    def queue_depth(self) -> int:
+        """Number of texts waiting for a batch slot."""
+        return len(self._queue)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and batch-size statistics for tuning the batch window."""
+        batches = self._batches
+        requests = self._requests
+        return {
+            "enabled": True,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "queue_depth": self.queue_depth(),
+            "batches": batches,
+            "requests": requests,
+            "errors": self._errors,
+            "avg_batch_size": (requests / batches) if batches else 0.0,
+            "max_observed_batch_size": self._max_observed_batch,
+            "batch_size_histogram": {str(k): v for k, v in sorted(self._batch_size_counts.items())},
+            "avg_queue_wait_ms": (self._total_queue_wait / requests * 1000.0) if requests else 0.0,
+            "avg_batch_ms": (self._total_batch_time / batches * 1000.0) if batches else 0.0,
+            "last_batch_ms": self._last_batch_ms
+        }
+
+    def stop(self):
+        """Stop accepting texts; queued texts are still served before the worker exits."""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._worker.join(timeout=5)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Cold-start time and peak RSS of HybridModelInference when the DistilBERT base
+is built from the bundled config versus loaded with from_pretrained first.
+Each measurement runs in a fresh interpreter.
+
+Usage:
+    python benchmark_cold_start.py --runs 3
+"""
+
+import argparse
+import json
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+from benchmark_utils import add_model_args, write_results
+
+MODES = ("pretrained", "bundled_config")
+
+
+def measure(args):
+    """Build the model once in this process and print timing and peak RSS as JSON."""
+    started = time.perf_counter()
+    import torch  # noqa: F401
+    from hybrid_model import DEFAULT_BASE_CONFIG, HybridModelInference
+    imported = time.perf_counter()
+
+    HybridModelInference(
+        model_path=args.pytorch_path,
+        xgb_path=args.xgb_path,
+        tokenizer_path=args.tokenizer_path,
+        base_config_path=DEFAULT_BASE_CONFIG if args.child == "bundled_config" else None
+    )
+    finished = time.perf_counter()
+
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    print(json.dumps({
+        "import_s": imported - started,
+        "load_s": finished - imported,
+        "peak_rss_mb": peak_mb
+    }))
+
+
+def run_child(mode, args):
+    command = [sys.executable, __file__, "--child", mode, "--pytorch-path", args.pytorch_path, "--xgb-path", args.xgb_path]
+    if args.tokenizer_path:
+        command += ["--tokenizer-path", args.tokenizer_path]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark for the hybrid model")
+    add_model_args(parser)
+    parser.add_argument("--runs", type=int, default=3, help="Fresh processes per mode")
+    parser.add_argument("--child", choices=MODES, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--output", default=None, help="Optional JSON results file")
+    args = parser.parse_args()
+
+    if args.child:
+        measure(args)
+        return
+
+    print("🚀 Cold Start Benchmark")
+    print("=" * 64)
+    print(f"{'mode':>16} {'load p50':>10} {'peak RSS':>10}")
+
+    results = {}
+    for mode in MODES:
+        runs = [run_child(mode, args) for _ in range(args.runs)]
+        load = sorted(r["load_s"] for r in runs)[len(runs) // 2]
+        peak = max(r["peak_rss_mb"] for r in runs)
+        print(f"{mode:>16} {load:>9.2f}s {peak:>8.0f}MB")
+        results[mode] = {"runs": runs, "load_p50_s": load, "peak_rss_mb": peak}
+
+    write_results({
+        "benchmark": "cold_start",
+        "platform": platform.platform(),
+        "results": results
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark eager PyTorch against the frozen TorchScript serving graph for the
+hybrid model, including what the first request costs with and without warmup.
+
+Usage:
+    python benchmark_compile.py --word-counts 8,32,128 --batch-sizes 1,8 --packed-lstm
+"""
+
+import argparse
+import platform
+import sys
+import time
+
+import torch
+
+from benchmark_utils import add_model_args, make_texts, max_score_diff, parse_int_list, time_call, write_results
+from hybrid_model import HybridModelInference, compile_model
+
+PARITY_TOLERANCE = 1e-4
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Eager vs. TorchScript latency benchmark for the hybrid model")
+    add_model_args(parser)
+    parser.add_argument("--word-counts", default="8,32,128,200", help="Comma-separated text lengths in words")
+    parser.add_argument("--batch-sizes", default="1,8", help="Comma-separated batch sizes")
+    parser.add_argument("--packed-lstm", action="store_true", help="Run the BiLSTM over real tokens only")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed iterations per configuration")
+    parser.add_argument("--output", default=None, help="Optional JSON results file")
+    args = parser.parse_args()
+
+    common = dict(model_path=args.pytorch_path, xgb_path=args.xgb_path, tokenizer_path=args.tokenizer_path,
+                  pack_sequences=args.packed_lstm, warmup_batch_sizes=parse_int_list(args.batch_sizes))
+    eager = HybridModelInference(**common)
+    compiled = HybridModelInference(**common, compile_mode="torchscript")
+
+    # First request on a graph that was compiled but never run
+    cold = HybridModelInference(**common)
+    cold.runner = compile_model(cold.model)
+    first_text = make_texts(parse_int_list(args.word_counts)[0], 1)
+    started = time.perf_counter()
+    cold._predict_uncached(first_text)
+    cold_first_ms = (time.perf_counter() - started) * 1000.0
+    started = time.perf_counter()
+    compiled._predict_uncached(first_text)
+    warm_first_ms = (time.perf_counter() - started) * 1000.0
+
+    print("🚀 Compile Benchmark")
+    print("=" * 72)
+    print(f"Warmup: {compiled.warmup_ms:.0f}ms over {len(compiled.warmup_shapes())} buckets")
+    print(f"First request: {cold_first_ms:.1f}ms without warmup, {warm_first_ms:.1f}ms after warmup")
+    print()
+    print(f"{'words':>6} {'batch':>6} {'eager p50':>11} {'compiled p50':>13} {'speedup':>8} {'max diff':>9}")
+
+    rows = []
+    worst_diff = 0.0
+    for batch_size in parse_int_list(args.batch_sizes):
+        for word_count in parse_int_list(args.word_counts):
+            texts = make_texts(word_count, batch_size)
+            eager_time = time_call(lambda: eager._predict_uncached(texts), repeat=args.repeat)
+            compiled_time = time_call(lambda: compiled._predict_uncached(texts), repeat=args.repeat)
+            diff = max(max_score_diff(a, b) for a, b in zip(eager._predict_uncached(texts), compiled._predict_uncached(texts)))
+            worst_diff = max(worst_diff, diff)
+            speedup = eager_time["p50_ms"] / compiled_time["p50_ms"] if compiled_time["p50_ms"] else 0.0
+
+            print(f"{word_count:>6} {batch_size:>6} {eager_time['p50_ms']:>9.1f}ms {compiled_time['p50_ms']:>11.1f}ms "
+                  f"{speedup:>7.2f}x {diff:>9.2e}")
+            rows.append({
+                "words": word_count,
+                "batch_size": batch_size,
+                "eager": eager_time,
+                "compiled": compiled_time,
+                "speedup": speedup,
+                "max_score_diff": diff
+            })
+
+    passed = worst_diff <= PARITY_TOLERANCE
+    print()
+    print("✅ Parity check passed" if passed else f"❌ Parity check failed (tolerance {PARITY_TOLERANCE})")
+
+    write_results({
+        "benchmark": "compile",
+        "torch_version": torch.__version__,
+        "platform": platform.platform(),
+        "threads": torch.get_num_threads(),
+        "packed_lstm": args.packed_lstm,
+        "warmup_ms": compiled.warmup_ms,
+        "first_request_ms": {"without_warmup": cold_first_ms, "with_warmup": warm_first_ms},
+        "max_score_diff": worst_diff,
+        "parity_passed": passed,
+        "results": rows
+    }, args.output)
+
+    if not passed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Latency of the keyword fallback predictors: the KeywordScorer-based
+fallback_predict of inference.py and simple_app.py against the substring loops
+they replaced (kept below as reference implementations), per text and for
+batches, plus how often the two disagree on the top label.
+
+Disagreements are expected where the old loops matched inside words ("down" in
+"download") or counted a keyword listed twice.
+
+Usage:
+    python benchmark_keyword_scorer.py --word-counts 8,64,256 --output keywords.json
+"""
+
+import argparse
+import os
+import platform
+
+# The benchmark only needs the keyword code; keep inference.py from loading models
+os.environ.setdefault("SERVING_POLICY", "heuristic")
+
+import inference
+import simple_app
+from benchmark_utils import make_texts, parse_int_list, time_call, write_results
+
+# Sentences where whole-word matching changes the old result
+EDGE_CASES = [
+    "I need to download the update before the meeting.",
+    "The showdown at work went fine, I feel okay.",
+    "I panic and panic again, it is hopeless and hopeless.",
+    "My thoughts keep racing thoughts all night and I feel manic.",
+    "Sadly the bread was stale but the day was good.",
+    "I am stressing about my deadlines and feel stressful pressures.",
+    "I keep panicking and worrying about everything.",
+    "Feeling sadness and emptiness, so depressing.",
+    "The pressures of my deadlines left me tensed and overwhelmed.",
+    "I panicked, my nervousness and restlessness kept me fidgeting."
+]
+
+
+def legacy_inference_fallback(text: str):
+    """inference.fallback_predict before KeywordScorer: one substring scan per keyword."""
+    labels = inference.LABELS
+    text_l = text.lower()
+    scores = {l: 1.0 / len(labels) for l in labels}
+    if any(k in text_l for k in ["worry", "anxious", "panic", "nervous"]):
+        scores["Anxiety"] += 0.35
+    if any(k in text_l for k in ["sad", "hopeless", "down", "tired"]):
+        scores["Depression"] += 0.35
+    if any(k in text_l for k in ["focus", "fidget", "impulsive", "restless", "adhd"]):
+        scores["ADHD"] += 0.35
+    if any(k in text_l for k in ["racing thoughts", "manic", "mania", "euphoric"]):
+        scores["Bipolar"] += 0.35
+    total = sum(max(v, 0.001) for v in scores.values())
+    norm = {k: max(v, 0.001) / total for k, v in scores.items()}
+    top = max(norm.items(), key=lambda kv: kv[1])[0]
+    return top, [{"label": k, "score": float(v)} for k, v in sorted(norm.items(), key=lambda kv: -kv[1])]
+
+
+def legacy_simple_fallback(text: str):
+    """simple_app.fallback_predict before KeywordScorer: substring counts over four lists."""
+    text_l = text.lower()
+    scores = {label: 0.1 for label in simple_app.LABELS}
+    anxiety_keywords = ["worry", "anxious", "panic", "nervous", "fear", "scared", "worried", "anxiety", "panic", "restless", "uneasy"]
+    anxiety_count = sum(1 for word in anxiety_keywords if word in text_l)
+    if anxiety_count > 0:
+        scores["Anxiety"] += 0.3 + (anxiety_count * 0.1)
+    depression_keywords = ["sad", "hopeless", "down", "tired", "depressed", "depression", "empty", "worthless", "guilty", "suicidal", "hopeless"]
+    depression_count = sum(1 for word in depression_keywords if word in text_l)
+    if depression_count > 0:
+        scores["Depression"] += 0.3 + (depression_count * 0.1)
+    stress_keywords = ["overwhelmed", "pressure", "deadline", "stressed", "stress", "burnout", "exhausted", "frustrated", "irritated", "tense"]
+    stress_count = sum(1 for word in stress_keywords if word in text_l)
+    if stress_count > 0:
+        scores["Stress"] += 0.3 + (stress_count * 0.1)
+    if anxiety_count == 0 and depression_count == 0 and stress_count == 0:
+        scores["Neutral"] = 0.7
+    else:
+        scores["Neutral"] = 0.1
+    total = sum(max(v, 0.001) for v in scores.values())
+    norm = {k: max(v, 0.001) / total for k, v in scores.items()}
+    top = max(norm.items(), key=lambda kv: kv[1])[0]
+    return top, [{"label": k, "score": float(v)} for k, v in sorted(norm.items(), key=lambda kv: -kv[1])]
+
+
+PREDICTORS = {
+    "inference": (legacy_inference_fallback, inference.fallback_predict, inference.FALLBACK_KEYWORDS, inference.fallback_result),
+    "simple_app": (legacy_simple_fallback, simple_app.fallback_predict, simple_app.KEYWORDS, simple_app.keyword_result)
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keyword fallback predictors: KeywordScorer vs. substring loops")
+    parser.add_argument("--word-counts", default="8,32,128,512", help="Comma-separated words per text")
+    parser.add_argument("--texts", type=int, default=256, help="Texts per timed batch")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed iterations per configuration")
+    parser.add_argument("--output", default=None, help="Optional JSON results file")
+    args = parser.parse_args()
+
+    print("🚀 Keyword Fallback Benchmark")
+    print("=" * 72)
+    print(f"{'predictor':<11} {'words':>6} {'legacy us':>10} {'scorer us':>10} {'batch us':>9} {'speedup':>8} {'agree':>7}")
+
+    results = []
+    for name, (legacy, current, scorer, to_result) in PREDICTORS.items():
+        for num_words in parse_int_list(args.word_counts):
+            texts = make_texts(num_words, args.texts)
+            legacy_timing = time_call(lambda: [legacy(text) for text in texts], repeat=args.repeat)
+            current_timing = time_call(lambda: [current(text) for text in texts], repeat=args.repeat)
+            batch_timing = time_call(lambda: [to_result(counts) for counts in scorer.count_batch(texts)], repeat=args.repeat)
+            agree = sum(legacy(text)[0] == current(text)[0] for text in texts) / len(texts)
+
+            per_text = {
+                "legacy_us": legacy_timing["p50_ms"] * 1000.0 / len(texts),
+                "scorer_us": current_timing["p50_ms"] * 1000.0 / len(texts),
+                "batch_us": batch_timing["p50_ms"] * 1000.0 / len(texts)
+            }
+            results.append({"predictor": name, "words": num_words, **per_text, "top_label_agreement": agree})
+            print(f"{name:<11} {num_words:>6} {per_text['legacy_us']:>10.2f} {per_text['scorer_us']:>10.2f} "
+                  f"{per_text['batch_us']:>9.2f} {per_text['legacy_us'] / per_text['scorer_us']:>7.2f}x {agree:>7.1%}")
+
+    print()
+    print("Edge cases (legacy -> scorer top label):")
+    edge_cases = []
+    for text in EDGE_CASES:
+        row = {"text": text}
+        for name, (legacy, current, _, _) in PREDICTORS.items():
+            row[name] = {"legacy": legacy(text)[0], "scorer": current(text)[0]}
+        edge_cases.append(row)
+        print(f"  {text}")
+        print("    " + ", ".join(f"{name}: {row[name]['legacy']} -> {row[name]['scorer']}" for name in PREDICTORS))
+
+    write_results({
+        "platform": {"python": platform.python_version(), "machine": platform.machine()},
+        "texts": args.texts,
+        "results": results,
+        "edge_cases": edge_cases
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark long-text inference for the hybrid model: truncation to 256 tokens,
+the sliding-window mode (all windows of a text scored in batched forward passes)
+and the client-side workaround of one predict() call per chunk of the text.
+Also checks that texts fitting in one window get the truncation result.
+
+Usage:
+    python benchmark_long_text.py --word-counts 100,400,1000 --aggregation mean_probs
+"""
+
+import argparse
+import platform
+
+import torch
+
+from benchmark_utils import add_model_args, make_texts, max_score_diff, parse_int_list, time_call, write_results
+from hybrid_model import WINDOW_AGGREGATIONS, HybridModelInference
+
+
+def split_chunks(text: str, words_per_chunk: int):
+    """Split text into consecutive chunks of words, as clients did before window mode."""
+    words = text.split()
+    return [" ".join(words[i:i + words_per_chunk]) for i in range(0, len(words), words_per_chunk)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Truncation vs. sliding-window inference on long texts")
+    add_model_args(parser)
+    parser.add_argument("--word-counts", default="50,200,500,1000,2000", help="Comma-separated text lengths in words")
+    parser.add_argument("--window-size", type=int, default=256, help="Tokens per window")
+    parser.add_argument("--window-stride", type=int, default=192, help="Tokens between window starts")
+    parser.add_argument("--max-windows", type=int, default=16, help="Windows kept per text")
+    parser.add_argument("--window-batch-size", type=int, default=32, help="Windows per forward pass")
+    parser.add_argument("--aggregation", default="mean_probs", choices=WINDOW_AGGREGATIONS, help="How windows are combined")
+    parser.add_argument("--chunk-words", type=int, default=150, help="Words per request for the client-side split")
+    parser.add_argument("--dynamic-padding", action="store_true", help="Pad windows to length buckets")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed iterations per configuration")
+    parser.add_argument("--output", default=None, help="Optional JSON results file")
+    args = parser.parse_args()
+
+    inference = HybridModelInference(
+        model_path=args.pytorch_path,
+        xgb_path=args.xgb_path,
+        tokenizer_path=args.tokenizer_path,
+        dynamic_padding=args.dynamic_padding,
+        long_text="window",
+        window_size=args.window_size,
+        window_stride=args.window_stride,
+        max_windows=args.max_windows,
+        window_aggregation=args.aggregation,
+        window_batch_size=args.window_batch_size
+    )
+
+    print("🚀 Long Text Benchmark")
+    print("=" * 84)
+    print(f"{'words':>6} {'tokens':>7} {'windows':>8} {'truncate':>10} {'window':>10} {'per-chunk':>10} {'chunks':>7} {'diff':>9}")
+
+    rows = []
+    for word_count in parse_int_list(args.word_counts):
+        text = make_texts(word_count, 1)[0]
+        tokens = len(inference.tokenizer(text, add_special_tokens=False, verbose=False)["input_ids"])
+        windows = len(inference.preprocess_windows([text])[1])
+        chunks = split_chunks(text, args.chunk_words)
+
+        inference.long_text = "truncate"
+        truncate = time_call(lambda: inference.predict_batch([text]), repeat=args.repeat, warmup=1)
+        truncated = inference.predict_batch([text])[0]
+        per_chunk = time_call(lambda: [inference.predict(chunk) for chunk in chunks], repeat=args.repeat, warmup=1)
+
+        inference.long_text = "window"
+        window = time_call(lambda: inference.predict_batch([text]), repeat=args.repeat, warmup=1)
+        windowed = inference.predict_batch([text])[0]
+
+        # Zero whenever the text fits in a single window
+        diff = max_score_diff(truncated, windowed)
+        print(f"{word_count:>6} {tokens:>7} {windows:>8} {truncate['p50_ms']:>8.1f}ms {window['p50_ms']:>8.1f}ms "
+              f"{per_chunk['p50_ms']:>8.1f}ms {len(chunks):>7} {diff:>9.2e}")
+        rows.append({
+            "words": word_count,
+            "tokens": tokens,
+            "windows": windows,
+            "chunks": len(chunks),
+            "truncate": truncate,
+            "window": window,
+            "per_chunk": per_chunk,
+            "max_score_diff_vs_truncate": diff
+        })
+
+    write_results({
+        "benchmark": "long_text",
+        "torch_version": torch.__version__,
+        "platform": platform.platform(),
+        "threads": torch.get_num_threads(),
+        "windowing": inference.get_model_info()["windowing"],
+        "dynamic_padding": args.dynamic_padding,
+        "results": rows
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Parity check and latency comparison for the packed (mask-aware) BiLSTM mode
+of DistilBERT_BiLSTM_Hybrid.
+
+Parity: a padded batch run with packed sequences must match running each text
+on its own with no padding through the current (unpacked) forward pass.
+
+Usage:
+    python benchmark_packed_lstm.py --batch-size 16
+"""
+
+import argparse
+import platform
+import sys
+
+import torch
+
+from benchmark_utils import add_model_args, make_texts, parse_int_list, time_call, write_results
+from hybrid_model import HybridModelInference
+
+PARITY_TOLERANCE = 1e-4
+
+
+def forward(model, inputs, pack_sequences: bool):
+    model.pack_sequences = pack_sequences
+    with torch.no_grad():
+        return model(**inputs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Packed vs. padded BiLSTM benchmark for the hybrid model")
+    add_model_args(parser)
+    parser.add_argument("--batch-size", type=int, default=16, help="Texts per batch")
+    parser.add_argument("--word-counts", default="6,20,60,150", help="Comma-separated text lengths mixed into the batch")
+    parser.add_argument("--repeat", type=int, default=10, help="Timed iterations per configuration")
+    parser.add_argument("--output", default=None, help="Optional JSON results file")
+    args = parser.parse_args()
+
+    inference = HybridModelInference(
+        model_path=args.pytorch_path,
+        xgb_path=args.xgb_path,
+        tokenizer_path=args.tokenizer_path
+    )
+    model = inference.model
+
+    word_counts = parse_int_list(args.word_counts)
+    texts = []
+    for i in range(args.batch_size):
+        texts.extend(make_texts(word_counts[i % len(word_counts)], 1, seed=i))
+    inputs = inference.preprocess_batch(texts)
+    lengths = inputs["attention_mask"].sum(dim=1).tolist()
+
+    print("🚀 Packed BiLSTM Benchmark")
+    print("=" * 60)
+    print(f"Batch size: {len(texts)}, padded length: {inputs['input_ids'].shape[1]}, "
+          f"real tokens: {sum(lengths)} ({sum(lengths) / inputs['input_ids'].numel():.0%})")
+
+    # Parity: packed padded batch vs. each text alone without padding, current forward pass
+    packed_features, packed_logits = forward(model, inputs, pack_sequences=True)
+    reference = []
+    for row, length in enumerate(lengths):
+        single = {key: value[row:row + 1, :length] for key, value in inputs.items()}
+        reference.append(forward(model, single, pack_sequences=False)[0])
+    reference = torch.cat(reference)
+    parity_diff = (packed_features - reference).abs().max().item()
+
+    # Without padding, packing must not change anything either
+    single = {key: value[:1, :lengths[0]] for key, value in inputs.items()}
+    unpadded_diff = (forward(model, single, True)[0] - forward(model, single, False)[0]).abs().max().item()
+
+    # How far the current padded output is from the real-token-only output
+    padded_features, _ = forward(model, inputs, pack_sequences=False)
+    drift = (padded_features - packed_features).abs().max().item()
+
+    print(f"Parity vs. unpadded reference: max |diff| = {parity_diff:.2e}")
+    print(f"Parity without padding:        max |diff| = {unpadded_diff:.2e}")
+    print(f"Drift of padded output:        max |diff| = {drift:.2e}")
+
+    # Latency: BiLSTM stage alone, then the full forward pass
+    with torch.no_grad():
+        sequence_output = model.distilbert(**inputs).last_hidden_state
+        cpu_lengths = inputs["attention_mask"].sum(dim=1).cpu()
+        lstm_padded = time_call(lambda: model.lstm(sequence_output), repeat=args.repeat)
+        lstm_packed = time_call(lambda: model.lstm(torch.nn.utils.rnn.pack_padded_sequence(
+            sequence_output, cpu_lengths, batch_first=True, enforce_sorted=False)), repeat=args.repeat)
+    forward_padded = time_call(lambda: forward(model, inputs, False), repeat=args.repeat)
+    forward_packed = time_call(lambda: forward(model, inputs, True), repeat=args.repeat)
+
+    print()
+    print(f"{'stage':<10} {'padded p50':>12} {'packed p50':>12} {'speedup':>8}")
+    for name, padded, packed in (("lstm", lstm_padded, lstm_packed), ("forward", forward_padded, forward_packed)):
+        print(f"{name:<10} {padded['p50_ms']:>10.1f}ms {packed['p50_ms']:>10.1f}ms {padded['p50_ms'] / packed['p50_ms']:>7.2f}x")
+
+    passed = parity_diff <= PARITY_TOLERANCE and unpadded_diff <= PARITY_TOLERANCE
+    print()
+    print("✅ Parity check passed" if passed else f"❌ Parity check failed (tolerance {PARITY_TOLERANCE})")
+
+    write_results({
+        "benchmark": "packed_lstm",
+        "torch_version": torch.__version__,
+        "platform": platform.platform(),
+        "threads": torch.get_num_threads(),
+        "batch_size": len(texts),
+        "lengths": lengths,
+        "parity_max_diff": parity_diff,
+        "unpadded_max_diff": unpadded_diff,
+        "padded_drift": drift,
+        "lstm": {"padded": lstm_padded, "packed": lstm_packed},
+        "forward": {"padded": forward_padded, "packed": forward_packed},
+        "parity_passed": passed
+    }, args.output)
+
+    if not passed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
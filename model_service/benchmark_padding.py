@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark fixed 256-token padding against dynamic, length-bucketed padding
+for the hybrid model, and report how far the predictions move.
+
+Usage:
+    python benchmark_padding.py --word-counts 8,32,128,200 --batch-sizes 1,8
+"""
+
+import argparse
+import platform
+
+import torch
+
+from benchmark_utils import add_model_args, make_texts, max_score_diff, parse_int_list, time_call, write_results
+from hybrid_model import HybridModelInference
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fixed vs. dynamic padding benchmark for the hybrid model")
+    add_model_args(parser)
+    parser.add_argument("--word-counts", default="8,16,32,64,128,200", help="Comma-separated text lengths in words")
+    parser.add_argument("--batch-sizes", default="1,8", help="Comma-separated batch sizes")
+    parser.add_argument("--buckets", default="16,32,64,128,256", help="Comma-separated length buckets")
+    parser.add_argument("--packed-lstm", action="store_true", help="Run the BiLSTM over real tokens only")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed iterations per configuration")
+    parser.add_argument("--output", default=None, help="Optional JSON results file")
+    args = parser.parse_args()
+
+    inference = HybridModelInference(
+        model_path=args.pytorch_path,
+        xgb_path=args.xgb_path,
+        tokenizer_path=args.tokenizer_path,
+        length_buckets=parse_int_list(args.buckets),
+        pack_sequences=args.packed_lstm
+    )
+
+    print("🚀 Padding Benchmark")
+    print("=" * 84)
+    print(f"{'words':>6} {'batch':>6} {'tokens':>7} {'bucket':>7} {'fixed p50':>11} {'dynamic p50':>12} {'speedup':>8} {'max diff':>9} {'labels':>7}")
+
+    rows = []
+    for batch_size in parse_int_list(args.batch_sizes):
+        for word_count in parse_int_list(args.word_counts):
+            texts = make_texts(word_count, batch_size)
+            tokens = max(len(ids) for ids in inference.tokenizer(texts, truncation=True, max_length=256)["input_ids"])
+
+            inference.dynamic_padding = False
+            fixed = time_call(lambda: inference.predict_batch(texts), repeat=args.repeat)
+            fixed_results = inference.predict_batch(texts)
+
+            inference.dynamic_padding = True
+            dynamic = time_call(lambda: inference.predict_batch(texts), repeat=args.repeat)
+            dynamic_results = inference.predict_batch(texts)
+
+            diff = max(max_score_diff(a, b) for a, b in zip(fixed_results, dynamic_results))
+            agree = sum(a["topPattern"] == b["topPattern"] for a, b in zip(fixed_results, dynamic_results))
+            speedup = fixed["p50_ms"] / dynamic["p50_ms"] if dynamic["p50_ms"] else 0.0
+
+            print(f"{word_count:>6} {batch_size:>6} {tokens:>7} {inference.bucket_length(tokens):>7} "
+                  f"{fixed['p50_ms']:>9.1f}ms {dynamic['p50_ms']:>10.1f}ms {speedup:>7.2f}x {diff:>9.2e} {agree:>3}/{batch_size:<3}")
+            rows.append({
+                "words": word_count,
+                "batch_size": batch_size,
+                "tokens": tokens,
+                "bucket": inference.bucket_length(tokens),
+                "fixed": fixed,
+                "dynamic": dynamic,
+                "speedup": speedup,
+                "max_score_diff": diff,
+                "label_agreement": agree / batch_size
+            })
+
+    write_results({
+        "benchmark": "padding",
+        "torch_version": torch.__version__,
+        "platform": platform.platform(),
+        "threads": torch.get_num_threads(),
+        "buckets": inference.length_buckets,
+        "packed_lstm": args.packed_lstm,
+        "results": rows
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Accuracy and latency report comparing the fp32 hybrid model with its
+dynamically quantized int8 version on a held-out text set.
+
+The held-out set is a .jsonl file with {"text": ..., "label": ...} per line
+(label optional) or a .txt file with one text per line. Without --texts a
+synthetic set is used, which only supports the fp32/int8 agreement numbers.
+
+Usage:
+    python benchmark_quantization.py --texts heldout.jsonl --save-quantized model/hybrid_model_int8.pth
+"""
+
+import argparse
+import io
+import json
+import platform
+
+import torch
+
+from benchmark_utils import add_model_args, make_texts, max_score_diff, parse_int_list, time_call, write_results
+from hybrid_model import HybridModelInference, save_quantized_model
+
+
+def load_heldout(path):
+    """Read texts and optional gold labels from a .jsonl or .txt file."""
+    texts, labels = [], []
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if path.endswith(".jsonl"):
+                record = json.loads(line)
+                texts.append(record["text"])
+                labels.append(record.get("label"))
+            else:
+                texts.append(line)
+                labels.append(None)
+    return texts, labels
+
+
+def serialized_size_mb(model) -> float:
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="fp32 vs. int8 accuracy and latency report for the hybrid model")
+    add_model_args(parser)
+    parser.add_argument("--texts", default=None, help="Held-out .jsonl (text, label) or .txt file")
+    parser.add_argument("--batch-sizes", default="1,8", help="Comma-separated batch sizes for latency")
+    parser.add_argument("--repeat", type=int, default=10, help="Timed iterations per batch size")
+    parser.add_argument("--save-quantized", default=None, help="Write the int8 model as a pre-quantized artifact")
+    parser.add_argument("--output", default=None, help="Optional JSON results file")
+    args = parser.parse_args()
+
+    if args.texts:
+        texts, gold = load_heldout(args.texts)
+    else:
+        texts = [text for words in (8, 24, 64, 160) for text in make_texts(words, 16)]
+        gold = [None] * len(texts)
+
+    common = dict(model_path=args.pytorch_path, xgb_path=args.xgb_path, tokenizer_path=args.tokenizer_path)
+    fp32 = HybridModelInference(**common)
+    int8 = HybridModelInference(**common, quantize="int8")
+
+    if args.save_quantized:
+        save_quantized_model(int8.model, args.save_quantized)
+        print(f"✅ Pre-quantized int8 model saved to {args.save_quantized}")
+
+    print("🚀 Quantization Report")
+    print("=" * 64)
+
+    fp32_results = fp32.predict_batch(texts)
+    int8_results = int8.predict_batch(texts)
+    agreement = sum(a["topPattern"] == b["topPattern"] for a, b in zip(fp32_results, int8_results)) / len(texts)
+    diffs = [max_score_diff(a, b) for a, b in zip(fp32_results, int8_results)]
+
+    labeled = [(g, a, b) for g, a, b in zip(gold, fp32_results, int8_results) if g]
+    accuracy = None
+    if labeled:
+        accuracy = {
+            "fp32": sum(g == a["topPattern"] for g, a, _ in labeled) / len(labeled),
+            "int8": sum(g == b["topPattern"] for g, _, b in labeled) / len(labeled)
+        }
+
+    sizes = {"fp32": serialized_size_mb(fp32.model), "int8": serialized_size_mb(int8.model)}
+
+    print(f"Texts: {len(texts)} ({len(labeled)} labeled)")
+    print(f"Top label agreement fp32 vs int8: {agreement:.1%}")
+    print(f"Score difference: mean {sum(diffs) / len(diffs):.4f}, max {max(diffs):.4f}")
+    if accuracy:
+        print(f"Accuracy: fp32 {accuracy['fp32']:.1%}, int8 {accuracy['int8']:.1%}")
+    print(f"Model size: fp32 {sizes['fp32']:.1f}MB, int8 {sizes['int8']:.1f}MB")
+
+    print()
+    print(f"{'batch':>6} {'fp32 p50':>10} {'int8 p50':>10} {'speedup':>8}")
+    latency = []
+    for batch_size in parse_int_list(args.batch_sizes):
+        batch = (texts * batch_size)[:batch_size]
+        fp32_time = time_call(lambda: fp32._predict_uncached(batch), repeat=args.repeat)
+        int8_time = time_call(lambda: int8._predict_uncached(batch), repeat=args.repeat)
+        speedup = fp32_time["p50_ms"] / int8_time["p50_ms"] if int8_time["p50_ms"] else 0.0
+        print(f"{batch_size:>6} {fp32_time['p50_ms']:>8.1f}ms {int8_time['p50_ms']:>8.1f}ms {speedup:>7.2f}x")
+        latency.append({"batch_size": batch_size, "fp32": fp32_time, "int8": int8_time, "speedup": speedup})
+
+    write_results({
+        "benchmark": "quantization",
+        "torch_version": torch.__version__,
+        "platform": platform.platform(),
+        "threads": torch.get_num_threads(),
+        "texts": len(texts),
+        "labeled": len(labeled),
+        "label_agreement": agreement,
+        "mean_score_diff": sum(diffs) / len(diffs),
+        "max_score_diff": max(diffs),
+        "accuracy": accuracy,
+        "size_mb": sizes,
+        "latency": latency
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
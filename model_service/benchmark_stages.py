@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Offline stage microbenchmark for the hybrid DistilBERT-BiLSTM-XGBoost pipeline.
+
+Builds a randomly initialized DistilBERT_BiLSTM_Hybrid from the bundled config,
+a synthetic WordPiece vocabulary and a small synthetic XGBoost head in a temporary
+directory, so it needs no network access and no trained checkpoints. Then times
+each stage of HybridModelInference.predict_batch separately:
+
+    tokenize  - tokenizer call and (bucketed) padding
+    encoder   - DistilBERT forward pass
+    bilstm    - BiLSTM over the encoder output plus the final-state concat
+    xgb_head  - XGBoost class probabilities for the BiLSTM features
+    response  - building the API response dicts
+    total     - the whole uncached pipeline end to end
+
+for every combination of text length and batch size. Weights are random, so
+the predictions are meaningless, but the shapes and therefore the costs match
+the real model.
+
+Usage:
+    python benchmark_stages.py --word-counts 8,32,128 --batch-sizes 1,8,32 --output stages.json
+"""
+
+import argparse
+import os
+import platform
+import string
+import tempfile
+
+import numpy as np
+import torch
+import xgboost as xgb
+
+from benchmark_utils import SAMPLE_WORDS, make_texts, parse_int_list, time_call, write_results
+from hybrid_model import (
+    DEFAULT_BASE_CONFIG,
+    DistilBERT_BiLSTM_Hybrid,
+    HybridModelInference,
+    load_base_config
+)
+
+STAGES = ("tokenize", "encoder", "bilstm", "xgb_head", "response", "total")
+LABELS = ['Depression', 'ADHD', 'Bipolar', 'Anxiety']
+
+
+def write_synthetic_vocab(directory: str) -> str:
+    """
+    WordPiece vocabulary with the special tokens, the benchmark words and single
+    characters, so any lowercase ASCII text tokenizes without [UNK].
+    """
+    tokens = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+    tokens += sorted(set(SAMPLE_WORDS))
+    tokens += list(string.ascii_lowercase + string.digits + string.punctuation)
+    tokens += [f"##{c}" for c in string.ascii_lowercase + string.digits]
+    path = os.path.join(directory, "vocab.txt")
+    with open(path, "w") as f:
+        f.write("\n".join(dict.fromkeys(tokens)) + "\n")
+    return directory
+
+
+def write_synthetic_xgb_head(path: str, num_features: int, num_trees: int, max_depth: int, seed: int):
+    """Fit a small multi-class XGBoost model on random features and save it as JSON."""
+    rng = np.random.default_rng(seed)
+    features = rng.normal(size=(512, num_features)).astype(np.float32)
+    labels = rng.integers(0, len(LABELS), len(features))
+    classifier = xgb.XGBClassifier(n_estimators=num_trees, max_depth=max_depth)
+    classifier.fit(features, labels)
+    classifier.save_model(path)
+
+
+def build_pipeline(workdir: str, args) -> HybridModelInference:
+    """Random-weight HybridModelInference over synthetic artifacts written to workdir."""
+    torch.manual_seed(args.seed)
+    model = DistilBERT_BiLSTM_Hybrid(num_labels=len(LABELS), base_config=load_base_config(args.base_config))
+    model_path = os.path.join(workdir, "hybrid_model.pth")
+    torch.save(model.state_dict(), model_path)
+    del model
+
+    xgb_path = os.path.join(workdir, "xgboost_classifier.json")
+    write_synthetic_xgb_head(xgb_path, 256 * 2, args.xgb_trees, args.xgb_depth, args.seed)
+
+    tokenizer_path = args.tokenizer_path or write_synthetic_vocab(workdir)
+    return HybridModelInference(
+        model_path=model_path,
+        xgb_path=xgb_path,
+        tokenizer_path=tokenizer_path,
+        labels=LABELS,
+        dynamic_padding=args.dynamic_padding,
+        pack_sequences=args.pack_sequences,
+        xgb_engine=args.xgb_engine,
+        base_config_path=args.base_config
+    )
+
+
+def time_stages(inference: HybridModelInference, texts, repeat: int, warmup: int):
+    """Latency of each pipeline stage for one batch, fed with the previous stage's output."""
+    model = inference.model
+    groups = inference._encode(texts)
+
+    def encoder():
+        return [model.distilbert(**inputs).last_hidden_state for _, inputs in groups]
+
+    def bilstm(hidden_states):
+        outputs = []
+        for (_, inputs), sequence_output in zip(groups, hidden_states):
+            if model.pack_sequences:
+                lengths = inputs["attention_mask"].sum(dim=1).clamp(min=1).cpu()
+                packed = torch.nn.utils.rnn.pack_padded_sequence(sequence_output, lengths, batch_first=True, enforce_sorted=False)
+                _, (h_n, _) = model.lstm(packed)
+            else:
+                _, (h_n, _) = model.lstm(sequence_output)
+            outputs.append(torch.cat((h_n[-2, :, :], h_n[-1, :, :]), dim=1))
+        return outputs
+
+    with torch.inference_mode():
+        hidden_states = encoder()
+        features = torch.cat(bilstm(hidden_states)).cpu().numpy()
+        probs = inference.xgb_head.predict_proba(features).tolist()
+
+        timings = {
+            "tokenize": time_call(lambda: inference._encode(texts), repeat=repeat, warmup=warmup),
+            "encoder": time_call(encoder, repeat=repeat, warmup=warmup),
+            "bilstm": time_call(lambda: bilstm(hidden_states), repeat=repeat, warmup=warmup),
+            "xgb_head": time_call(lambda: inference.xgb_head.predict_proba(features), repeat=repeat, warmup=warmup),
+            "response": time_call(lambda: [inference._build_result(row) for row in probs], repeat=repeat, warmup=warmup),
+            "total": time_call(lambda: inference._predict_uncached(texts), repeat=repeat, warmup=warmup)
+        }
+    tokens = sum(int(inputs["attention_mask"].sum()) for _, inputs in groups)
+    padded = sum(inputs["input_ids"].numel() for _, inputs in groups)
+    return timings, {"real_tokens": tokens, "padded_tokens": padded}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage latency of the hybrid pipeline with random weights")
+    parser.add_argument("--word-counts", default="8,32,128,300", help="Comma-separated words per text")
+    parser.add_argument("--batch-sizes", default="1,8,32", help="Comma-separated texts per batch")
+    parser.add_argument("--repeat", type=int, default=10, help="Timed iterations per stage")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed iterations per stage")
+    parser.add_argument("--threads", type=int, default=0, help="Intra-op torch threads (0 = torch default)")
+    parser.add_argument("--dynamic-padding", action="store_true", help="Pad to length buckets instead of 256 tokens")
+    parser.add_argument("--pack-sequences", action="store_true", help="Run the BiLSTM over real tokens only")
+    parser.add_argument("--xgb-engine", default="compiled", choices=["compiled", "xgboost"], help="XGBoost head implementation")
+    parser.add_argument("--xgb-trees", type=int, default=100, help="Boosting rounds of the synthetic XGBoost head")
+    parser.add_argument("--xgb-depth", type=int, default=6, help="Max depth of the synthetic XGBoost trees")
+    parser.add_argument("--base-config", default=DEFAULT_BASE_CONFIG, help="DistilBERT config the model is built from")
+    parser.add_argument("--tokenizer-path", default=None, help="Optional local tokenizer directory instead of the synthetic vocab")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the random weights and texts")
+    parser.add_argument("--output", default=None, help="Optional JSON results file")
+    args = parser.parse_args()
+
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)
+
+    print("🚀 Hybrid Pipeline Stage Benchmark")
+    print("=" * 72)
+
+    with tempfile.TemporaryDirectory(prefix="hybrid_stages_") as workdir:
+        inference = build_pipeline(workdir, args)
+
+        results = []
+        print(f"{'words':>6} {'batch':>6} " + " ".join(f"{stage:>9}" for stage in STAGES) + "   (p50 ms)")
+        for num_words in parse_int_list(args.word_counts):
+            for batch_size in parse_int_list(args.batch_sizes):
+                texts = make_texts(num_words, batch_size, seed=args.seed)
+                timings, tokens = time_stages(inference, texts, args.repeat, args.warmup)
+                results.append({"words": num_words, "batch_size": batch_size, **tokens, "stages": timings})
+                print(f"{num_words:>6} {batch_size:>6} " + " ".join(f"{timings[stage]['p50_ms']:>9.2f}" for stage in STAGES))
+
+    write_results({
+        "platform": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "torch": torch.__version__,
+            "xgboost": xgb.__version__,
+            "threads": torch.get_num_threads()
+        },
+        "config": {
+            "dynamic_padding": inference.dynamic_padding,
+            "pack_sequences": inference.pack_sequences,
+            "xgb_engine": args.xgb_engine,
+            "xgb_trees": args.xgb_trees,
+            "xgb_depth": args.xgb_depth,
+            "tokenizer": args.tokenizer_path or "synthetic",
+            "repeat": args.repeat
+        },
+        "results": results
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
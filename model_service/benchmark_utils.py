@@ -0,0 +1,77 @@
+"""
+Shared helpers for the model service benchmark scripts.
+"""
+
+import json
+import os
+import random
+import time
+from typing import Callable, Dict, List, Optional
+
+# Vocabulary used to build synthetic journal-style texts of a given length
+SAMPLE_WORDS = [
+    "i", "feel", "really", "anxious", "about", "my", "upcoming", "presentation", "heart", "is",
+    "racing", "and", "can't", "stop", "worrying", "been", "feeling", "down", "lately", "nothing",
+    "seems", "to", "bring", "me", "joy", "anymore", "hopeless", "so", "overwhelmed", "with",
+    "work", "the", "deadlines", "are", "piling", "up", "stressed", "all", "time", "today",
+    "was", "a", "normal", "day", "went", "had", "lunch", "friend", "watched", "movie",
+    "sad", "tired", "focus", "restless", "sleep", "night", "week", "mother", "job", "school"
+]
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model")
+
+
+def make_texts(num_words: int, count: int, seed: int = 0) -> List[str]:
+    """Build `count` synthetic texts of `num_words` words each."""
+    rng = random.Random(seed * 100003 + num_words)
+    return [" ".join(rng.choice(SAMPLE_WORDS) for _ in range(num_words)) for _ in range(count)]
+
+
+def time_call(fn: Callable[[], object], repeat: int = 20, warmup: int = 3) -> Dict[str, float]:
+    """Time `fn` and return latency statistics in milliseconds."""
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000.0)
+
+    samples.sort()
+    return {
+        "mean_ms": sum(samples) / len(samples),
+        "p50_ms": samples[len(samples) // 2],
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "min_ms": samples[0]
+    }
+
+
+def parse_int_list(value: str) -> List[int]:
+    """Parse a comma-separated list of integers, e.g. "1,8,32"."""
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def add_model_args(parser):
+    """Add the hybrid model artifact arguments shared by the benchmark scripts."""
+    parser.add_argument("--pytorch-path", default=os.getenv("HYBRID_PYTORCH_PATH", os.path.join(MODEL_DIR, "hybrid_model.pth")),
+                        help="Path to the hybrid PyTorch model (.pth)")
+    parser.add_argument("--xgb-path", default=os.getenv("HYBRID_XGB_PATH", os.path.join(MODEL_DIR, "xgboost_classifier.json")),
+                        help="Path to the XGBoost classifier (.json)")
+    parser.add_argument("--tokenizer-path", default=None, help="Optional local tokenizer directory")
+
+
+def max_score_diff(a: Dict, b: Dict) -> float:
+    """Largest per-label score difference between two prediction results."""
+    scores_a = {s["label"]: s["score"] for s in a["confidenceScores"]}
+    scores_b = {s["label"]: s["score"] for s in b["confidenceScores"]}
+    return max(abs(scores_a[label] - scores_b.get(label, 0.0)) for label in scores_a)
+
+
+def write_results(results: Dict, path: Optional[str]):
+    """Write benchmark results as JSON when an output path is given."""
+    if not path:
+        return
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Results written to {path}")
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Parity check and microbenchmark for the compiled XGBoost head against
+XGBClassifier.predict_proba across batch sizes.
+
+Uses the deployed xgboost_classifier.json when it exists, otherwise trains a
+synthetic 512-feature classifier shaped like the hybrid model's head.
+
+Usage:
+    python benchmark_xgb_head.py --batch-sizes 1,8,32,128,512
+"""
+
+import argparse
+import os
+import platform
+import sys
+import tempfile
+
+import numpy as np
+import xgboost as xgb
+
+from benchmark_utils import MODEL_DIR, parse_int_list, time_call, write_results
+from xgb_compiled import CompiledXGBoostClassifier
+
+PARITY_TOLERANCE = 1e-6
+
+
+def train_synthetic_head(path: str, num_features: int = 512, num_classes: int = 4, seed: int = 0):
+    """Train a small classifier on random features and save it as JSON."""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(2000, num_features)).astype(np.float32)
+    y = rng.integers(0, num_classes, size=2000)
+    classifier = xgb.XGBClassifier(n_estimators=100, max_depth=6)
+    classifier.fit(X, y)
+    classifier.save_model(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compiled XGBoost head parity check and microbenchmark")
+    parser.add_argument("--xgb-path", default=os.getenv("HYBRID_XGB_PATH", os.path.join(MODEL_DIR, "xgboost_classifier.json")),
+                        help="XGBoost classifier (.json); a synthetic one is trained if missing")
+    parser.add_argument("--batch-sizes", default="1,8,32,128,512", help="Comma-separated batch sizes")
+    parser.add_argument("--repeat", type=int, default=50, help="Timed iterations per batch size")
+    parser.add_argument("--output", default=None, help="Optional JSON results file")
+    args = parser.parse_args()
+
+    xgb_path = args.xgb_path
+    if not os.path.exists(xgb_path):
+        xgb_path = os.path.join(tempfile.mkdtemp(), "xgboost_classifier.json")
+        print(f"⚠️ {args.xgb_path} not found, training a synthetic head at {xgb_path}")
+        train_synthetic_head(xgb_path)
+
+    reference = xgb.XGBClassifier()
+    reference.load_model(xgb_path)
+    compiled = CompiledXGBoostClassifier.load(xgb_path)
+
+    print("🚀 XGBoost Head Benchmark")
+    print("=" * 64)
+    print(f"Trees: {compiled.num_trees}, max depth: {compiled.max_depth}, "
+          f"features: {compiled.num_features}, classes: {compiled.n_classes_}")
+
+    # Parity on random features, with some missing values to exercise default directions
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(1024, compiled.num_features)).astype(np.float32)
+    X[rng.random(X.shape) < 0.01] = np.nan
+    expected = reference.predict_proba(X)
+    actual = compiled.predict_proba(X)
+    max_diff = float(np.abs(expected - actual).max())
+    labels_match = bool((reference.predict(X) == compiled.predict(X)).all())
+    passed = max_diff <= PARITY_TOLERANCE and labels_match
+    print(f"Parity: max |diff| = {max_diff:.2e}, labels match: {labels_match}")
+
+    print()
+    print(f"{'batch':>6} {'xgboost p50':>12} {'compiled p50':>13} {'speedup':>8}")
+    rows = []
+    for batch_size in parse_int_list(args.batch_sizes):
+        batch = rng.normal(size=(batch_size, compiled.num_features)).astype(np.float32)
+        library = time_call(lambda: reference.predict_proba(batch), repeat=args.repeat)
+        vectorized = time_call(lambda: compiled.predict_proba(batch), repeat=args.repeat)
+        speedup = library["p50_ms"] / vectorized["p50_ms"] if vectorized["p50_ms"] else 0.0
+        print(f"{batch_size:>6} {library['p50_ms']:>10.3f}ms {vectorized['p50_ms']:>11.3f}ms {speedup:>7.2f}x")
+        rows.append({"batch_size": batch_size, "xgboost": library, "compiled": vectorized, "speedup": speedup})
+
+    print()
+    print("✅ Parity check passed" if passed else f"❌ Parity check failed (tolerance {PARITY_TOLERANCE})")
+
+    write_results({
+        "benchmark": "xgb_head",
+        "xgboost_version": xgb.__version__,
+        "platform": platform.platform(),
+        "num_trees": compiled.num_trees,
+        "max_depth": compiled.max_depth,
+        "parity_max_diff": max_diff,
+        "labels_match": labels_match,
+        "parity_passed": passed,
+        "results": rows
+    }, args.output)
+
+    if not passed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+In-process prediction result cache for the Virtual Therapist model service.
+Entries are keyed by a hash of the normalized text plus a fingerprint of the
+loaded model weights, and evicted least-recently-used by count, size and age.
+Per-message encoder states for session analysis are cached the same way.
+"""
+
+import copy
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+# Rough per-entry bookkeeping overhead (OrderedDict node, key, timestamps)
+ENTRY_OVERHEAD_BYTES = 200
+
+
+def normalize_text(text: str, lowercase: bool = True) -> str:
+    """Collapse whitespace and, for uncased tokenizers, case, so trivial edits share a cache entry."""
+    text = " ".join(text.split())
+    return text.lower() if lowercase else text
+
+
+def file_fingerprint(path: str) -> str:
+    """SHA-256 of a file's contents, or an empty string if it does not exist."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    except OSError:
+        return ""
+    return digest.hexdigest()
+
+
+def module_fingerprint(module, extra: Iterable[Any] = ()) -> str:
+    """
+    Cheap fingerprint of a torch module's loaded weights: names, shapes and a
+    checksum of every tensor in its state_dict, plus any extra identifying values.
+    """
+    digest = hashlib.sha256()
+    for name, entry in module.state_dict().items():
+        digest.update(name.encode())
+        # Dynamically quantized Linear layers store a (weight, bias) tuple
+        tensors = entry if isinstance(entry, tuple) else (entry,)
+        for tensor in tensors:
+            if not hasattr(tensor, "detach"):
+                digest.update(type(tensor).__name__.encode())
+                continue
+            values = tensor.detach()
+            if getattr(values, "is_quantized", False):
+                values = values.dequantize()
+            values = values.float()
+            digest.update(str(tuple(values.shape)).encode())
+            digest.update(repr(float(values.sum())).encode())
+            digest.update(values.flatten()[:16].cpu().numpy().tobytes())
+    for item in extra:
+        digest.update(repr(item).encode())
+    return digest.hexdigest()[:16]
+
+
+class PredictionCache:
+    """
+    Thread-safe LRU cache of prediction results, bounded by entry count and
+    approximate bytes, with an optional time-to-live.
+    """
+
+    def __init__(self, max_entries: int = 4096, max_bytes: int = 16 * 1024 * 1024, ttl_seconds: Optional[float] = None):
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(1, int(max_bytes))
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(text: str, fingerprint: str, lowercase: bool = True) -> str:
+        """Cache key for a text under a given model fingerprint."""
+        normalized = normalize_text(text, lowercase)
+        return hashlib.sha256(f"{fingerprint}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str, count_miss: bool = True) -> Optional[Any]:
+        """
+        Return a copy of the cached result, or None on a miss or expired entry.
+        Pass count_miss=False for a fast-path peek that a counted lookup will follow.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if count_miss:
+                    self.misses += 1
+                return None
+            value, size, stored_at = entry
+            if self.ttl_seconds is not None and time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self._bytes -= size
+                self.expirations += 1
+                if count_miss:
+                    self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(value)
+
+    def put(self, key: str, value: Any):
+        """Store a result, evicting least-recently-used entries to stay within bounds."""
+        size = len(json.dumps(value)) + len(key) + ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+        value = copy.deepcopy(value)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (value, size, time.monotonic())
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry; counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": True,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+
+class EncoderStateCache:
+    """
+    Thread-safe LRU cache of per-message DistilBERT hidden states (one
+    [tokens, dim] tensor per message), bounded by entry count and tensor bytes.
+    Cached tensors are shared, not copied: callers must treat them as read-only.
+    """
+
+    def __init__(self, max_entries: int = 8192, max_bytes: int = 256 * 1024 * 1024):
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(1, int(max_bytes))
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached states for key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, states):
+        """Store states, evicting least-recently-used entries to stay within bounds."""
+        size = states.element_size() * states.nelement() + len(key) + ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (states, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry; counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": True,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "evictions": self.evictions
+        }
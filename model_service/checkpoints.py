@@ -0,0 +1,80 @@
+"""
+Checkpoint loading and conversion for the model service.
+`.safetensors` checkpoints are memory-mapped read-only, so every worker on a host
+shares the same page-cache-backed weights instead of unpickling a private copy;
+pickled `.pth` checkpoints keep working unchanged.
+"""
+
+import os
+from typing import Dict, Optional
+
+import torch
+
+try:
+    from safetensors.torch import load_file, save_file
+    SAFETENSORS_AVAILABLE = True
+except ImportError:
+    SAFETENSORS_AVAILABLE = False
+
+SAFETENSORS_SUFFIX = ".safetensors"
+
+
+def is_safetensors(path: str) -> bool:
+    return str(path).endswith(SAFETENSORS_SUFFIX)
+
+
+def load_checkpoint(path: str, map_location="cpu"):
+    """
+    Load a checkpoint file. Safetensors files come back as a state dict whose CPU
+    tensors are views of the mapped file; anything else goes through torch.load.
+    """
+    if is_safetensors(path):
+        if not SAFETENSORS_AVAILABLE:
+            raise RuntimeError("safetensors is not installed")
+        return load_file(path, device=str(map_location))
+    return torch.load(path, map_location=map_location)
+
+
+def unwrap_state_dict(checkpoint) -> Optional[Dict[str, torch.Tensor]]:
+    """The state dict inside a checkpoint, or None for a pickled complete model."""
+    if isinstance(checkpoint, torch.nn.Module):
+        return None
+    if isinstance(checkpoint, dict):
+        if "state_dict" in checkpoint:
+            return checkpoint["state_dict"]
+        if "model_state_dict" in checkpoint:
+            return checkpoint["model_state_dict"]
+    return checkpoint
+
+
+def convert_to_safetensors(source: str, target: Optional[str] = None) -> str:
+    """
+    Convert a .pth checkpoint (state dict, wrapped state dict or complete model) to
+    .safetensors next to it, or at target. Returns the written path.
+    """
+    if not SAFETENSORS_AVAILABLE:
+        raise RuntimeError("safetensors is not installed")
+    target = target or os.path.splitext(source)[0] + SAFETENSORS_SUFFIX
+
+    # Complete pickled models cannot be read with weights_only
+    checkpoint = torch.load(source, map_location="cpu", weights_only=False)
+    state_dict = unwrap_state_dict(checkpoint)
+    if state_dict is None:
+        state_dict = checkpoint.state_dict()
+
+    # safetensors refuses tensors that share memory (e.g. tied embeddings), so copy repeats
+    tensors = {}
+    seen = set()
+    for name, tensor in state_dict.items():
+        tensor = tensor.detach().contiguous()
+        storage = tensor.untyped_storage().data_ptr()
+        if storage in seen:
+            tensor = tensor.clone()
+        seen.add(storage)
+        tensors[name] = tensor
+
+    # Written aside and renamed, so a service memory-mapping the old file keeps valid pages
+    tmp_target = target + ".tmp"
+    save_file(tensors, tmp_target, metadata={"format": "pt", "source": os.path.basename(source)})
+    os.replace(tmp_target, target)
+    return target
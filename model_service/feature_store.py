@@ -0,0 +1,246 @@
+"""
+Append-only, memory-mapped store of the hybrid model's BiLSTM feature vectors
+(the `final_state` the XGBoost head classifies), so a new head can be scored
+over every text seen so far without running DistilBERT again.
+
+Each encoder version (a fingerprint of the DistilBERT-BiLSTM weights and
+padding settings) gets its own directory:
+
+    meta.json     dimension, storage dtype and encoder version
+    keys.bin      32-byte SHA-256 of each normalized text, one per row
+    vectors.bin   row-major vectors as float32, float16 or int8 (int8 is lossy
+                  enough to flip some XGBoost decisions; float16 rarely does)
+    scales.bin    float32 scale per row (int8 only: vector = int8 * scale)
+
+Rows are only ever appended. A row counts once its key is written, and the key
+is written last, so a crash mid-append leaves at most a torn tail that the next
+writer truncates. Appends from several worker processes are serialized with an
+advisory file lock where the platform has one.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from cache import normalize_text
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:  # Windows: appends are only serialized within the process
+    FCNTL_AVAILABLE = False
+
+# Supported values for FeatureStore(dtype=...)
+STORE_DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+KEY_BYTES = 32
+STORE_FORMAT_VERSION = 1
+
+
+def text_key(text: str, lowercase: bool = True) -> bytes:
+    """Store key of a text: SHA-256 of the text normalized like the prediction cache does."""
+    return hashlib.sha256(normalize_text(text, lowercase).encode("utf-8")).digest()
+
+
+def quantize_rows(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 quantization; returns (int8 rows, float32 scales)."""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+class FeatureStore:
+    """Feature vectors of one encoder version, keyed by text hash."""
+
+    def __init__(self, root: str, encoder_version: str, dtype: str = "float32",
+                 dim: Optional[int] = None, lowercase: bool = True):
+        self.directory = os.path.join(root, encoder_version)
+        self.encoder_version = encoder_version
+        self.lowercase = lowercase
+        os.makedirs(self.directory, exist_ok=True)
+
+        meta_path = os.path.join(self.directory, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            # An existing store keeps its layout; the requested dtype only applies to new ones
+            dtype, stored_dim = meta["dtype"], meta["dim"]
+            if dim is not None and dim != stored_dim:
+                raise ValueError(f"Feature store {self.directory} holds {stored_dim}-d vectors, not {dim}-d")
+            dim = stored_dim
+        elif dtype not in STORE_DTYPES:
+            raise ValueError(f"Unknown feature store dtype: {dtype}")
+        self.dtype = dtype
+        self.dim = dim
+
+        self._paths = {name: os.path.join(self.directory, name) for name in ("keys.bin", "vectors.bin", "scales.bin")}
+        self._lock = threading.Lock()
+        self._index: Dict[bytes, int] = {}
+        self._rows = 0
+        self._maps = None
+        self._mapped_rows = -1
+        self._sync()
+
+    @classmethod
+    def versions(cls, root: str) -> List[str]:
+        """Encoder versions with a store under root."""
+        if not os.path.isdir(root):
+            return []
+        return sorted(name for name in os.listdir(root) if os.path.exists(os.path.join(root, name, "meta.json")))
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def key(self, text: str) -> bytes:
+        return text_key(text, self.lowercase)
+
+    def _row_bytes(self) -> int:
+        return self.dim * np.dtype(STORE_DTYPES[self.dtype]).itemsize
+
+    def _write_meta(self):
+        meta = {"format": STORE_FORMAT_VERSION, "encoder_version": self.encoder_version, "dim": self.dim, "dtype": self.dtype}
+        tmp_path = os.path.join(self.directory, "meta.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp_path, os.path.join(self.directory, "meta.json"))
+
+    def _sync(self):
+        """Index keys appended since the last sync, including by other processes."""
+        try:
+            committed = os.path.getsize(self._paths["keys.bin"]) // KEY_BYTES
+        except OSError:
+            committed = 0
+        if committed <= self._rows:
+            return
+        with open(self._paths["keys.bin"], "rb") as f:
+            f.seek(self._rows * KEY_BYTES)
+            data = f.read((committed - self._rows) * KEY_BYTES)
+        for offset in range(0, len(data), KEY_BYTES):
+            self._index.setdefault(data[offset:offset + KEY_BYTES], self._rows + offset // KEY_BYTES)
+        self._rows = committed
+
+    def contains(self, texts: Sequence[str]) -> List[bool]:
+        with self._lock:
+            self._sync()
+            return [self.key(text) in self._index for text in texts]
+
+    def append(self, texts: Sequence[str], vectors) -> int:
+        """Store the vectors of texts not stored yet; returns how many rows were added."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(texts):
+            raise ValueError("Expected one feature vector per text")
+
+        with self._lock:
+            lock_file = open(os.path.join(self.directory, "append.lock"), "a")
+            try:
+                if FCNTL_AVAILABLE:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._sync()
+                if self.dim is None:
+                    self.dim = vectors.shape[1]
+                    self._write_meta()
+                elif vectors.shape[1] != self.dim:
+                    raise ValueError(f"Expected {self.dim}-d vectors, got {vectors.shape[1]}-d")
+
+                # Each new key once, in input order
+                rows, keys = [], []
+                seen = set()
+                for i, text in enumerate(texts):
+                    key = self.key(text)
+                    if key not in self._index and key not in seen:
+                        seen.add(key)
+                        rows.append(i)
+                        keys.append(key)
+                if not rows:
+                    return 0
+
+                new = vectors[rows]
+                data = {"vectors.bin": new.astype(STORE_DTYPES[self.dtype]).tobytes()}
+                if self.dtype == "int8":
+                    quantized, scales = quantize_rows(new)
+                    data = {"vectors.bin": quantized.tobytes(), "scales.bin": scales.tobytes()}
+                row_bytes = {"vectors.bin": self._row_bytes(), "scales.bin": 4}
+
+                # Payload first, then the keys that commit it; cut any torn tail a crash left behind
+                for name, payload in data.items():
+                    with open(self._paths[name], "ab") as f:
+                        f.truncate(self._rows * row_bytes[name])
+                        f.write(payload)
+                        f.flush()
+                with open(self._paths["keys.bin"], "ab") as f:
+                    f.truncate(self._rows * KEY_BYTES)
+                    f.write(b"".join(keys))
+                    f.flush()
+
+                for offset, key in enumerate(keys):
+                    self._index[key] = self._rows + offset
+                self._rows += len(keys)
+                return len(keys)
+            finally:
+                if FCNTL_AVAILABLE:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+
+    def _mapped(self):
+        """Read-only memory maps of the committed rows, remapped when the store has grown."""
+        if self._mapped_rows != self._rows:
+            if self._rows == 0:
+                self._maps = None
+            else:
+                self._maps = {
+                    "keys": np.memmap(self._paths["keys.bin"], dtype=np.uint8, mode="r", shape=(self._rows, KEY_BYTES)),
+                    "vectors": np.memmap(self._paths["vectors.bin"], dtype=STORE_DTYPES[self.dtype], mode="r", shape=(self._rows, self.dim))
+                }
+                if self.dtype == "int8":
+                    self._maps["scales"] = np.memmap(self._paths["scales.bin"], dtype=np.float32, mode="r", shape=(self._rows,))
+            self._mapped_rows = self._rows
+        return self._maps
+
+    def _decode(self, maps, rows) -> np.ndarray:
+        vectors = np.asarray(maps["vectors"][rows], dtype=np.float32)
+        if self.dtype == "int8":
+            vectors *= maps["scales"][rows][:, None]
+        return vectors
+
+    def get(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """(found mask, float32 vectors of the found texts in input order)."""
+        with self._lock:
+            self._sync()
+            rows = [self._index.get(self.key(text), -1) for text in texts]
+            found = np.array([row >= 0 for row in rows], dtype=bool)
+            maps = self._mapped()
+            if maps is None or not found.any():
+                return found, np.zeros((0, self.dim or 0), dtype=np.float32)
+            return found, self._decode(maps, np.array([row for row in rows if row >= 0]))
+
+    def iter_chunks(self, chunk_rows: int = 65536) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """(keys as [n, 32] uint8, float32 vectors) for every stored row, chunk_rows rows at a time."""
+        with self._lock:
+            self._sync()
+            maps = self._mapped()
+            rows = self._rows
+        if maps is None:
+            return
+        for start in range(0, rows, chunk_rows):
+            stop = min(start + chunk_rows, rows)
+            yield np.asarray(maps["keys"][start:stop]), self._decode(maps, slice(start, stop))
+
+    def stats(self) -> Dict:
+        size = 0
+        for path in self._paths.values():
+            if os.path.exists(path):
+                size += os.path.getsize(path)
+        return {
+            "enabled": True,
+            "directory": self.directory,
+            "encoder_version": self.encoder_version,
+            "dtype": self.dtype,
+            "dim": self.dim,
+            "rows": self._rows,
+            "bytes": size
+        }
@@ -0,0 +1,185 @@
+"""
+Zero-downtime reload of the hybrid model.
+
+A reload builds a new model in a background thread while the current one keeps
+serving, warms it up, checks it on a golden set and only then hands it to the
+service, which swaps it in with a single reference assignment. Requests that
+already hold the old model finish on it; it is freed once they drop it. A model
+that fails to build, warm up or validate is discarded and the old one stays.
+
+Reloads are started from the admin endpoint or by watching the weight files:
+a change is picked up once the files have stopped changing for one poll, so a
+copy in progress is not loaded half-written.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+
+def load_golden_set(path: str) -> Tuple[List[str], Optional[List[str]]]:
+    """Texts and, if every line has one, expected labels from a .jsonl file of {"text", "label"} objects."""
+    texts, labels = [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                texts.append(item["text"])
+                labels.append(item.get("label"))
+    if not texts:
+        raise ValueError(f"Golden set {path} is empty")
+    return texts, labels if all(label is not None for label in labels) else None
+
+
+def files_stamp(paths: Sequence[str]) -> Tuple:
+    """(size, mtime) of every existing path; changes whenever one of the files is rewritten."""
+    stamp = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            stamp.append((path, stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            stamp.append((path, None, None))
+    return tuple(stamp)
+
+
+def check_loaded(model):
+    """Raise if the new model skipped a missing or broken artifact, which a first load only warns about."""
+    quantized = model.quantize == "int8" and bool(model.quantized_path) and os.path.exists(model.quantized_path)
+    if not os.path.exists(model.model_path) and not quantized:
+        raise ValueError(f"PyTorch weights not found at {model.model_path}")
+    if os.path.exists(model.xgb_path) and model.xgb_model is None:
+        raise ValueError(f"XGBoost head at {model.xgb_path} could not be loaded")
+
+
+def validate_results(results: List[Dict[str, Any]], labels: Optional[List[str]], min_agreement: float) -> Dict[str, Any]:
+    """Raise unless every result is a proper distribution and enough expected labels are matched."""
+    for i, result in enumerate(results):
+        scores = [entry["score"] for entry in result["confidenceScores"]]
+        if not all(math.isfinite(score) and 0.0 <= score <= 1.0 for score in scores) or abs(sum(scores) - 1.0) > 1e-3:
+            raise ValueError(f"Golden text {i} got invalid scores: {scores}")
+    report = {"texts": len(results), "agreement": None}
+    if labels is not None:
+        agreement = sum(result["topPattern"] == label for result, label in zip(results, labels)) / len(labels)
+        report["agreement"] = agreement
+        if agreement < min_agreement:
+            raise ValueError(f"Golden set agreement {agreement:.1%} is below {min_agreement:.1%}")
+    return report
+
+
+class ModelReloader:
+    """Builds, warms and validates replacement models one at a time, then installs them."""
+
+    def __init__(self, build: Callable[[], Any], install: Callable[[Any], None], golden_texts: List[str],
+                 golden_labels: Optional[List[str]] = None, min_agreement: float = 0.9,
+                 watch_paths: Sequence[str] = (), nice: int = 10):
+        self.build = build
+        self.install = install
+        self.golden_texts = list(golden_texts)
+        self.golden_labels = golden_labels
+        self.min_agreement = min_agreement
+        self.watch_paths = list(watch_paths)
+        self.nice = nice
+
+        self._lock = threading.Lock()
+        self._running = False
+        self.generation = 0
+        self.reloads = 0
+        self.failures = 0
+        self.current: Dict[str, Any] = {}
+        self.last_reload: Optional[Dict[str, Any]] = None
+        self._loaded_stamp = files_stamp(self.watch_paths)
+        self._watching = False
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "running": self._running,
+            "current": dict(self.current) if self._running else None,
+            "generation": self.generation,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "watching": self._watching,
+            "last_reload": self.last_reload
+        }
+
+    def reload(self, reason: str = "admin") -> Dict[str, Any]:
+        """Start a reload in the background; raises if one is already running."""
+        with self._lock:
+            if self._running:
+                raise RuntimeError("A model reload is already running")
+            self._running = True
+            self.current = {"reason": reason, "stage": "building", "started_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        threading.Thread(target=self._run, args=(reason,), name="model-reload", daemon=True).start()
+        return self.status()
+
+    def _run(self, reason: str):
+        started = time.perf_counter()
+        stamp = files_stamp(self.watch_paths)
+        report = {"reason": reason, "started_at": self.current["started_at"]}
+        self._lower_priority()
+        print(f"[analysis_service] Reloading hybrid model ({reason})...")
+        try:
+            model = self.build()
+            report["build_s"] = time.perf_counter() - started
+            check_loaded(model)
+
+            self.current["stage"] = "warming up"
+            report["warmup_ms"] = model.warmup()
+
+            self.current["stage"] = "validating"
+            report["golden_set"] = validate_results(
+                model.predict_batch_strict(self.golden_texts), self.golden_labels, self.min_agreement
+            )
+
+            self.current["stage"] = "installing"
+            self.install(model)
+            self.generation += 1
+            self.reloads += 1
+            report.update(result="success", generation=self.generation, fingerprint=model.fingerprint)
+            print(f"[analysis_service] ✅ Hybrid model reloaded in {time.perf_counter() - started:.1f}s "
+                  f"(generation {self.generation}, fingerprint {model.fingerprint})")
+        except Exception as e:
+            self.failures += 1
+            report.update(result="failed", error=str(e), stage=self.current.get("stage"))
+            print(f"[analysis_service] ❌ Hybrid model reload failed, keeping the current model: {e}")
+        finally:
+            # A failed set of files is not retried until it changes again
+            self._loaded_stamp = stamp
+            report["seconds"] = time.perf_counter() - started
+            report["finished_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+            self.last_reload = report
+            with self._lock:
+                self._running = False
+
+    def _lower_priority(self):
+        """Let the serving threads win the CPU while this thread loads (Linux: per-thread nice)."""
+        if self.nice <= 0 or not hasattr(os, "setpriority") or not hasattr(threading, "get_native_id"):
+            return
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), self.nice)
+        except OSError:
+            pass
+
+    def watch(self, poll_seconds: float):
+        """Reload whenever the watched files change, checking every poll_seconds."""
+        if poll_seconds <= 0 or not self.watch_paths or self._watching:
+            return
+        self._watching = True
+        threading.Thread(target=self._watch_loop, args=(poll_seconds,), name="model-watch", daemon=True).start()
+        print(f"[analysis_service] Watching {', '.join(self.watch_paths)} for new weights every {poll_seconds:g}s")
+
+    def _watch_loop(self, poll_seconds: float):
+        previous = files_stamp(self.watch_paths)
+        while True:
+            time.sleep(poll_seconds)
+            stamp = files_stamp(self.watch_paths)
+            settled = stamp == previous
+            previous = stamp
+            if settled and stamp != self._loaded_stamp and not self._running:
+                try:
+                    self.reload("file change")
+                except RuntimeError:
+                    pass
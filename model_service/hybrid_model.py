@@ -7,11 +7,24 @@ import torch
 import torch.nn as nn
 import numpy as np
 import xgboost as xgb
-from transformers import DistilBertModel, DistilBertTokenizer
+from transformers import DistilBertConfig, DistilBertModel, DistilBertTokenizer
+import contextlib
+import hashlib
 import joblib
 import os
+import time
 from typing import Dict, List, Tuple, Optional
 
+try:
+    from transformers.modeling_utils import no_init_weights
+except ImportError:
+    no_init_weights = contextlib.nullcontext
+
+from checkpoints import load_checkpoint
+from cache import PredictionCache, file_fingerprint, module_fingerprint
+from onnx_backend import OnnxHybridSession, export_onnx
+from xgb_compiled import CompiledXGBoostClassifier
+
 # Ensure numpy is available
 try:
     import numpy as np
@@ -29,16 +42,86 @@ except ImportError:
             return 1.0
     np = DummyNumpy()
 
+# Architecture of distilbert-base-uncased, bundled so the hybrid model can be built without
+# a hub lookup or reading base weights that the fine-tuned checkpoint overwrites anyway
+DEFAULT_BASE_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "distilbert_config.json")
+
+# Sequence lengths that dynamically padded inputs are rounded up to, so the
+# model only ever sees a handful of distinct input shapes.
+DEFAULT_LENGTH_BUCKETS = (16, 32, 64, 128, 256)
+
+# Supported values for HybridModelInference(quantize=...)
+QUANTIZATION_MODES = ("none", "int8")
+
+# Supported values for HybridModelInference(backend=...)
+BACKENDS = ("torch", "onnx")
+
+# Supported values for HybridModelInference(compile_mode=...)
+COMPILE_MODES = ("none", "torchscript")
+
+# Supported values for HybridModelInference(long_text=...)
+LONG_TEXT_MODES = ("truncate", "window")
+
+# Supported values for HybridModelInference(window_aggregation=...)
+WINDOW_AGGREGATIONS = ("mean_probs", "max_probs", "mean_features")
+
+# Longest window DistilBERT's position embeddings allow, [CLS] and [SEP] included
+MAX_WINDOW_SIZE = 512
+
+# Golden texts an alternative backend must reproduce before it is allowed to serve
+PARITY_TEXTS = [
+    "I feel really anxious about my upcoming presentation and can't stop worrying.",
+    "I've been feeling down lately and nothing brings me joy anymore.",
+    "Can't focus, restless.",
+    "Some days I have so much energy I barely sleep, and then I crash for a week and can't get out of bed."
+]
+
+def quantize_dynamic_int8(model: nn.Module) -> nn.Module:
+    """Dynamically quantize Linear layers (DistilBERT, classifier) and the LSTM to int8, in place."""
+    return torch.ao.quantization.quantize_dynamic(model, {nn.Linear, nn.LSTM}, dtype=torch.qint8, inplace=True)
+
+def save_quantized_model(model: nn.Module, path: str):
+    """Save an int8 model produced by quantize_dynamic_int8 as a pre-quantized artifact."""
+    torch.save({"quantized": "int8", "state_dict": model.state_dict()}, path)
+
+def compile_model(model: nn.Module, sample_length: int = 32) -> torch.jit.ScriptModule:
+    """
+    Trace the model, freeze its weights into the graph and apply TorchScript's
+    inference passes (Conv/Linear-BN folding, op fusion). The traced graph keeps
+    dynamic batch and sequence dimensions.
+    """
+    model.eval()
+    input_ids = torch.ones((2, sample_length), dtype=torch.long)
+    attention_mask = torch.ones((2, sample_length), dtype=torch.long)
+    attention_mask[1, sample_length // 2:] = 0
+    device = next(model.parameters(), input_ids).device
+    with torch.inference_mode():
+        traced = torch.jit.trace(model, (input_ids.to(device), attention_mask.to(device)), strict=False, check_trace=False)
+    return torch.jit.optimize_for_inference(torch.jit.freeze(traced.eval()))
+
+def load_base_config(path: str) -> DistilBertConfig:
+    """Read a DistilBERT config from a config.json file or a model directory."""
+    if os.path.isdir(path):
+        return DistilBertConfig.from_pretrained(path)
+    return DistilBertConfig.from_json_file(path)
+
 class DistilBERT_BiLSTM_Hybrid(nn.Module):
     """
     Hybrid model combining DistilBERT, BiLSTM, and XGBoost for mental health classification.
     """
     
-    def __init__(self, num_labels: int = 4, hidden_dim: int = 256, lstm_layers: int = 1, dropout_prob: float = 0.3):
+    def __init__(self, num_labels: int = 4, hidden_dim: int = 256, lstm_layers: int = 1, dropout_prob: float = 0.3,
+                 pack_sequences: bool = False, base_config: Optional[DistilBertConfig] = None):
         super(DistilBERT_BiLSTM_Hybrid, self).__init__()
-        self.distilbert = DistilBertModel.from_pretrained('distilbert-base-uncased')
+        if base_config is not None:
+            # Architecture only; the weights are expected to come from a checkpoint
+            self.distilbert = DistilBertModel(base_config)
+        else:
+            self.distilbert = DistilBertModel.from_pretrained('distilbert-base-uncased')
         self.hidden_dim = hidden_dim
         self.num_labels = num_labels
+        # Mask-aware mode: run the BiLSTM over real tokens only, skipping padding
+        self.pack_sequences = pack_sequences
 
         self.lstm = nn.LSTM(
             input_size=self.distilbert.config.dim,
@@ -58,11 +141,22 @@ class DistilBERT_BiLSTM_Hybrid(nn.Module):
         """
         Forward pass through DistilBERT and BiLSTM layers.
         Returns both features (for XGBoost) and logits (for direct classification).
+        With pack_sequences enabled, the BiLSTM only walks the tokens covered by attention_mask.
         """
-        distilbert_output = self.distilbert(input_ids=input_ids, attention_mask=attention_mask)
-        sequence_output = distilbert_output.last_hidden_state
+        return self.lstm_head(self.encode(input_ids, attention_mask), attention_mask)
 
-        lstm_output, (h_n, c_n) = self.lstm(sequence_output)
+    def encode(self, input_ids, attention_mask):
+        """DistilBERT token states for the batch."""
+        return self.distilbert(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+    def lstm_head(self, sequence_output, attention_mask):
+        """BiLSTM final states over DistilBERT's token states, and the classifier logits."""
+        if getattr(self, 'pack_sequences', False):
+            lengths = attention_mask.sum(dim=1).clamp(min=1).cpu()
+            packed = nn.utils.rnn.pack_padded_sequence(sequence_output, lengths, batch_first=True, enforce_sorted=False)
+            _, (h_n, c_n) = self.lstm(packed)
+        else:
+            lstm_output, (h_n, c_n) = self.lstm(sequence_output)
         final_state = torch.cat((h_n[-2, :, :], h_n[-1, :, :]), dim=1)
 
         return final_state, self.classifier(final_state)
@@ -72,27 +166,127 @@ class HybridModelInference:
     Inference class for the hybrid DistilBERT-BiLSTM-XGBoost model.
     """
     
-    def __init__(self, model_path: str, xgb_path: str, tokenizer_path: Optional[str] = None, labels: Optional[List[str]] = None):
+    def __init__(self, model_path: str, xgb_path: str, tokenizer_path: Optional[str] = None, labels: Optional[List[str]] = None,
+                 dynamic_padding: Optional[bool] = None, length_buckets: Optional[List[int]] = None,
+                 pack_sequences: bool = False, xgb_engine: str = "compiled",
+                 quantize: str = "none", quantized_path: Optional[str] = None,
+                 backend: str = "torch", onnx_path: Optional[str] = None, onnx_export: bool = True,
+                 parity_tolerance: float = 1e-3,
+                 compile_mode: str = "none", warmup_batch_sizes: Optional[List[int]] = None,
+                 long_text: str = "truncate", window_size: int = 256, window_stride: int = 192,
+                 max_windows: int = 16, window_aggregation: str = "mean_probs", window_batch_size: int = 32,
+                 base_config_path: Optional[str] = DEFAULT_BASE_CONFIG,
+                 num_labels: int = 4, hidden_dim: int = 256, lstm_layers: int = 1):
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.model_path = model_path
         self.xgb_path = xgb_path
         
+        # "int8" runs DistilBERT's Linear layers and the BiLSTM dynamically quantized (CPU only)
+        if quantize not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization mode: {quantize}")
+        self.quantize = quantize
+        self.quantized_path = quantized_path
+        if self.quantize == "int8":
+            self.device = torch.device("cpu")
+        
+        # "onnx" runs DistilBERT-BiLSTM with onnxruntime (re-exported from the loaded weights if
+        # missing or exported from others; publish_onnx() moves the new graph over onnx_path).
+        # onnx_export=False serves onnx_path as given and never writes next to it.
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend: {backend}")
+        if backend == "onnx" and (pack_sequences or self.quantize != "none"):
+            raise ValueError("The onnx backend does not support packed sequences or int8 quantization")
+        self.backend = backend
+        self.onnx_path = onnx_path
+        self.onnx_export = onnx_export
+        self.staged_onnx_path = None
+        self.parity_tolerance = parity_tolerance
+        
+        # "torchscript" serves a traced, frozen graph of the torch model, warmed up on every bucket
+        if compile_mode not in COMPILE_MODES:
+            raise ValueError(f"Unknown compile mode: {compile_mode}")
+        if compile_mode != "none" and backend != "torch":
+            raise ValueError("compile_mode only applies to the torch backend")
+        self.compile_mode = compile_mode
+        self.warmup_batch_sizes = sorted(set(int(b) for b in (warmup_batch_sizes or [1]) if int(b) > 0))
+        self.warmup_ms = None
+        
+        # "compiled" evaluates the XGBoost trees as NumPy arrays, "xgboost" uses the library
+        self.xgb_engine = xgb_engine
+        
+        # Default label order as per user's trained model, can be overridden.
+        # Set before loading, since both loaders read it.
+        self.labels = labels if labels and len(labels) > 0 else ['Depression', 'ADHD', 'Bipolar', 'Anxiety']
+        self.label_map = {i: label for i, label in enumerate(self.labels)}
+        
+        # Run the BiLSTM over real tokens only (packed sequences)
+        self.pack_sequences = pack_sequences
+        
+        # Pad to the real length rounded up to a bucket instead of always to max_length.
+        # Once the BiLSTM skips padding, the pad length no longer changes the output,
+        # so bucketing follows pack_sequences unless set explicitly.
+        self.dynamic_padding = pack_sequences if dynamic_padding is None else dynamic_padding
+        self.length_buckets = sorted(set(int(b) for b in (length_buckets or DEFAULT_LENGTH_BUCKETS) if int(b) > 0))
+        
+        # "window" splits texts longer than window_size tokens into windows window_stride tokens
+        # apart (at most max_windows per text) instead of truncating them. The windows of a whole
+        # batch run through the model together, window_batch_size rows per forward pass, and
+        # window_aggregation combines them into one prediction per text.
+        if long_text not in LONG_TEXT_MODES:
+            raise ValueError(f"Unknown long text mode: {long_text}")
+        if window_aggregation not in WINDOW_AGGREGATIONS:
+            raise ValueError(f"Unknown window aggregation: {window_aggregation}")
+        if not 3 <= window_size <= MAX_WINDOW_SIZE:
+            raise ValueError(f"window_size must be between 3 and {MAX_WINDOW_SIZE}")
+        if not 1 <= window_stride <= window_size - 2:
+            raise ValueError("window_stride must be between 1 and window_size - 2")
+        if max_windows < 1 or window_batch_size < 1:
+            raise ValueError("max_windows and window_batch_size must be positive")
+        self.long_text = long_text
+        self.window_size = window_size
+        self.window_stride = window_stride
+        self.max_windows = max_windows
+        self.window_aggregation = window_aggregation
+        self.window_batch_size = window_batch_size
+        
         # Load tokenizer
         if tokenizer_path and os.path.exists(tokenizer_path):
             self.tokenizer = DistilBertTokenizer.from_pretrained(tokenizer_path)
         else:
             self.tokenizer = DistilBertTokenizer.from_pretrained('distilbert-base-uncased')
         
-        # Initialize model
-        self.model = DistilBERT_BiLSTM_Hybrid(
-            num_labels=4,  # Updated to 4 classes: Depression, ADHD, Bipolar, Anxiety
-            hidden_dim=256,
-            lstm_layers=1,
-            dropout_prob=0.3
+        # When a checkpoint will overwrite every weight, build the architecture from the
+        # bundled config and skip both the base weight load and the random init
+        use_quantized = self.quantize == "int8" and bool(self.quantized_path) and os.path.exists(self.quantized_path)
+        base_config = None
+        self.weights_deferred = (
+            bool(base_config_path) and os.path.exists(base_config_path)
+            and (use_quantized or os.path.exists(self.model_path))
         )
+        init_context = contextlib.nullcontext()
+        if self.weights_deferred:
+            base_config = load_base_config(base_config_path)
+            init_context = no_init_weights()
         
-        # Load PyTorch model weights
-        self._load_pytorch_model()
+        # Initialize model
+        with init_context:
+            self.model = DistilBERT_BiLSTM_Hybrid(
+                num_labels=num_labels,  # 4 classes by default: Depression, ADHD, Bipolar, Anxiety
+                hidden_dim=hidden_dim,
+                lstm_layers=lstm_layers,
+                dropout_prob=0.3,
+                pack_sequences=pack_sequences,
+                base_config=base_config
+            )
+        
+        # Load PyTorch model weights, quantizing them to int8 if requested
+        if use_quantized:
+            self._load_quantized_model()
+        else:
+            self._load_pytorch_model()
+            if self.quantize == "int8":
+                self.model = quantize_dynamic_int8(self.model.eval())
+                print("✅ Quantized DistilBERT Linear layers and BiLSTM to int8")
         
         # Load XGBoost model
         self._load_xgboost_model()
@@ -103,29 +297,55 @@ class HybridModelInference:
         # Initialize model output type detection flag
         self.model_outputs_logits = False
         
-        # Default label order as per user's trained model, can be overridden
-        self.labels = labels if labels and len(labels) > 0 else ['Depression', 'ADHD', 'Bipolar', 'Anxiety']
-        self.label_map = {i: label for i, label in enumerate(self.labels)}
+        # Callable used for the DistilBERT-BiLSTM forward pass
+        self.runner = self.model
+        if self.backend == "onnx":
+            self._load_onnx_backend()
+        elif self.compile_mode == "torchscript":
+            self._load_compiled_model()
+        
+        # Fingerprint of everything that shapes the feature vectors (weights, padding, windowing),
+        # naming the feature store they are kept in
+        window_settings = (self.window_size, self.window_stride, self.max_windows, self.window_aggregation) if self.long_text == "window" else ()
+        self.encoder_fingerprint = module_fingerprint(
+            self.model, extra=(self.pack_sequences, self.dynamic_padding, tuple(self.length_buckets)) + window_settings
+        )
+        # ...plus the XGBoost head, used to key cached predictions
+        self.fingerprint = hashlib.sha256(f"{self.encoder_fingerprint}:{file_fingerprint(self.xgb_path)}".encode()).hexdigest()[:16]
+        self.cache = None
+        # Optional cache.EncoderStateCache of per-message DistilBERT states for predict_session
+        self.state_cache = None
+        # Optional feature_store.FeatureStore that keeps the feature vector of every text the model scores
+        self.feature_store = None
+        # Optional metrics.PipelineMetrics recording stage latency, batch sizes and fallbacks
+        self.metrics = None
+        # Optional profiling.ProfileCapture; only its `active` flag is read while it is idle
+        self.profiler = None
     
     def _load_pytorch_model(self):
         """Load the PyTorch model weights with robust handling."""
         try:
             if os.path.exists(self.model_path):
-                # Load with CPU map_location for compatibility
-                state_dict = torch.load(self.model_path, map_location=self.device)
+                # .safetensors checkpoints are memory-mapped; .pth files are unpickled
+                state_dict = load_checkpoint(self.model_path, map_location=self.device)
+                
+                # An uninitialized skeleton can take the loaded tensors as-is instead of copying them,
+                # which keeps memory-mapped weights shared with other workers
+                assign = self.weights_deferred
                 
                 # Handle different save formats
                 if isinstance(state_dict, dict):
                     if "state_dict" in state_dict:
-                        self.model.load_state_dict(state_dict["state_dict"])
+                        self.model.load_state_dict(state_dict["state_dict"], assign=assign)
                     elif "model_state_dict" in state_dict:
-                        self.model.load_state_dict(state_dict["model_state_dict"])
+                        self.model.load_state_dict(state_dict["model_state_dict"], assign=assign)
                     else:
                         # Try to load as state dict directly
-                        self.model.load_state_dict(state_dict)
+                        self.model.load_state_dict(state_dict, assign=assign)
                 else:
                     # Load as complete model
                     self.model = state_dict
+                    self.model.pack_sequences = self.pack_sequences
                 
                 print(f"✅ Loaded PyTorch model from {self.model_path}")
                 
@@ -138,6 +358,29 @@ class HybridModelInference:
             print(f"❌ Error loading PyTorch model: {e}")
             raise
     
+    def _load_quantized_model(self):
+        """Load a pre-quantized int8 artifact written by save_quantized_model."""
+        try:
+            # Pre-quantized LSTM weights are packed script objects, so this local
+            # artifact cannot be read with weights_only=True
+            checkpoint = torch.load(self.quantized_path, map_location="cpu", weights_only=False)
+            if not isinstance(checkpoint, dict) or checkpoint.get("quantized") != "int8":
+                raise ValueError(f"{self.quantized_path} is not an int8 artifact")
+            if self.weights_deferred:
+                # Skeleton weights are uninitialized memory; keep them finite for the int8 observers
+                with torch.no_grad():
+                    for parameter in self.model.parameters():
+                        parameter.zero_()
+            self.model = quantize_dynamic_int8(self.model.eval())
+            self.model.load_state_dict(checkpoint["state_dict"])
+            print(f"✅ Loaded pre-quantized int8 model from {self.quantized_path}")
+            
+            # Runtime detection: test if model outputs features or logits
+            self._detect_model_output_type()
+        except Exception as e:
+            print(f"❌ Error loading quantized model: {e}")
+            raise
+    
     def _detect_model_output_type(self):
         """Detect whether the model outputs features or logits."""
         try:
@@ -160,6 +403,94 @@ class HybridModelInference:
             print(f"⚠️ Could not detect model output type: {e}")
             self.model_outputs_logits = False  # Default to XGBoost
     
+    def _load_onnx_backend(self):
+        """
+        Load the ONNX graph and only serve it if it matches PyTorch. A missing graph, or one
+        exported from other weights (by the fingerprint stored in it), is exported next to it and
+        left for publish_onnx(), so the model serving meanwhile keeps its own file.
+        """
+        if not self.onnx_path:
+            raise ValueError("onnx_path is required for the onnx backend")
+        path = self.onnx_path
+        session = OnnxHybridSession(path) if os.path.exists(path) or not self.onnx_export else None
+        weights = module_fingerprint(self.model)
+        if self.onnx_export and (session is None or session.metadata.get("weights_fingerprint") != weights):
+            print(f"⚠️ ONNX model at {self.onnx_path} is missing or was exported from other weights, exporting it from the loaded weights")
+            path = self.onnx_path + ".tmp"
+            export_onnx(self.model, path, metadata={"weights_fingerprint": weights})
+            session = None
+        try:
+            session = session or OnnxHybridSession(path)
+            self._check_backend_parity(session, "ONNX")
+        except Exception:
+            # A graph that will never serve is not left behind
+            if path != self.onnx_path and os.path.exists(path):
+                os.remove(path)
+            raise
+        self.runner = session
+        self.staged_onnx_path = path if path != self.onnx_path else None
+        print(f"✅ Serving DistilBERT-BiLSTM with onnxruntime from {path}")
+    
+    def publish_onnx(self):
+        """Move a graph exported by this load over onnx_path; called when the model starts serving."""
+        if self.staged_onnx_path:
+            os.replace(self.staged_onnx_path, self.onnx_path)
+            self.staged_onnx_path = None
+            self.runner.path = self.onnx_path
+            print(f"✅ Published the re-exported ONNX model to {self.onnx_path}")
+    
+    def _load_compiled_model(self):
+        """Serve a frozen TorchScript graph, if it matches eager PyTorch, and warm it up."""
+        started = time.perf_counter()
+        compiled = compile_model(self.model)
+        self._check_backend_parity(compiled, "TorchScript")
+        self.runner = compiled
+        print(f"✅ Compiled DistilBERT-BiLSTM to a frozen TorchScript graph in {time.perf_counter() - started:.1f}s")
+        self.warmup()
+    
+    def set_num_threads(self, num_threads: int):
+        """Set intra-op threads for the forward pass (torch, and the onnxruntime session when serving ONNX)."""
+        torch.set_num_threads(num_threads)
+        if isinstance(self.runner, OnnxHybridSession):
+            self.runner = OnnxHybridSession(self.staged_onnx_path or self.onnx_path, num_threads=num_threads)
+    
+    def warmup_shapes(self, max_length: int = 256) -> List[Tuple[int, int]]:
+        """(batch size, sequence length) pairs the service can produce."""
+        lengths = sorted(set(min(b, max_length) for b in self.length_buckets)) if self.dynamic_padding else [max_length]
+        return [(batch_size, length) for batch_size in self.warmup_batch_sizes for length in lengths]
+    
+    def warmup(self) -> float:
+        """
+        Run the serving graph once per batch/length bucket so profiling and
+        specialization happen before the first real request. Returns the time taken.
+        """
+        started = time.perf_counter()
+        # The profiling executor optimizes a shape after seeing it twice
+        with torch.inference_mode():
+            for batch_size, length in self.warmup_shapes():
+                input_ids = torch.full((batch_size, length), self.tokenizer.pad_token_id, dtype=torch.long, device=self.device)
+                input_ids[:, 0] = self.tokenizer.cls_token_id
+                attention_mask = torch.ones((batch_size, length), dtype=torch.long, device=self.device)
+                for _ in range(2):
+                    self.runner(input_ids=input_ids, attention_mask=attention_mask)
+        self.warmup_ms = (time.perf_counter() - started) * 1000.0
+        print(f"✅ Warmed up {len(self.warmup_shapes())} batch/length buckets in {self.warmup_ms:.0f}ms")
+        return self.warmup_ms
+    
+    def _check_backend_parity(self, runner, name: str):
+        """Raise if runner's features or logits drift from the PyTorch model on PARITY_TEXTS."""
+        drift = 0.0
+        with torch.inference_mode():
+            for _, inputs in self._encode(PARITY_TEXTS):
+                expected = self.model(**inputs)
+                actual = runner(**inputs)
+                for reference, output in zip(expected, actual):
+                    drift = max(drift, float((reference.cpu() - output.cpu()).abs().max()))
+        if drift > self.parity_tolerance:
+            raise RuntimeError(f"{name} backend drifts from PyTorch by {drift:.2e} "
+                               f"(tolerance {self.parity_tolerance:.0e}); refusing to serve it")
+        print(f"✅ {name} backend matches PyTorch (max |diff| {drift:.2e})")
+    
     def _load_xgboost_model(self):
         """Load the XGBoost model."""
         try:
@@ -180,15 +511,29 @@ class HybridModelInference:
                     default_labels = ['Depression', 'ADHD', 'Bipolar', 'Anxiety']
                     self.labels = default_labels[:num_classes]
                     self.label_map = {i: label for i, label in enumerate(self.labels)}
+                
+                # Compile the trees into array-backed evaluation, falling back to xgboost
+                self.xgb_head = self.xgb_model
+                if self.xgb_engine == "compiled":
+                    try:
+                        self.xgb_head = CompiledXGBoostClassifier.load(self.xgb_path)
+                        print(f"✅ Compiled {self.xgb_head.num_trees} XGBoost trees for vectorized evaluation")
+                    except Exception as e:
+                        print(f"⚠️ Could not compile XGBoost model, using xgboost predict_proba: {e}")
             else:
                 print(f"⚠️ XGBoost model not found at {self.xgb_path}")
                 self.xgb_model = None
+                self.xgb_head = None
         except Exception as e:
             print(f"❌ Error loading XGBoost model: {e}")
             self.xgb_model = None
+            self.xgb_head = None
     
     def preprocess_text(self, text: str, max_length: int = 256) -> Dict[str, torch.Tensor]:
         """Preprocess text for model input."""
+        if self.dynamic_padding:
+            return self.preprocess_buckets([text], max_length)[0][1]
+        
         encoding = self.tokenizer.encode_plus(
             text,
             add_special_tokens=True,
@@ -205,76 +550,423 @@ class HybridModelInference:
             'attention_mask': encoding['attention_mask'].to(self.device)
         }
     
-    def predict(self, text: str) -> Dict[str, any]:
+    def preprocess_batch(self, texts: List[str], max_length: int = 256) -> Dict[str, torch.Tensor]:
+        """Preprocess a list of texts into a single padded model input batch."""
+        encoding = self.tokenizer(
+            list(texts),
+            add_special_tokens=True,
+            max_length=max_length,
+            return_token_type_ids=False,
+            padding='max_length',
+            truncation=True,
+            return_attention_mask=True,
+            return_tensors='pt'
+        )
+        
+        return {
+            'input_ids': encoding['input_ids'].to(self.device),
+            'attention_mask': encoding['attention_mask'].to(self.device)
+        }
+    
+    def bucket_length(self, length: int, max_length: int = 256) -> int:
+        """Round a token count up to the nearest configured length bucket."""
+        for bucket in self.length_buckets:
+            if length <= bucket:
+                return min(bucket, max_length)
+        return max_length
+    
+    def preprocess_buckets(self, texts: List[str], max_length: int = 256) -> List[Tuple[List[int], Dict[str, torch.Tensor]]]:
         """
-        Make prediction using the hybrid model.
-        Returns prediction results in the format expected by the API.
+        Tokenize texts without padding and group them by length bucket.
+        Returns one (original indices, padded inputs) pair per bucket.
         """
-        try:
-            # Preprocess text
-            inputs = self.preprocess_text(text)
-            
+        encoding = self.tokenizer(
+            list(texts),
+            add_special_tokens=True,
+            max_length=max_length,
+            return_token_type_ids=False,
+            truncation=True,
+            return_attention_mask=False
+        )
+        return self.pad_buckets(encoding['input_ids'], max_length)
+    
+    def pad_buckets(self, sequences: List[List[int]], max_length: int = 256,
+                    dynamic: bool = True) -> List[Tuple[List[int], Dict[str, torch.Tensor]]]:
+        """
+        Pad token id lists (special tokens included) into model inputs, grouped by length
+        bucket, or all padded to max_length when not dynamic. One (indices, inputs) pair per group.
+        """
+        groups = {}
+        for i, ids in enumerate(sequences):
+            length = self.bucket_length(len(ids), max_length) if dynamic else max_length
+            groups.setdefault(length, []).append(i)
+        
+        batches = []
+        for bucket, indices in sorted(groups.items()):
+            input_ids = torch.full((len(indices), bucket), self.tokenizer.pad_token_id, dtype=torch.long)
+            attention_mask = torch.zeros((len(indices), bucket), dtype=torch.long)
+            for row, i in enumerate(indices):
+                ids = sequences[i]
+                input_ids[row, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+                attention_mask[row, :len(ids)] = 1
+            batches.append((indices, {
+                'input_ids': input_ids.to(self.device),
+                'attention_mask': attention_mask.to(self.device)
+            }))
+        
+        return batches
+    
+    def preprocess_windows(self, texts: List[str]) -> Tuple[List[int], List[List[int]]]:
+        """
+        Token ids of the windows covering each text, [CLS] and [SEP] included, and the index
+        of the text each window belongs to (windows of a text are adjacent). The last window
+        always ends at the end of the text; a text that fits in one window gets exactly the
+        ids truncation would give it. Beyond max_windows, evenly spaced windows are kept.
+        """
+        encoding = self.tokenizer(
+            list(texts),
+            add_special_tokens=False,
+            return_token_type_ids=False,
+            return_attention_mask=False,
+            verbose=False
+        )
+        
+        content = self.window_size - 2
+        owners, windows = [], []
+        for i, ids in enumerate(encoding['input_ids']):
+            last = max(len(ids) - content, 0)
+            starts = list(range(0, last + 1, self.window_stride))
+            if starts[-1] != last:
+                starts.append(last)
+            if len(starts) > self.max_windows:
+                step = (len(starts) - 1) / max(self.max_windows - 1, 1)
+                starts = [starts[round(k * step)] for k in range(self.max_windows)]
+            for start in starts:
+                windows.append([self.tokenizer.cls_token_id] + ids[start:start + content] + [self.tokenizer.sep_token_id])
+                owners.append(i)
+        return owners, windows
+    
+    def _encode(self, texts: List[str]) -> List[Tuple[List[int], Dict[str, torch.Tensor]]]:
+        """Model inputs for texts as (original indices, inputs) groups, one per forward pass."""
+        if self.dynamic_padding:
+            return self.preprocess_buckets(texts)
+        return [(list(range(len(texts))), self.preprocess_batch(texts))]
+    
+    def _run_forward(self, inputs: Dict[str, torch.Tensor]) -> Tuple[torch.Tensor, torch.Tensor]:
+        """One DistilBERT-BiLSTM forward pass, timed per stage when metrics are attached."""
+        if self.metrics is None:
+            return self.runner(**inputs)
+        
+        self.metrics.observe_batch(inputs["input_ids"].shape[0])
+        started = time.perf_counter()
+        if self.runner is not self.model or not hasattr(self.model, "lstm_head"):
+            # TorchScript and onnxruntime run the encoder and BiLSTM as one graph
+            outputs = self.runner(**inputs)
+            self.metrics.observe_stage("forward", time.perf_counter() - started)
+            return outputs
+        
+        sequence_output = self.model.encode(**inputs)
+        encoded = time.perf_counter()
+        outputs = self.model.lstm_head(sequence_output, inputs["attention_mask"])
+        self.metrics.observe_stage("encoder", encoded - started)
+        self.metrics.observe_stage("lstm", time.perf_counter() - encoded)
+        return outputs
+    
+    def _forward_batch(self, texts: List[str]) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Run DistilBERT-BiLSTM over texts, one forward pass per length bucket, in input order."""
+        started = time.perf_counter()
+        groups = self._encode(texts)
+        if self.metrics is not None:
+            self.metrics.observe_stage("tokenize", time.perf_counter() - started)
+        return self._forward_groups(groups)
+    
+    def _forward_windows(self, texts: List[str]) -> Tuple[List[int], torch.Tensor, torch.Tensor]:
+        """Features and logits of every window of texts, and the text index of each window."""
+        started = time.perf_counter()
+        owners, windows = self.preprocess_windows(texts)
+        groups = self.pad_buckets(windows, self.window_size, dynamic=self.dynamic_padding)
+        if self.metrics is not None:
+            self.metrics.observe_stage("tokenize", time.perf_counter() - started)
+        features, logits = self._forward_groups(groups, max_rows=self.window_batch_size)
+        return owners, features, logits
+    
+    def _forward_groups(self, groups: List[Tuple[List[int], Dict[str, torch.Tensor]]],
+                        max_rows: Optional[int] = None) -> Tuple[torch.Tensor, torch.Tensor]:
+        """One forward pass per group (split every max_rows rows), with outputs back in index order."""
+        if max_rows is not None:
+            groups = [
+                (indices[start:start + max_rows], {name: tensor[start:start + max_rows] for name, tensor in inputs.items()})
+                for indices, inputs in groups
+                for start in range(0, len(indices), max_rows)
+            ]
+        if len(groups) == 1:
+            with torch.inference_mode():
+                return self._run_forward(groups[0][1])
+        
+        order = []
+        features_parts = []
+        logits_parts = []
+        with torch.inference_mode():
+            for indices, inputs in groups:
+                features, logits = self._run_forward(inputs)
+                order.extend(indices)
+                features_parts.append(features)
+                logits_parts.append(logits)
+        
+        # Undo the bucket grouping so rows line up with the input texts
+        inverse = torch.empty(len(order), dtype=torch.long)
+        inverse[torch.tensor(order, dtype=torch.long)] = torch.arange(len(order))
+        inverse = inverse.to(features_parts[0].device)
+        return torch.cat(features_parts)[inverse], torch.cat(logits_parts)[inverse]
+    
+    def _build_result(self, probs) -> Dict[str, any]:
+        """Turn one row of class probabilities into the API response format."""
+        probs = [float(p) for p in probs]
+        predicted_idx = probs.index(max(probs))
+        predicted_label = self.label_map[predicted_idx]
+        
+        # Create confidence scores
+        confidence_scores = []
+        for i, label in enumerate(self.labels):
+            confidence_scores.append({
+                "label": label,
+                "score": probs[i] if i < len(probs) else 0.0
+            })
+        
+        # Sort by confidence
+        confidence_scores.sort(key=lambda x: x["score"], reverse=True)
+        
+        return {
+            "topPattern": predicted_label,
+            "confidenceScores": confidence_scores
+        }
+    
+    def _fallback_result(self) -> Dict[str, any]:
+        """Static prediction returned when inference fails."""
+        return {
+            "topPattern": "Anxiety",
+            "confidenceScores": [
+                {"label": "Anxiety", "score": 0.4},
+                {"label": "Bipolar", "score": 0.3},
+                {"label": "Depression", "score": 0.3}
+            ]
+        }
+    
+    def _cache_key(self, text: str) -> str:
+        """Cache key for a text under the loaded weights, labels and padding mode."""
+        namespace = f"{self.fingerprint}:{','.join(self.labels)}:{self.pack_sequences}:{self.dynamic_padding}:{self.length_buckets}"
+        if self.long_text == "window":
+            namespace += f":window:{self.window_size}:{self.window_stride}:{self.max_windows}:{self.window_aggregation}"
+        return self.cache.make_key(text, namespace, lowercase=getattr(self.tokenizer, 'do_lower_case', False))
+    
+    def get_cached(self, text: str) -> Optional[Dict[str, any]]:
+        """Return a cached prediction for text, or None if there is none (misses are counted by predict_batch)."""
+        if self.cache is None:
+            return None
+        return self.cache.get(self._cache_key(text), count_miss=False)
+    
+    def _predict_uncached(self, texts: List[str]) -> List[Dict[str, any]]:
+        """Run the full pipeline over texts; raises on inference errors."""
+        profiler = self.profiler
+        if profiler is not None and profiler.active:
+            return profiler.capture(self._run_pipeline, texts)
+        return self._run_pipeline(texts)
+    
+    def _run_pipeline(self, texts: List[str]) -> List[Dict[str, any]]:
+        """Tokenize, DistilBERT-BiLSTM forward pass, classifier head and response building."""
+        if self.long_text == "window":
+            probs = self._classify_windows(texts)
+        else:
             # Get features from DistilBERT-BiLSTM
-            with torch.no_grad():
-                features, logits = self.model(**inputs)
-                if NUMPY_AVAILABLE:
-                    features_np = features.cpu().numpy()
-                else:
-                    features_np = features.cpu().tolist()
-            
-            # Choose prediction method based on model output type and XGBoost availability
-            if self.model_outputs_logits or self.xgb_model is None:
-                # Use PyTorch model directly
-                probs = torch.softmax(logits, dim=-1).cpu().tolist()[0]
-                predicted_idx = probs.index(max(probs))
-                predicted_label = self.label_map[predicted_idx]
-                
-                # Create confidence scores
-                confidence_scores = []
-                for i, label in enumerate(self.labels):
-                    confidence_scores.append({
-                        "label": label,
-                        "score": float(probs[i])
-                    })
-                
-                # Sort by confidence
-                confidence_scores.sort(key=lambda x: x["score"], reverse=True)
-                
+            features, logits = self._forward_batch(texts)
+            probs = self._classify(features, logits)
+            self._store_features(texts, features)
+        
+        started = time.perf_counter()
+        results = [self._build_result(row) for row in probs.tolist()]
+        if self.metrics is not None:
+            self.metrics.observe_stage("serialize", time.perf_counter() - started)
+        return results
+    
+    def _classify_windows(self, texts: List[str]) -> np.ndarray:
+        """Class probabilities per text, combining the predictions of its windows."""
+        owners, features, logits = self._forward_windows(texts)
+        if len(owners) == len(texts):
+            # Every text fit in a single window
+            self._store_features(texts, features)
+            return self._classify(features, logits)
+        
+        if self.window_aggregation == "mean_features":
+            # Average the BiLSTM states (and logits) of each text's windows, then classify once
+            index = torch.tensor(owners, dtype=torch.long, device=features.device)
+            counts = torch.bincount(index, minlength=len(texts)).unsqueeze(1).to(features.dtype)
+            pooled_features = features.new_zeros((len(texts), features.shape[1])).index_add_(0, index, features) / counts
+            pooled_logits = logits.new_zeros((len(texts), logits.shape[1])).index_add_(0, index, logits) / counts
+            self._store_features(texts, pooled_features)
+            return self._classify(pooled_features, pooled_logits)
+        
+        # Classify every window, then reduce each text's (adjacent) rows
+        probs = self._classify(features, logits)
+        owners = np.asarray(owners)
+        starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]])
+        if self.window_aggregation == "max_probs":
+            combined = np.maximum.reduceat(probs, starts, axis=0)
+        else:
+            combined = np.add.reduceat(probs, starts, axis=0)
+        return combined / combined.sum(axis=1, keepdims=True)
+    
+    def _store_features(self, texts: List[str], features: torch.Tensor):
+        """Append the head's input vectors to the feature store; never fails the prediction."""
+        if self.feature_store is None:
+            return
+        started = time.perf_counter()
+        try:
+            self.feature_store.append(texts, features.float().cpu().numpy())
+        except Exception as e:
+            print(f"⚠️ Could not store feature vectors: {e}")
+        if self.metrics is not None:
+            self.metrics.observe_stage("feature_store", time.perf_counter() - started)
+    
+    def _classify(self, features: torch.Tensor, logits: torch.Tensor) -> np.ndarray:
+        """Class probabilities per row, from the XGBoost head or the model's own classifier."""
+        # Choose prediction method based on model output type and XGBoost availability
+        started = time.perf_counter()
+        if self.model_outputs_logits or self.xgb_model is None:
+            # Use PyTorch model directly
+            stage = "classifier"
+            probs = torch.softmax(logits, dim=-1).cpu().numpy()
+        else:
+            # One vectorized XGBoost call; predict() is the argmax of predict_proba()
+            stage = "xgboost"
+            if NUMPY_AVAILABLE:
+                features_np = features.cpu().numpy()
             else:
-                # Use XGBoost for final prediction
-                xgb_pred = int(self.xgb_model.predict(features_np)[0])
-                xgb_proba = self.xgb_model.predict_proba(features_np)[0]
-                
-                # Map to labels
-                predicted_label = self.label_map[xgb_pred]
-                
-                # Create confidence scores
-                confidence_scores = []
-                for i, label in enumerate(self.labels):
-                    confidence_scores.append({
-                        "label": label,
-                        "score": float(xgb_proba[i]) if i < len(xgb_proba) else 0.0
-                    })
-                
-                # Sort by confidence
-                confidence_scores.sort(key=lambda x: x["score"], reverse=True)
-            
-            return {
-                "topPattern": predicted_label,
-                "confidenceScores": confidence_scores
-            }
-            
+                features_np = features.cpu().tolist()
+            probs = np.asarray(self.xgb_head.predict_proba(features_np))
+        if self.metrics is not None:
+            self.metrics.observe_stage(stage, time.perf_counter() - started)
+        return probs
+    
+    def predict_batch(self, texts: List[str]) -> List[Dict[str, any]]:
+        """
+        Make predictions for several texts with one forward pass and one classifier call.
+        Results are returned in input order, in the same format as predict().
+        Cached texts are answered from the cache; only misses reach the model.
+        """
+        if not texts:
+            return []
+        
+        try:
+            return self.predict_batch_or_raise(texts)
         except Exception as e:
-            print(f"❌ Error during prediction: {e}")
-            # Return fallback prediction
-            return {
-                "topPattern": "Anxiety",
-                "confidenceScores": [
-                    {"label": "Anxiety", "score": 0.4},
-                    {"label": "Bipolar", "score": 0.3},
-                    {"label": "Depression", "score": 0.3}
-                ]
-            }
+            print(f"❌ Error during batch prediction: {e}")
+            if self.metrics is not None:
+                self.metrics.count_fallback("static", len(texts))
+            # Return fallback predictions
+            return [self._fallback_result() for _ in texts]
+    
+    def predict_batch_or_raise(self, texts: List[str]) -> List[Dict[str, any]]:
+        """predict_batch without the static fallback: cached texts are still answered from the cache, errors raise."""
+        if self.cache is None:
+            return self._predict_uncached(texts)
+        
+        keys = [self._cache_key(text) for text in texts]
+        results = [self.cache.get(key) for key in keys]
+        
+        # Run each distinct missing text once
+        missing = {}
+        for i, result in enumerate(results):
+            if result is None:
+                missing.setdefault(keys[i], i)
+        if missing:
+            fresh = self._predict_uncached([texts[i] for i in missing.values()])
+            computed = dict(zip(missing.keys(), fresh))
+            for key, result in computed.items():
+                self.cache.put(key, result)
+            results = [result if result is not None else computed[key] for key, result in zip(keys, results)]
+        
+        return results
+    
+    def predict_batch_strict(self, texts: List[str]) -> List[Dict[str, any]]:
+        """predict_batch without the cache or the static fallback: raises on inference errors."""
+        return self._run_pipeline(texts)
+    
+    def predict(self, text: str) -> Dict[str, any]:
+        """
+        Make prediction using the hybrid model.
+        Returns prediction results in the format expected by the API.
+        """
+        return self.predict_batch([text])[0]
+    
+    def encode_messages(self, texts: List[str]) -> List[torch.Tensor]:
+        """DistilBERT hidden states of each text's real tokens ([CLS] and [SEP] included), as [tokens, dim] tensors."""
+        started = time.perf_counter()
+        # Only real-token states are kept, so padding to length buckets never changes them
+        groups = self.preprocess_buckets(texts)
+        tokenized = time.perf_counter()
+        
+        states = [None] * len(texts)
+        with torch.inference_mode():
+            for indices, inputs in groups:
+                hidden = self.model.encode(**inputs)
+                lengths = inputs["attention_mask"].sum(dim=1).tolist()
+                for row, i in enumerate(indices):
+                    # Copy, so a cached message does not keep its whole padded batch alive
+                    states[i] = hidden[row, :lengths[row]].clone()
+                if self.metrics is not None:
+                    self.metrics.observe_batch(len(indices))
+        if self.metrics is not None:
+            self.metrics.observe_stage("tokenize", tokenized - started)
+            self.metrics.observe_stage("encoder", time.perf_counter() - tokenized)
+        return states
+    
+    def _state_key(self, text: str) -> str:
+        """Encoder state cache key for a message under the loaded weights."""
+        return PredictionCache.make_key(text, f"{self.encoder_fingerprint}:states", lowercase=getattr(self.tokenizer, 'do_lower_case', False))
+    
+    def predict_session(self, messages: List[str], max_tokens: int = 2048) -> Dict[str, any]:
+        """
+        Predict over a whole conversation. Each message is encoded by DistilBERT on its own
+        (truncated to 256 tokens) and its states are cached under the message hash, so a new
+        turn only encodes the messages not seen before. The BiLSTM and classifier head then
+        run over the concatenated states of the last max_tokens tokens.
+        Raises on inference errors; the result carries a "session" summary.
+        """
+        if not messages:
+            raise ValueError("A session needs at least one message")
+        if not hasattr(self.model, "lstm_head"):
+            raise RuntimeError("Session analysis needs a DistilBERT_BiLSTM_Hybrid model")
+        
+        keys = [self._state_key(text) for text in messages]
+        states = [self.state_cache.get(key) if self.state_cache is not None else None for key in keys]
+        
+        # Encode each distinct unseen message once, in one batch
+        missing = {}
+        for i, cached in enumerate(states):
+            if cached is None:
+                missing.setdefault(keys[i], i)
+        if missing:
+            computed = dict(zip(missing.keys(), self.encode_messages([messages[i] for i in missing.values()])))
+            if self.state_cache is not None:
+                for key, encoded in computed.items():
+                    self.state_cache.put(key, encoded)
+            states = [cached if cached is not None else computed[key] for key, cached in zip(keys, states)]
+        
+        sequence = torch.cat(states)[-max_tokens:].unsqueeze(0)
+        attention_mask = torch.ones(sequence.shape[:2], dtype=torch.long, device=sequence.device)
+        started = time.perf_counter()
+        with torch.inference_mode():
+            features, logits = self.model.lstm_head(sequence, attention_mask)
+        if self.metrics is not None:
+            self.metrics.observe_stage("lstm", time.perf_counter() - started)
+        
+        result = self._build_result(self._classify(features, logits)[0].tolist())
+        result["session"] = {
+            "messages": len(messages),
+            "encoded_messages": len(missing),
+            "tokens": int(sequence.shape[1])
+        }
+        return result
     
     def get_model_info(self) -> Dict[str, any]:
         """Get information about the loaded model."""
@@ -282,8 +974,27 @@ class HybridModelInference:
             "model_type": "DistilBERT-BiLSTM-XGBoost Hybrid",
             "pytorch_model_loaded": os.path.exists(self.model_path),
             "xgboost_model_loaded": self.xgb_model is not None,
+            "xgboost_engine": "compiled" if isinstance(self.xgb_head, CompiledXGBoostClassifier) else "xgboost",
             "labels": self.labels,
-            "device": str(self.device)
+            "device": str(self.device),
+            "backend": self.backend,
+            "compile_mode": self.compile_mode,
+            "warmup_ms": self.warmup_ms,
+            "fingerprint": self.fingerprint,
+            "encoder_fingerprint": self.encoder_fingerprint,
+            "feature_store": self.feature_store.stats() if self.feature_store is not None else {"enabled": False},
+            "quantization": self.quantize,
+            "packed_lstm": self.pack_sequences,
+            "dynamic_padding": self.dynamic_padding,
+            "length_buckets": self.length_buckets if self.dynamic_padding else None,
+            "long_text": self.long_text,
+            "windowing": {
+                "window_size": self.window_size,
+                "window_stride": self.window_stride,
+                "max_windows": self.max_windows,
+                "aggregation": self.window_aggregation,
+                "batch_size": self.window_batch_size
+            } if self.long_text == "window" else None
         }
 
 def create_model_save_script():
@@ -0,0 +1,957 @@
+"""
+Model loading and prediction shared by the Flask (app.py) and ASGI (asgi_app.py)
+entry points of the Virtual Therapist model service. Configuration comes from the
+environment; the loaded models live in this module's globals.
+"""
+
+import functools
+import gc
+import hmac
+import os
+import tempfile
+import threading
+import time
+import torch
+import torch.nn.functional as F
+from dotenv import load_dotenv
+
+load_dotenv()
+
+try:
+    from transformers import DistilBertConfig, DistilBertTokenizerFast, DistilBertForSequenceClassification
+    from transformers.modeling_utils import no_init_weights
+    TRANSFORMERS_AVAILABLE = True
+except Exception:
+    TRANSFORMERS_AVAILABLE = False
+
+# Import hybrid model
+try:
+    from hybrid_model import PARITY_TEXTS, HybridModelInference
+    import autotune
+    HYBRID_MODEL_AVAILABLE = True
+except Exception as e:
+    print(f"Hybrid model not available: {e}")
+    HYBRID_MODEL_AVAILABLE = False
+
+from batching import MicroBatcher
+from cache import EncoderStateCache, PredictionCache, module_fingerprint
+from checkpoints import load_checkpoint
+from feature_store import FeatureStore
+from hot_reload import ModelReloader, load_golden_set
+from keyword_scorer import KeywordScorer
+import metrics
+from model_registry import ModelRegistry, module_bytes
+from profiling import ProfileCapture
+
+LABELS = ["Depression", "ADHD", "Bipolar", "Anxiety"]
+HYBRID_LABELS = [label.strip() for label in os.getenv("MODEL_LABELS", "Depression,ADHD,Bipolar,Anxiety").split(",") if label.strip()] or ["Depression", "ADHD", "Bipolar", "Anxiety"]
+
+# Model paths
+MODEL_PATH = os.getenv(
+    "MODEL_PATH",
+    os.path.join(os.path.dirname(__file__), "model", "mental_health_model_final.pth")
+)
+
+# Bundled distilbert-base-uncased architecture; when a .pth checkpoint provides every weight
+# the models are built from it instead of downloading and loading the base weights first
+BASE_MODEL_CONFIG = os.getenv(
+    "BASE_MODEL_CONFIG",
+    os.path.join(os.path.dirname(__file__), "distilbert_config.json")
+)
+HYBRID_PYTORCH_PATH = os.getenv(
+    "HYBRID_PYTORCH_PATH",
+    os.path.join(os.path.dirname(__file__), "model", "hybrid_model.pth")
+)
+HYBRID_XGB_PATH = os.getenv(
+    "HYBRID_XGB_PATH", 
+    os.path.join(os.path.dirname(__file__), "model", "xgboost_classifier.json")
+)
+
+# int8 dynamic quantization of the hybrid model ("none" or "int8"); a pre-quantized
+# artifact written by benchmark_quantization.py --save-quantized is used if present
+HYBRID_QUANTIZE = os.getenv("HYBRID_QUANTIZE", "none").strip().lower()
+HYBRID_INT8_PATH = os.getenv(
+    "HYBRID_INT8_PATH",
+    os.path.join(os.path.dirname(__file__), "model", "hybrid_model_int8.pth")
+)
+
+# Hybrid forward-pass backend: "torch" or "onnx" (onnxruntime; exported on load if missing or exported
+# from other weights, and only served if it matches PyTorch within HYBRID_PARITY_TOLERANCE)
+HYBRID_BACKEND = (os.getenv("HYBRID_BACKEND") or "torch").strip().lower()
+HYBRID_ONNX_PATH = os.getenv(
+    "HYBRID_ONNX_PATH",
+    os.path.join(os.path.dirname(__file__), "model", "hybrid_model.onnx")
+)
+HYBRID_PARITY_TOLERANCE = float(os.getenv("HYBRID_PARITY_TOLERANCE", "1e-3"))
+
+# Run the hybrid BiLSTM over real tokens only (packed sequences)
+HYBRID_PACKED_LSTM = os.getenv("HYBRID_PACKED_LSTM", "false").strip().lower() in ("1", "true", "yes")
+
+# Pad hybrid inputs to the real length rounded up to a bucket instead of always to 256 tokens.
+# Defaults to on with the packed BiLSTM, where padding length no longer affects the output.
+HYBRID_DYNAMIC_PADDING = os.getenv("HYBRID_DYNAMIC_PADDING", "true" if HYBRID_PACKED_LSTM else "false").strip().lower() in ("1", "true", "yes")
+HYBRID_LENGTH_BUCKETS = [int(b) for b in os.getenv("HYBRID_LENGTH_BUCKETS", "16,32,64,128,256").split(",") if b.strip()]
+
+# Texts longer than 256 tokens: "truncate", or "window" to score overlapping windows of
+# HYBRID_WINDOW_SIZE tokens, HYBRID_WINDOW_STRIDE apart, batched together and combined with
+# HYBRID_WINDOW_AGGREGATION ("mean_probs", "max_probs" or "mean_features")
+HYBRID_LONG_TEXT = os.getenv("HYBRID_LONG_TEXT", "truncate").strip().lower()
+HYBRID_WINDOW_SIZE = int(os.getenv("HYBRID_WINDOW_SIZE", "256"))
+HYBRID_WINDOW_STRIDE = int(os.getenv("HYBRID_WINDOW_STRIDE", "192"))
+HYBRID_MAX_WINDOWS = int(os.getenv("HYBRID_MAX_WINDOWS", "16"))
+HYBRID_WINDOW_AGGREGATION = os.getenv("HYBRID_WINDOW_AGGREGATION", "mean_probs").strip().lower()
+HYBRID_WINDOW_BATCH_SIZE = int(os.getenv("HYBRID_WINDOW_BATCH_SIZE", "32"))
+
+# XGBoost head engine: "compiled" (vectorized NumPy trees) or "xgboost"
+HYBRID_XGB_ENGINE = os.getenv("HYBRID_XGB_ENGINE", "compiled").strip().lower()
+
+# Micro-batching of concurrent hybrid requests
+HYBRID_BATCHING = os.getenv("HYBRID_BATCHING", "true").strip().lower() in ("1", "true", "yes")
+HYBRID_BATCH_MAX_SIZE = int(os.getenv("HYBRID_BATCH_MAX_SIZE") or "8")
+HYBRID_BATCH_MAX_WAIT_MS = float(os.getenv("HYBRID_BATCH_MAX_WAIT_MS", "5"))
+
+# Compiled serving mode for the torch backend: "none" (eager) or "torchscript" (traced, frozen graph).
+# Every batch size in HYBRID_WARMUP_BATCH_SIZES is warmed up on every length bucket at startup.
+HYBRID_COMPILE = (os.getenv("HYBRID_COMPILE") or "none").strip().lower()
+HYBRID_WARMUP_BATCH_SIZES = [int(b) for b in (os.getenv("HYBRID_WARMUP_BATCH_SIZES") or f"1,{HYBRID_BATCH_MAX_SIZE}").split(",") if b.strip()]
+
+# Prediction result cache shared by the hybrid and standard models
+PREDICTION_CACHE = os.getenv("PREDICTION_CACHE", "true").strip().lower() in ("1", "true", "yes")
+PREDICTION_CACHE_MAX_ENTRIES = int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", "4096"))
+PREDICTION_CACHE_MAX_BYTES = int(os.getenv("PREDICTION_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+PREDICTION_CACHE_TTL_SECONDS = float(os.getenv("PREDICTION_CACHE_TTL_SECONDS", "0"))
+
+# Session analysis (/predict/session): per-message encoder states are cached by message hash,
+# and the BiLSTM and head rerun over the last SESSION_MAX_TOKENS tokens of the conversation
+SESSION_STATE_CACHE_MAX_ENTRIES = int(os.getenv("SESSION_STATE_CACHE_MAX_ENTRIES", "8192"))
+SESSION_STATE_CACHE_MAX_BYTES = int(os.getenv("SESSION_STATE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+SESSION_MAX_TOKENS = int(os.getenv("SESSION_MAX_TOKENS", "2048"))
+SESSION_MAX_MESSAGES = int(os.getenv("SESSION_MAX_MESSAGES", "500"))
+
+# Feature store: keep the hybrid model's BiLSTM feature vector of every scored text under
+# FEATURE_STORE_DIR (unset disables it), as float32, float16 or int8, so new XGBoost heads
+# can be scored offline with rescore_features.py
+FEATURE_STORE_DIR = os.getenv("FEATURE_STORE_DIR", "").strip()
+FEATURE_STORE_DTYPE = os.getenv("FEATURE_STORE_DTYPE", "float32").strip().lower()
+
+# Hot reload of the hybrid model: POST /admin/reload, or poll the weight files every
+# HOT_RELOAD_WATCH_SECONDS (0 disables watching). A new model must score the golden set
+# (.jsonl of {"text", "label"}; built-in texts when unset) before it replaces the old one.
+HOT_RELOAD_WATCH_SECONDS = float(os.getenv("HOT_RELOAD_WATCH_SECONDS", "0"))
+HOT_RELOAD_GOLDEN_PATH = os.getenv("HOT_RELOAD_GOLDEN_PATH", "").strip()
+HOT_RELOAD_MIN_AGREEMENT = float(os.getenv("HOT_RELOAD_MIN_AGREEMENT", "0.9"))
+# Nice value of the reload thread, so serving keeps the CPU while the new model loads
+HOT_RELOAD_NICE = int(os.getenv("HOT_RELOAD_NICE", "10"))
+
+# Registry of extra model versions (<dir>/<name>/<version>/manifest.json, see model_registry.py)
+# chosen per request with a "model" field; loaded on first use and evicted least recently used
+# to keep their weights within MODEL_REGISTRY_MAX_BYTES (the default models are not counted)
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", os.path.join(os.path.dirname(__file__), "model"))
+MODEL_REGISTRY_MAX_BYTES = int(os.getenv("MODEL_REGISTRY_MAX_BYTES", str(2 * 1024 ** 3)))
+
+# Shared secret for the /admin endpoints (sent as X-Admin-Token); unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+# Where /admin/profile writes torch profiler traces and operator tables
+PROFILE_OUTPUT_DIR = os.getenv("PROFILE_OUTPUT_DIR", os.path.join(os.path.dirname(__file__), "profiles"))
+
+# Limits for the /predict/batch endpoint
+MAX_BATCH_TEXTS = int(os.getenv("MAX_BATCH_TEXTS", "256"))
+PREDICT_BATCH_CHUNK_SIZE = int(os.getenv("PREDICT_BATCH_CHUNK_SIZE", "32"))
+
+# Autotuned threads, max batch size and backend (see autotune.py):
+#   off     - ignore saved profiles
+#   profile - apply the saved profile when it was tuned on this host for this model
+#   startup - as profile, but benchmark the host and save a profile when none matches
+# Settings given explicitly in the environment always win over the profile (empty values
+# and TORCH_NUM_THREADS=0 count as not given). A profile only applies when it was tuned for
+# AUTOTUNE_WORKERS worker processes, the number this deployment runs per host.
+AUTOTUNE = os.getenv("AUTOTUNE", "profile").strip().lower()
+AUTOTUNE_WORKERS = max(1, int(os.getenv("AUTOTUNE_WORKERS") or os.getenv("WEB_CONCURRENCY") or "1"))
+AUTOTUNE_PROFILE_PATH = os.getenv(
+    "AUTOTUNE_PROFILE_PATH",
+    os.path.join(os.path.dirname(__file__), "model", "autotune_profile.json")
+)
+# Intra-op threads per worker (0 leaves torch's default)
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS") or "0")
+if TORCH_NUM_THREADS > 0:
+    torch.set_num_threads(TORCH_NUM_THREADS)
+autotune_profile = None
+
+# Which models a worker keeps resident. Each policy lists the models loaded at startup and
+# the ones loaded on first use (and unloaded again after SECONDARY_MODEL_IDLE_SECONDS idle):
+#   hybrid    - hybrid resident, standard model loaded only when a hybrid prediction fails
+#   both      - hybrid and standard resident
+#   standard  - standard model only
+#   heuristic - no models, keyword heuristics only
+SERVING_POLICIES = {
+    "hybrid": {"resident": ("hybrid",), "lazy": ("standard",)},
+    "both": {"resident": ("hybrid", "standard"), "lazy": ()},
+    "standard": {"resident": ("standard",), "lazy": ()},
+    "heuristic": {"resident": (), "lazy": ()}
+}
+SERVING_POLICY = os.getenv("SERVING_POLICY", "hybrid").strip().lower()
+if SERVING_POLICY not in SERVING_POLICIES:
+    print(f"[analysis_service] Unknown SERVING_POLICY {SERVING_POLICY!r}, using 'hybrid'")
+    SERVING_POLICY = "hybrid"
+SECONDARY_MODEL_IDLE_SECONDS = float(os.getenv("SECONDARY_MODEL_IDLE_SECONDS", "300"))
+
+tokenizer = None
+model = None
+hybrid_model = None
+hybrid_batcher = None
+model_reloader = None
+standard_fingerprint = None
+device = "cpu"
+
+# Lazy standard model bookkeeping
+model_lock = threading.Lock()
+standard_loaded_on_demand = False
+standard_load_failed = False
+standard_last_used = 0.0
+
+prediction_cache = PredictionCache(
+    max_entries=PREDICTION_CACHE_MAX_ENTRIES,
+    max_bytes=PREDICTION_CACHE_MAX_BYTES,
+    ttl_seconds=PREDICTION_CACHE_TTL_SECONDS
+) if PREDICTION_CACHE else None
+
+session_state_cache = EncoderStateCache(
+    max_entries=SESSION_STATE_CACHE_MAX_ENTRIES,
+    max_bytes=SESSION_STATE_CACHE_MAX_BYTES
+)
+
+# Torch profiler captures, only reachable through the admin endpoint
+profile_capture = ProfileCapture(PROFILE_OUTPUT_DIR) if ADMIN_TOKEN else None
+
+# Metrics served on /metrics; cache and batcher state is read at scrape time
+hybrid_metrics = metrics.PipelineMetrics("hybrid")
+standard_metrics = metrics.PipelineMetrics("standard")
+prediction_requests = metrics.REGISTRY.counter(
+    "model_service_predictions_total",
+    "Prediction requests by route and the model path that answered them",
+    ("route", "model")
+)
+metrics.REGISTRY.callback(
+    "model_service_cache_lookups_total", "counter", "Prediction cache lookups by result",
+    lambda: {("hit",): prediction_cache.hits, ("miss",): prediction_cache.misses} if prediction_cache else None,
+    ("result",)
+)
+metrics.REGISTRY.callback(
+    "model_service_cache_hit_ratio", "gauge", "Share of prediction cache lookups that hit",
+    lambda: prediction_cache.stats()["hit_rate"] if prediction_cache else None
+)
+metrics.REGISTRY.callback(
+    "model_service_cache_entries", "gauge", "Predictions held in the cache",
+    lambda: prediction_cache.stats()["entries"] if prediction_cache else None
+)
+metrics.REGISTRY.callback(
+    "model_service_session_state_cache_lookups_total", "counter", "Session encoder state cache lookups by result",
+    lambda: {("hit",): session_state_cache.hits, ("miss",): session_state_cache.misses},
+    ("result",)
+)
+metrics.REGISTRY.callback(
+    "model_service_session_state_cache_bytes", "gauge", "Bytes of encoder states held for session analysis",
+    lambda: session_state_cache.stats()["bytes"]
+)
+metrics.REGISTRY.callback(
+    "model_service_model_reloads_total", "counter", "Hybrid model hot reloads by result",
+    lambda: {("success",): model_reloader.reloads, ("failed",): model_reloader.failures} if model_reloader else None,
+    ("result",)
+)
+metrics.REGISTRY.callback(
+    "model_service_model_generation", "gauge", "Hybrid model reloads installed since startup",
+    lambda: model_reloader.generation if model_reloader else None
+)
+metrics.REGISTRY.callback(
+    "model_service_registry_lookups_total", "counter",
+    "Registry model lookups: loaded already, loaded by this request, or waited on another request's load",
+    lambda: {("hit",): model_registry.hits, ("miss",): model_registry.misses, ("wait",): model_registry.waits},
+    ("result",)
+)
+metrics.REGISTRY.callback(
+    "model_service_registry_loads_total", "counter", "Registry model loads by result",
+    lambda: {("success",): model_registry.loads, ("failed",): model_registry.load_failures},
+    ("result",)
+)
+metrics.REGISTRY.callback(
+    "model_service_registry_evictions_total", "counter", "Registry models evicted to stay within the memory budget",
+    lambda: model_registry.evictions
+)
+metrics.REGISTRY.callback(
+    "model_service_registry_resident_bytes", "gauge", "Bytes of registry model weights held in memory",
+    lambda: model_registry.stats()["resident_bytes"]
+)
+metrics.REGISTRY.callback(
+    "model_service_batch_queue_depth", "gauge", "Texts waiting for a micro-batch slot",
+    lambda: hybrid_batcher.queue_depth() if hybrid_batcher is not None else None
+)
+
+def hybrid_model_kwargs():
+    """HybridModelInference arguments for the configured hybrid model."""
+    return dict(
+        model_path=HYBRID_PYTORCH_PATH,
+        xgb_path=HYBRID_XGB_PATH,
+        labels=HYBRID_LABELS,
+        dynamic_padding=HYBRID_DYNAMIC_PADDING,
+        length_buckets=HYBRID_LENGTH_BUCKETS,
+        pack_sequences=HYBRID_PACKED_LSTM,
+        xgb_engine=HYBRID_XGB_ENGINE,
+        quantize=HYBRID_QUANTIZE,
+        quantized_path=HYBRID_INT8_PATH,
+        base_config_path=BASE_MODEL_CONFIG,
+        backend=HYBRID_BACKEND,
+        onnx_path=HYBRID_ONNX_PATH,
+        parity_tolerance=HYBRID_PARITY_TOLERANCE,
+        compile_mode=HYBRID_COMPILE,
+        warmup_batch_sizes=HYBRID_WARMUP_BATCH_SIZES,
+        long_text=HYBRID_LONG_TEXT,
+        window_size=HYBRID_WINDOW_SIZE,
+        window_stride=HYBRID_WINDOW_STRIDE,
+        max_windows=HYBRID_MAX_WINDOWS,
+        window_aggregation=HYBRID_WINDOW_AGGREGATION,
+        window_batch_size=HYBRID_WINDOW_BATCH_SIZE
+    )
+
+def env_given(name):
+    """True when name is set to a non-empty value in the environment."""
+    return bool(os.getenv(name, "").strip())
+
+def apply_autotune_profile():
+    """
+    Load (or, with AUTOTUNE=startup, create) the autotune profile and use its threads,
+    batch size and backend for every setting not given explicitly in the environment.
+    """
+    global autotune_profile, TORCH_NUM_THREADS, HYBRID_BACKEND, HYBRID_COMPILE
+    global HYBRID_BATCH_MAX_SIZE, HYBRID_WARMUP_BATCH_SIZES
+    if AUTOTUNE == "off":
+        return
+    
+    profile = autotune.load_profile(AUTOTUNE_PROFILE_PATH, HYBRID_PYTORCH_PATH, AUTOTUNE_WORKERS)
+    if profile is None and AUTOTUNE == "startup":
+        print("[analysis_service] No matching autotune profile, benchmarking this host...")
+        try:
+            profile = autotune.run_autotune(hybrid_model_kwargs(), workers=AUTOTUNE_WORKERS)
+            autotune.save_profile(profile, AUTOTUNE_PROFILE_PATH)
+        except Exception as e:
+            print(f"[analysis_service] Autotuning failed, using configured settings: {e}")
+            return
+    if profile is None:
+        return
+    
+    autotune_profile = profile
+    if TORCH_NUM_THREADS <= 0:
+        TORCH_NUM_THREADS = profile["threads"]
+        torch.set_num_threads(TORCH_NUM_THREADS)
+    if not env_given("HYBRID_BACKEND"):
+        HYBRID_BACKEND = profile["backend"]
+    if not env_given("HYBRID_COMPILE"):
+        HYBRID_COMPILE = profile["compile_mode"]
+    if not env_given("HYBRID_BATCH_MAX_SIZE"):
+        HYBRID_BATCH_MAX_SIZE = profile["max_batch_size"]
+        if not env_given("HYBRID_WARMUP_BATCH_SIZES"):
+            HYBRID_WARMUP_BATCH_SIZES = [1, HYBRID_BATCH_MAX_SIZE]
+    print(f"[analysis_service] Applied autotune profile from {AUTOTUNE_PROFILE_PATH}: backend={HYBRID_BACKEND}, "
+          f"compile={HYBRID_COMPILE}, threads={TORCH_NUM_THREADS}, max_batch_size={HYBRID_BATCH_MAX_SIZE} "
+          f"for {AUTOTUNE_WORKERS} worker(s)")
+
+def build_hybrid_model():
+    """A new hybrid model instance, not attached to the service yet."""
+    new_model = HybridModelInference(**hybrid_model_kwargs())
+    if TORCH_NUM_THREADS > 0:
+        new_model.set_num_threads(TORCH_NUM_THREADS)
+    return new_model
+
+def install_hybrid_model(new_model):
+    """
+    Attach the service's cache, metrics and stores to new_model and make it the serving model.
+    The swap is one reference assignment: requests holding the previous model finish on it.
+    """
+    global hybrid_model, hybrid_batcher
+    new_model.publish_onnx()
+    new_model.cache = prediction_cache
+    new_model.state_cache = session_state_cache
+    new_model.metrics = hybrid_metrics
+    new_model.profiler = profile_capture
+    if FEATURE_STORE_DIR:
+        try:
+            new_model.feature_store = FeatureStore(
+                FEATURE_STORE_DIR,
+                new_model.encoder_fingerprint,
+                dtype=FEATURE_STORE_DTYPE,
+                lowercase=getattr(new_model.tokenizer, "do_lower_case", False)
+            )
+            print(f"[analysis_service] Storing feature vectors in {new_model.feature_store.directory}")
+        except Exception as e:
+            print(f"[analysis_service] ⚠️ Feature store disabled: {e}")
+    hybrid_model = new_model
+    if HYBRID_BATCHING and hybrid_batcher is None:
+        # Each batch runs on the model serving when it starts, so the batcher survives reloads
+        hybrid_batcher = MicroBatcher(
+            lambda texts: hybrid_model.predict_batch_or_raise(texts),
+            max_batch_size=HYBRID_BATCH_MAX_SIZE,
+            max_wait_ms=HYBRID_BATCH_MAX_WAIT_MS
+        )
+        print(f"[analysis_service] Micro-batching enabled (max_batch_size={HYBRID_BATCH_MAX_SIZE}, max_wait_ms={HYBRID_BATCH_MAX_WAIT_MS})")
+
+def load_hybrid_model():
+    """Load the hybrid DistilBERT-BiLSTM-XGBoost model."""
+    global hybrid_model
+    if not HYBRID_MODEL_AVAILABLE:
+        print("[analysis_service] Hybrid model not available.")
+        return False
+    
+    try:
+        new_model = build_hybrid_model()
+        print("[analysis_service] ✅ Hybrid model loaded successfully!")
+        install_hybrid_model(new_model)
+        return True
+    except Exception as e:
+        print(f"[analysis_service] ❌ Error loading hybrid model: {e}")
+        hybrid_model = None
+        return False
+
+def hybrid_weight_paths():
+    """Files the configured hybrid model is loaded from, watched for hot reloads."""
+    paths = [HYBRID_PYTORCH_PATH, HYBRID_XGB_PATH]
+    if HYBRID_QUANTIZE == "int8":
+        paths.append(HYBRID_INT8_PATH)
+    # The ONNX graph is not watched: a reload re-exports it when it was exported from other weights,
+    # and publishing that export must not trigger another reload
+    return paths
+
+def start_model_reloader():
+    """Set up hot reloads of the hybrid model (admin endpoint, optional file watch)."""
+    global model_reloader
+    golden_texts, golden_labels = PARITY_TEXTS, None
+    if HOT_RELOAD_GOLDEN_PATH:
+        try:
+            golden_texts, golden_labels = load_golden_set(HOT_RELOAD_GOLDEN_PATH)
+        except Exception as e:
+            print(f"[analysis_service] ⚠️ Could not read golden set {HOT_RELOAD_GOLDEN_PATH}, using built-in texts: {e}")
+    model_reloader = ModelReloader(
+        build_hybrid_model,
+        install_hybrid_model,
+        golden_texts,
+        golden_labels,
+        min_agreement=HOT_RELOAD_MIN_AGREEMENT,
+        watch_paths=hybrid_weight_paths(),
+        nice=HOT_RELOAD_NICE
+    )
+    model_reloader.watch(HOT_RELOAD_WATCH_SECONDS)
+
+def build_standard_model(path, labels, tokenizer_path=None):
+    """(tokenizer, DistilBertForSequenceClassification) from a Hugging Face directory or a checkpoint file."""
+    # Check if path is a directory (Hugging Face format)
+    if os.path.isdir(path):
+        print(f"[analysis_service] Loading Hugging Face model from directory: {path}")
+        new_tokenizer = DistilBertTokenizerFast.from_pretrained(tokenizer_path or path)
+        new_model = DistilBertForSequenceClassification.from_pretrained(path, num_labels=len(labels))
+        print(f"[analysis_service] Successfully loaded Hugging Face model from {path}")
+    else:
+        # Load base model and tokenizer
+        new_tokenizer = DistilBertTokenizerFast.from_pretrained(tokenizer_path or "distilbert-base-uncased")
+        weights_deferred = os.path.exists(path) and os.path.exists(BASE_MODEL_CONFIG)
+        if weights_deferred:
+            # Architecture only: the custom weights below replace every parameter
+            config = DistilBertConfig.from_json_file(BASE_MODEL_CONFIG)
+            config.num_labels = len(labels)
+            with no_init_weights():
+                new_model = DistilBertForSequenceClassification(config)
+        else:
+            new_model = DistilBertForSequenceClassification.from_pretrained(
+                "distilbert-base-uncased", num_labels=len(labels)
+            )
+        
+        # Load custom weights if available
+        if os.path.exists(path):
+            print(f"[analysis_service] Loading custom weights from: {path}")
+            state = load_checkpoint(path, map_location="cpu")
+            
+            if isinstance(state, dict):
+                if "state_dict" in state:
+                    new_model.load_state_dict(state["state_dict"], assign=weights_deferred)
+                    print(f"[analysis_service] Loaded state_dict from {path}")
+                elif "model_state_dict" in state:
+                    new_model.load_state_dict(state["model_state_dict"], assign=weights_deferred)
+                    print(f"[analysis_service] Loaded model_state_dict from {path}")
+                else:
+                    # Try to load as state dict directly
+                    new_model.load_state_dict(state, assign=weights_deferred)
+                    print(f"[analysis_service] Loaded direct state_dict from {path}")
+            else:
+                # Load as complete model
+                new_model = state
+                print(f"[analysis_service] Loaded complete model from {path}")
+        else:
+            print(f"[analysis_service] MODEL_PATH not found at {path}. Using base DistilBERT weights.")
+    
+    new_model.eval()
+    return new_tokenizer, new_model
+
+def load_model():
+    global tokenizer, model, standard_fingerprint
+    if not TRANSFORMERS_AVAILABLE:
+        print("[analysis_service] transformers not available; using heuristic fallback.")
+        return
+    
+    try:
+        tokenizer, model = build_standard_model(MODEL_PATH, LABELS)
+        standard_fingerprint = module_fingerprint(model, extra=(LABELS,))
+        print(f"[analysis_service] Model loaded successfully. Device: {device}")
+        
+    except Exception as e:
+        print(f"[analysis_service] Error loading model: {e}")
+        print("[analysis_service] Falling back to heuristic analysis")
+        tokenizer = None
+        model = None
+
+def ensure_standard_model():
+    """Return True if the standard model can serve, loading it on first use when the policy allows."""
+    global standard_loaded_on_demand, standard_load_failed, standard_last_used
+    standard_last_used = time.monotonic()
+    if model is not None and tokenizer is not None:
+        return True
+    if "standard" not in SERVING_POLICIES[SERVING_POLICY]["lazy"] or standard_load_failed:
+        return False
+    
+    with model_lock:
+        if model is None or tokenizer is None:
+            print("[analysis_service] Loading standard model on demand...")
+            load_model()
+            standard_loaded_on_demand = model is not None
+            standard_load_failed = model is None
+        standard_last_used = time.monotonic()
+    return model is not None and tokenizer is not None
+
+def unload_idle_models():
+    """Drop an on-demand standard model that has not served for SECONDARY_MODEL_IDLE_SECONDS."""
+    global tokenizer, model, standard_loaded_on_demand
+    with model_lock:
+        if not standard_loaded_on_demand or model is None:
+            return False
+        if time.monotonic() - standard_last_used < SECONDARY_MODEL_IDLE_SECONDS:
+            return False
+        # In-flight requests keep their own references until they finish
+        tokenizer = None
+        model = None
+        standard_loaded_on_demand = False
+    gc.collect()
+    print("[analysis_service] Unloaded idle standard model")
+    return True
+
+def _idle_unload_loop():
+    interval = max(1.0, min(SECONDARY_MODEL_IDLE_SECONDS / 4, 30.0))
+    while True:
+        time.sleep(interval)
+        unload_idle_models()
+
+# Set once load_models() has run, so importing both entry points loads the models once
+models_loaded = False
+
+def load_models():
+    """Load the models resident under the serving policy and start the idle unloader."""
+    global models_loaded
+    with model_lock:
+        if models_loaded:
+            return
+        models_loaded = True
+    print(f"[analysis_service] Serving policy: {SERVING_POLICY}")
+    registered = model_registry.scan()
+    if registered:
+        print(f"[analysis_service] Model registry: {registered} versions under {MODEL_REGISTRY_DIR} "
+              f"(budget {MODEL_REGISTRY_MAX_BYTES / 1024 ** 2:.0f} MB)")
+    if "standard" in SERVING_POLICIES[SERVING_POLICY]["resident"]:
+        load_model()
+    if "hybrid" in SERVING_POLICIES[SERVING_POLICY]["resident"]:
+        if HYBRID_MODEL_AVAILABLE:
+            apply_autotune_profile()
+        load_hybrid_model()
+        if HYBRID_MODEL_AVAILABLE:
+            start_model_reloader()
+    if SERVING_POLICIES[SERVING_POLICY]["lazy"] and SECONDARY_MODEL_IDLE_SECONDS > 0:
+        threading.Thread(target=_idle_unload_loop, name="model-idle-unload", daemon=True).start()
+
+# ONNX graphs exported for registry versions that ship none. Versions are immutable, so the
+# graphs go to a directory of this process, removed when it exits.
+registry_onnx_dir = None
+
+def registry_onnx_path(version):
+    """Where an ONNX graph exported for a registry version without one is kept."""
+    global registry_onnx_dir
+    with model_lock:
+        if registry_onnx_dir is None:
+            registry_onnx_dir = tempfile.TemporaryDirectory(prefix="model_registry_onnx_")
+    return os.path.join(registry_onnx_dir.name, f"{version.name}@{version.version}.onnx")
+
+def load_registered_model(version):
+    """Build a registry version with the service's settings: a HybridModelInference or a standard model tuple."""
+    if version.kind == "standard":
+        if not TRANSFORMERS_AVAILABLE:
+            raise RuntimeError("transformers is not available")
+        new_tokenizer, new_model = build_standard_model(version.artifacts["pytorch"], version.labels, version.artifacts.get("tokenizer"))
+        return new_tokenizer, new_model, version.labels, module_fingerprint(new_model, extra=(version.labels,))
+
+    if not HYBRID_MODEL_AVAILABLE:
+        raise RuntimeError("The hybrid model is not available")
+    kwargs = hybrid_model_kwargs()
+    kwargs.update(
+        model_path=version.artifacts["pytorch"],
+        xgb_path=version.artifacts["xgb"],
+        tokenizer_path=version.artifacts.get("tokenizer"),
+        labels=version.labels,
+        quantized_path=version.artifacts.get("int8"),
+        # A shipped graph is served as is; otherwise one is exported outside the registry
+        onnx_path=version.artifacts.get("onnx") or registry_onnx_path(version),
+        onnx_export="onnx" not in version.artifacts,
+        num_labels=len(version.labels)
+    )
+    kwargs.update(version.architecture)
+    new_model = HybridModelInference(**kwargs)
+    new_model.publish_onnx()
+    if TORCH_NUM_THREADS > 0:
+        new_model.set_num_threads(TORCH_NUM_THREADS)
+    new_model.cache = prediction_cache
+    new_model.state_cache = session_state_cache
+    new_model.metrics = hybrid_metrics
+    return new_model
+
+def registered_model_bytes(version, loaded):
+    """Memory a loaded registry version holds: its tensors plus the XGBoost head and ONNX graph it keeps."""
+    if version.kind == "standard":
+        return module_bytes(loaded[1])
+    size = module_bytes(loaded.model)
+    if loaded.xgb_model is not None:
+        size += os.path.getsize(loaded.xgb_path)
+    if loaded.backend == "onnx" and os.path.exists(loaded.onnx_path):
+        size += os.path.getsize(loaded.onnx_path)
+    return size
+
+model_registry = ModelRegistry(MODEL_REGISTRY_DIR, load_registered_model, registered_model_bytes, MODEL_REGISTRY_MAX_BYTES)
+
+def clean_model_name(data):
+    """
+    Validate the optional "model" field of a prediction request ("<name>" or "<name>@<version>").
+    Returns (name or None for the default models, None) or (None, error response body).
+    """
+    name = data.get("model") if isinstance(data, dict) else None
+    if name is None:
+        return None, None
+    if not isinstance(name, str) or not name.strip():
+        return None, {"error": "Field 'model' must be a model name"}
+    try:
+        model_registry.resolve(name.strip())
+    except KeyError as e:
+        return None, {"error": str(e.args[0])}
+    return name.strip(), None
+
+# Heuristic keywords per label. Matches are whole words, so inflections that the
+# old substring checks caught ("worried" for "worry") are listed explicitly.
+FALLBACK_KEYWORDS = KeywordScorer({
+    "Anxiety": ["worry", "worried", "worries", "worrying", "anxious", "anxiousness",
+                "panic", "panics", "panicked", "panicking", "nervous", "nervousness"],
+    "Depression": ["sad", "sadness", "hopeless", "hopelessness", "down", "tired", "tiredness"],
+    "ADHD": ["focus", "focused", "focusing", "unfocused", "fidget", "fidgety", "fidgeting",
+             "impulsive", "impulsively", "restless", "restlessness", "adhd"],
+    "Bipolar": ["racing thoughts", "manic", "mania", "euphoric"]
+})
+
+@functools.lru_cache(maxsize=None)
+def _fallback_scores(hit_labels):
+    """Top label and sorted (label, score) pairs for the labels with keyword hits (one entry per label subset)."""
+    scores = {l: 1.0 / len(LABELS) for l in LABELS}
+    for label in hit_labels:
+        scores[label] += 0.35
+    total = sum(max(v, 0.001) for v in scores.values())
+    norm = {k: max(v, 0.001) / total for k, v in scores.items()}
+    top = max(norm.items(), key=lambda kv: kv[1])[0]
+    return top, tuple((k, float(v)) for k, v in sorted(norm.items(), key=lambda kv: -kv[1]))
+
+def fallback_result(counts):
+    """Heuristic prediction from per-label keyword hits (FALLBACK_KEYWORDS order)."""
+    top, scores = _fallback_scores(tuple(label for label, hits in zip(FALLBACK_KEYWORDS.labels, counts) if hits))
+    return top, [{"label": label, "score": score} for label, score in scores]
+
+def fallback_predict(text: str):
+    return fallback_result(FALLBACK_KEYWORDS.count(text))
+
+def fallback_predict_batch(texts):
+    """fallback_predict over many texts, as API results in input order."""
+    results = []
+    for counts in FALLBACK_KEYWORDS.count_batch(texts):
+        top, scores = fallback_result(counts)
+        results.append({"topPattern": top, "confidenceScores": scores})
+    return results
+
+def standard_predict_batch(texts, standard=None):
+    """
+    Run a standard DistilBertForSequenceClassification model over a batch of texts: the default
+    one, or a registry version's (tokenizer, model, labels, fingerprint).
+    """
+    # Hold references so an idle unload cannot pull the model out from under this call
+    current_tokenizer, current_model, labels, fingerprint = standard or (tokenizer, model, LABELS, standard_fingerprint)
+    keys = [None] * len(texts)
+    results = [None] * len(texts)
+    if prediction_cache is not None:
+        lowercase = getattr(current_tokenizer, "do_lower_case", False)
+        keys = [prediction_cache.make_key(text, fingerprint, lowercase=lowercase) for text in texts]
+        results = [prediction_cache.get(key) for key in keys]
+
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        started = time.perf_counter()
+        inputs = current_tokenizer([texts[i] for i in missing], truncation=True, padding=True, return_tensors="pt")
+        tokenized = time.perf_counter()
+        with torch.no_grad():
+            outputs = current_model(**inputs)
+            probs = F.softmax(outputs.logits, dim=-1).cpu().numpy().tolist()
+        classified = time.perf_counter()
+
+        for i, row in zip(missing, probs):
+            scores = [{"label": labels[j], "score": float(row[j])} for j in range(len(labels))]
+            scores_sorted = sorted(scores, key=lambda x: -x["score"])
+            results[i] = {"topPattern": scores_sorted[0]["label"], "confidenceScores": scores_sorted}
+            if prediction_cache is not None:
+                prediction_cache.put(keys[i], results[i])
+        standard_metrics.observe_batch(len(missing))
+        standard_metrics.observe_stage("tokenize", tokenized - started)
+        standard_metrics.observe_stage("encoder", classified - tokenized)
+        standard_metrics.observe_stage("serialize", time.perf_counter() - classified)
+    return results
+
+def predict_registered(texts, model_name, route):
+    """Predict texts in input order with a registry version, loading it on first use. Errors are not hidden by fallbacks."""
+    version, loaded = model_registry.get(model_name)
+    results = []
+    for i in range(0, len(texts), PREDICT_BATCH_CHUNK_SIZE):
+        chunk = texts[i:i + PREDICT_BATCH_CHUNK_SIZE]
+        results.extend(loaded.predict_batch_or_raise(chunk) if version.kind == "hybrid" else standard_predict_batch(chunk, loaded))
+    prediction_requests.inc(route, version.kind)
+    return results
+
+def predict_texts(texts, route="/predict/batch", model_name=None):
+    """
+    Predict a list of texts in input order: hybrid model, then standard model, then heuristics,
+    or the registry version model_name.
+    """
+    if model_name is not None:
+        return predict_registered(texts, model_name, route)
+    chunks = [texts[i:i + PREDICT_BATCH_CHUNK_SIZE] for i in range(0, len(texts), PREDICT_BATCH_CHUNK_SIZE)]
+    hybrid_failed = False
+    # One model for the whole request, even if a reload swaps it meanwhile
+    current = hybrid_model
+
+    # Try hybrid model first
+    if current is not None:
+        try:
+            results = []
+            for chunk in chunks:
+                results.extend(current.predict_batch_or_raise(chunk))
+            prediction_requests.inc(route, "hybrid")
+            return results
+        except Exception as e:
+            print(f"[analysis_service] Hybrid model batch prediction failed: {e}")
+            hybrid_failed = True
+            # Fall through to standard model
+
+    # Fallback to standard model
+    if not ensure_standard_model():
+        results = fallback_predict_batch(texts)
+        if hybrid_failed:
+            hybrid_metrics.count_fallback("fallback_predict", len(texts))
+        prediction_requests.inc(route, "fallback_predict")
+        return results
+
+    results = []
+    for chunk in chunks:
+        results.extend(standard_predict_batch(chunk))
+    if hybrid_failed:
+        hybrid_metrics.count_fallback("standard", len(texts))
+    prediction_requests.inc(route, "standard")
+    return results
+
+def clean_batch_texts(data):
+    """
+    Validate a /predict/batch request body.
+    Returns (texts, None) on success or (None, error response body) when invalid.
+    """
+    texts = data.get("texts") if isinstance(data, dict) else None
+    if not isinstance(texts, list) or not texts:
+        return None, {"error": "Field 'texts' must be a non-empty list"}
+    if len(texts) > MAX_BATCH_TEXTS:
+        return None, {"error": f"Too many texts (max {MAX_BATCH_TEXTS})"}
+
+    cleaned = []
+    for i, text in enumerate(texts):
+        text = (text if isinstance(text, str) else "").strip()
+        if len(text) < 5:
+            return None, {"error": "Text is too short", "index": i}
+        cleaned.append(text)
+    return cleaned, None
+
+def predict_text(text, route="/predict", model_name=None):
+    """
+    Predict one text: hybrid model (cache, then micro-batch), then standard model, then heuristics,
+    or the registry version model_name.
+    """
+    if model_name is not None:
+        return predict_registered([text], model_name, route)[0]
+    hybrid_failed = False
+    current = hybrid_model
+
+    # Try hybrid model first
+    if current is not None:
+        try:
+            # Cache hits skip the batch window entirely
+            result = current.get_cached(text)
+            if result is None and hybrid_batcher is not None:
+                result = hybrid_batcher.submit(text)
+            elif result is None:
+                result = current.predict_batch_or_raise([text])[0]
+            prediction_requests.inc(route, "hybrid")
+            return result
+        except Exception as e:
+            print(f"[analysis_service] Hybrid model prediction failed: {e}")
+            hybrid_failed = True
+            # Fall through to standard model
+
+    return predict_without_hybrid(text, route, hybrid_failed)
+
+def predict_without_hybrid(text, route, hybrid_failed=False):
+    """Predict one text with the standard model, or heuristics if it is unavailable."""
+    if not ensure_standard_model():
+        top, scores = fallback_predict(text)
+        if hybrid_failed:
+            hybrid_metrics.count_fallback("fallback_predict")
+        prediction_requests.inc(route, "fallback_predict")
+        return {"topPattern": top, "confidenceScores": scores}
+
+    result = standard_predict_batch([text])[0]
+    if hybrid_failed:
+        hybrid_metrics.count_fallback("standard")
+    prediction_requests.inc(route, "standard")
+    return result
+
+def clean_session_messages(data):
+    """
+    Validate a /predict/session request body: {"messages": [...]}, oldest message first.
+    Returns (messages, None) on success or (None, error response body) when invalid.
+    """
+    messages = data.get("messages") if isinstance(data, dict) else None
+    if not isinstance(messages, list) or not messages:
+        return None, {"error": "Field 'messages' must be a non-empty list"}
+    if len(messages) > SESSION_MAX_MESSAGES:
+        return None, {"error": f"Too many messages (max {SESSION_MAX_MESSAGES})"}
+
+    cleaned = []
+    for i, message in enumerate(messages):
+        message = (message if isinstance(message, str) else "").strip()
+        if not message:
+            return None, {"error": "Message is empty", "index": i}
+        cleaned.append(message)
+    if sum(len(message) for message in cleaned) < 5:
+        return None, {"error": "Text is too short"}
+    return cleaned, None
+
+def predict_session(messages, route="/predict/session", model_name=None):
+    """
+    Predict a whole conversation. The hybrid model encodes only messages it has not seen
+    (see HybridModelInference.predict_session); the other models get the joined transcript.
+    """
+    if model_name is not None:
+        version, loaded = model_registry.get(model_name)
+        if version.kind == "hybrid":
+            result = loaded.predict_session(messages, SESSION_MAX_TOKENS)
+        else:
+            result = standard_predict_batch(["\n".join(messages)], loaded)[0]
+        prediction_requests.inc(route, version.kind)
+        return result
+    hybrid_failed = False
+    current = hybrid_model
+
+    if current is not None:
+        try:
+            result = current.predict_session(messages, SESSION_MAX_TOKENS)
+            prediction_requests.inc(route, "hybrid")
+            return result
+        except Exception as e:
+            print(f"[analysis_service] Hybrid model session prediction failed: {e}")
+            hybrid_failed = True
+
+    return predict_without_hybrid("\n".join(messages), route, hybrid_failed)
+
+def check_admin(token):
+    """None when token matches ADMIN_TOKEN, else (error body, status); admin endpoints 404 without ADMIN_TOKEN."""
+    if not ADMIN_TOKEN:
+        return {"error": "Not found"}, 404
+    if not token or not hmac.compare_digest(token.encode("utf-8"), ADMIN_TOKEN.encode("utf-8")):
+        return {"error": "Forbidden"}, 403
+    return None
+
+def profile_admin(data):
+    """
+    Handle /admin/profile: None reads the capture status, {"predictions": N, "record_shapes": bool}
+    profiles the next N hybrid predictions and {"cancel": true} stops a running capture.
+    Returns (response body, status).
+    """
+    if profile_capture is None or hybrid_model is None:
+        return {"error": "Profiling needs the hybrid model"}, 409
+    if data is None:
+        return profile_capture.status(), 200
+    if not isinstance(data, dict):
+        return {"error": "Expected a JSON object"}, 400
+    if data.get("cancel"):
+        return profile_capture.cancel(), 200
+    try:
+        return profile_capture.arm(int(data.get("predictions", 1)), bool(data.get("record_shapes", False))), 202
+    except (TypeError, ValueError) as e:
+        return {"error": str(e)}, 400
+    except RuntimeError as e:
+        return {"error": str(e)}, 409
+
+def reload_admin(data):
+    """
+    Handle /admin/reload: None reads the reload status, a POST body ({} or {"reason": str})
+    starts building, warming and validating a new hybrid model that replaces the current one.
+    Returns (response body, status).
+    """
+    if model_reloader is None:
+        return {"error": "Hot reload needs the hybrid model"}, 409
+    if data is None:
+        return model_reloader.status(), 200
+    if not isinstance(data, dict):
+        return {"error": "Expected a JSON object"}, 400
+    try:
+        return model_reloader.reload(str(data.get("reason") or "admin")), 202
+    except RuntimeError as e:
+        return {"error": str(e)}, 409
+
+def model_info():
+    """Information about the loaded models, as served by /model-info."""
+    info = {
+        "standard_model_loaded": model is not None and tokenizer is not None,
+        "hybrid_model_loaded": hybrid_model is not None,
+        "available_labels": LABELS,
+        "hybrid_labels": HYBRID_LABELS if hybrid_model else None,
+        "serving_policy": SERVING_POLICY,
+        "standard_model_on_demand": standard_loaded_on_demand,
+        "secondary_model_idle_seconds": SECONDARY_MODEL_IDLE_SECONDS,
+        "torch_threads": torch.get_num_threads(),
+        "autotune": {
+            "mode": AUTOTUNE,
+            "workers": AUTOTUNE_WORKERS,
+            "profile_path": AUTOTUNE_PROFILE_PATH,
+            "profile": autotune.summarize(autotune_profile) if HYBRID_MODEL_AVAILABLE else None
+        }
+    }
+    
+    current = hybrid_model
+    if current:
+        info.update(current.get_model_info())
+    
+    info["batching"] = hybrid_batcher.stats() if hybrid_batcher is not None else {"enabled": False}
+    info["cache"] = prediction_cache.stats() if prediction_cache is not None else {"enabled": False}
+    info["session_state_cache"] = session_state_cache.stats()
+    info["hot_reload"] = model_reloader.status() if model_reloader is not None else {"enabled": False}
+    info["registry"] = model_registry.stats()
+    
+    return info
@@ -0,0 +1,87 @@
+"""
+Keyword matching for the heuristic fallback predictors of the model service.
+
+Keyword tables are compiled once into a set of words (plus any multi-word
+phrases). A text is lowercased, split on ASCII punctuation and whitespace in
+one C-level pass and intersected with that set, so scoring costs one pass over
+the text however many keywords the tables hold. Keywords only match whole words
+("down" does not match "download"), and each keyword counts once per text and
+label even if a table lists it twice.
+"""
+
+import re
+import string
+from typing import Dict, Iterable, List, Tuple
+
+# Bytes that separate words; translated to spaces before splitting
+_SEPARATORS = (string.punctuation + string.whitespace).encode("ascii")
+_NORMALIZE = bytes.maketrans(_SEPARATORS, b" " * len(_SEPARATORS))
+
+
+def normalize(text: str) -> bytes:
+    """Lowercased UTF-8 text with every separator replaced by a space."""
+    return text.lower().encode("utf-8").translate(_NORMALIZE)
+
+
+def split_words(text: str) -> List[bytes]:
+    """Lowercased words of text, as UTF-8 bytes."""
+    return normalize(text).split()
+
+
+class KeywordScorer:
+    """Counts the distinct keywords of each label that occur in a text as whole words."""
+
+    def __init__(self, table: Dict[str, Iterable[str]]):
+        self.labels = list(table)
+        word_labels: Dict[bytes, set] = {}
+        phrase_labels: Dict[Tuple[bytes, ...], set] = {}
+        for index, label in enumerate(self.labels):
+            for keyword in table[label]:
+                words = tuple(split_words(keyword))
+                if len(words) == 1:
+                    word_labels.setdefault(words[0], set()).add(index)
+                elif words:
+                    phrase_labels.setdefault(words, set()).add(index)
+
+        # Phrase first words are looked up too, with no labels of their own
+        self._word_labels = {words[0]: () for words in phrase_labels}
+        self._word_labels.update((word, tuple(sorted(labels))) for word, labels in word_labels.items())
+        self._words = frozenset(self._word_labels)
+        # (first word, pattern over the normalized text, label indices); searched only when the first word occurs.
+        # The pattern starts with a literal so the regex engine can skip ahead; the word start is checked after.
+        self._phrases = [
+            (words[0], re.compile(rb" +".join(re.escape(w) for w in words) + rb"(?![^ ])"), tuple(sorted(labels)))
+            for words, labels in phrase_labels.items()
+        ]
+
+    def count(self, text: str) -> List[int]:
+        """Distinct keyword hits per label, in self.labels order."""
+        normalized = normalize(text)
+        counts = [0] * len(self.labels)
+        present = self._words.intersection(normalized.split())
+        if not present:
+            return counts
+        for word in present:
+            for index in self._word_labels[word]:
+                counts[index] += 1
+
+        for first, pattern, labels in self._phrases:
+            if first in present and self._phrase_occurs(pattern, normalized):
+                for index in labels:
+                    counts[index] += 1
+        return counts
+
+    @staticmethod
+    def _phrase_occurs(pattern, normalized: bytes) -> bool:
+        for match in pattern.finditer(normalized):
+            if match.start() == 0 or normalized[match.start() - 1] == 32:
+                return True
+        return False
+
+    def count_batch(self, texts: Iterable[str]) -> List[List[int]]:
+        """count() for every text, in input order."""
+        count = self.count
+        return [count(text) for text in texts]
+
+    def count_by_label(self, text: str) -> Dict[str, int]:
+        return dict(zip(self.labels, self.count(text)))
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+HTTP load generator for the model service's /predict and /api/analyze endpoints.
+
+Two modes, each run as a sweep of steps:
+    closed - N clients send back-to-back requests (--concurrency 1,2,4,8)
+    open   - requests arrive at a fixed rate whatever the latency (--rates 5,10,20),
+             with latency measured from the scheduled arrival, so queueing in an
+             overloaded server shows up instead of slowing the generator down
+
+Every client thread keeps one keep-alive HTTP/1.1 connection (Flask's development
+server closes each connection, so use the ASGI server to measure with reuse). Text lengths are
+drawn from --lengths, a words:weight distribution. Each step reports p50/p95/p99
+latency, throughput and errors by kind; the collapse point is the first step whose
+p95 exceeds --knee-factor x the first step's p95, or whose error rate exceeds
+--max-error-rate.
+
+Uses only the standard library (plus the synthetic texts from benchmark_utils).
+Works against a model service started without models:
+    SERVING_POLICY=heuristic uvicorn asgi_app:app --port 5002
+    python load_test.py --mode open --rates 50,100,200,400
+
+Usage:
+    python load_test.py --mode closed --concurrency 1,2,4,8,16 --duration 20
+    python load_test.py --mode open --rates 2,4,8 --lengths 8:0.6,40:0.3,150:0.1 --output load.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import queue
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from benchmark_utils import make_texts, parse_int_list, write_results
+
+# Errors that mean a reused keep-alive connection was closed by the server in the meantime
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+# Distinct texts generated per length; requests cycle through them
+TEXTS_PER_LENGTH = 64
+
+
+def parse_lengths(value: str) -> List[Tuple[int, float]]:
+    """Parse a words:weight distribution, e.g. "8:0.6,40:0.3,150:0.1" (weight defaults to 1)."""
+    lengths = []
+    for part in value.split(","):
+        if not part.strip():
+            continue
+        words, _, weight = part.partition(":")
+        lengths.append((int(words), float(weight) if weight else 1.0))
+    return lengths
+
+
+def percentile(samples: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of sorted samples."""
+    if not samples:
+        return None
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+class TextSource:
+    """Thread-safe random request bodies following the configured length distribution."""
+
+    def __init__(self, lengths: List[Tuple[int, float]], endpoints: List[str], seed: int):
+        self.words = [words for words, _ in lengths]
+        self.weights = [weight for _, weight in lengths]
+        self.endpoints = endpoints
+        self.texts = {words: make_texts(words, TEXTS_PER_LENGTH, seed=seed) for words in self.words}
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def next(self) -> Tuple[str, bytes]:
+        with self.lock:
+            words = self.rng.choices(self.words, self.weights)[0]
+            text = self.rng.choice(self.texts[words])
+            endpoint = self.rng.choice(self.endpoints)
+        return endpoint, json.dumps({"text": text}).encode("utf-8")
+
+
+class Client:
+    """One keep-alive connection to the service, reconnected after errors."""
+
+    def __init__(self, url: str, timeout: float):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port
+        self.prefix = parsed.path.rstrip("/")
+        self.connection_class = http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
+        self.timeout = timeout
+        self.connection = None
+        self.requests_on_connection = 0
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+        self.connection = None
+        self.requests_on_connection = 0
+
+    def _send(self, path: str, body: bytes) -> int:
+        if self.connection is None:
+            self.connection = self.connection_class(self.host, self.port, timeout=self.timeout)
+        self.connection.request("POST", self.prefix + path, body=body, headers={"Content-Type": "application/json"})
+        response = self.connection.getresponse()
+        response.read()
+        self.requests_on_connection += 1
+        if response.getheader("Connection", "").lower() == "close":
+            self.close()
+        return response.status
+
+    def post(self, path: str, body: bytes) -> Tuple[Optional[int], Optional[str]]:
+        """Send one request; returns (status, None) or (None, error kind)."""
+        try:
+            try:
+                return self._send(path, body), None
+            except STALE_CONNECTION_ERRORS:
+                if self.requests_on_connection == 0:
+                    raise
+                # The server dropped an idle keep-alive connection; retry once on a new one
+                self.close()
+                return self._send(path, body), None
+        except TimeoutError:
+            self.close()
+            return None, "timeout"
+        except (OSError, http.client.HTTPException) as e:
+            self.close()
+            return None, type(e).__name__
+
+
+class StepRecorder:
+    """Latency samples and outcomes of one sweep step."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies_ms = []
+        self.errors = {}
+        self.last_completed = None
+
+    def record(self, started: float, status: Optional[int], error: Optional[str]):
+        finished = time.perf_counter()
+        with self.lock:
+            self.last_completed = finished
+            if status == 200:
+                self.latencies_ms.append((finished - started) * 1000.0)
+            else:
+                kind = error or f"http_{status}"
+                self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def record_dropped(self):
+        with self.lock:
+            self.errors["client_queue_timeout"] = self.errors.get("client_queue_timeout", 0) + 1
+
+    def summary(self, started: float, **extra) -> Dict:
+        latencies = sorted(self.latencies_ms)
+        errors = sum(self.errors.values())
+        total = len(latencies) + errors
+        elapsed = max((self.last_completed or started) - started, 1e-9)
+        return dict(
+            extra,
+            requests=total,
+            ok=len(latencies),
+            errors=dict(self.errors),
+            error_rate=errors / total if total else 0.0,
+            throughput_rps=len(latencies) / elapsed,
+            elapsed_s=elapsed,
+            mean_ms=sum(latencies) / len(latencies) if latencies else None,
+            p50_ms=percentile(latencies, 0.50),
+            p95_ms=percentile(latencies, 0.95),
+            p99_ms=percentile(latencies, 0.99),
+            max_ms=latencies[-1] if latencies else None
+        )
+
+
+def run_closed_step(args, source: TextSource, concurrency: int) -> Dict:
+    """`concurrency` clients, each sending its next request as soon as the last one returns."""
+    recorder = StepRecorder()
+    started = time.perf_counter()
+    deadline = started + args.duration
+
+    def client_loop():
+        client = Client(args.url, args.timeout)
+        try:
+            while time.perf_counter() < deadline:
+                path, body = source.next()
+                sent = time.perf_counter()
+                status, error = client.post(path, body)
+                recorder.record(sent, status, error)
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=client_loop, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder.summary(started, mode="closed", concurrency=concurrency)
+
+
+def run_open_step(args, source: TextSource, rate: float) -> Dict:
+    """
+    Requests arrive at `rate` per second (Poisson or evenly spaced) and are served by
+    a pool of --connections clients. Latency counts from the scheduled arrival, so
+    time spent waiting for a free connection is included. Requests still waiting
+    longer than --timeout are dropped and counted as errors.
+    """
+    recorder = StepRecorder()
+    arrivals = queue.Queue()
+    rng = random.Random(args.seed)
+    done = object()
+
+    def client_loop():
+        client = Client(args.url, args.timeout)
+        try:
+            while True:
+                item = arrivals.get()
+                if item is done:
+                    return
+                scheduled, path, body = item
+                if time.perf_counter() - scheduled > args.timeout:
+                    recorder.record_dropped()
+                    continue
+                status, error = client.post(path, body)
+                recorder.record(scheduled, status, error)
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=client_loop, daemon=True) for _ in range(args.connections)]
+    for thread in threads:
+        thread.start()
+
+    started = time.perf_counter()
+    deadline = started + args.duration
+    scheduled = started
+    sent = 0
+    while True:
+        gap = rng.expovariate(rate) if args.arrival == "poisson" else 1.0 / rate
+        scheduled += gap
+        if scheduled >= deadline:
+            break
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        path, body = source.next()
+        arrivals.put((scheduled, path, body))
+        sent += 1
+
+    for _ in threads:
+        arrivals.put(done)
+    for thread in threads:
+        thread.join()
+    return recorder.summary(started, mode="open", rate=rate, offered=sent)
+
+
+def find_knee(steps: List[Dict], knee_factor: float, max_error_rate: float) -> Optional[int]:
+    """Index of the first step where latency or errors collapse, or None."""
+    baseline = next((step["p95_ms"] for step in steps if step["p95_ms"] is not None), None)
+    for i, step in enumerate(steps):
+        if step["error_rate"] > max_error_rate:
+            return i
+        if baseline is not None and step["p95_ms"] is not None and step["p95_ms"] > knee_factor * baseline:
+            return i
+    return None
+
+
+def format_ms(value: Optional[float]) -> str:
+    return f"{value:.1f}" if value is not None else "-"
+
+
+def check_health(url: str, timeout: float) -> bool:
+    parsed = urlparse(url)
+    connection_class = http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
+    connection = connection_class(parsed.hostname or "localhost", parsed.port, timeout=timeout)
+    try:
+        connection.request("GET", parsed.path.rstrip("/") + "/health")
+        return connection.getresponse().status == 200
+    except (OSError, http.client.HTTPException):
+        return False
+    finally:
+        connection.close()
+
+
+def main():
+    port = os.getenv("MODEL_SERVICE_PORT", "5002")
+    parser = argparse.ArgumentParser(description="Load test the model service /predict and /api/analyze endpoints")
+    parser.add_argument("--url", default=f"http://localhost:{port}", help="Base URL of the model service")
+    parser.add_argument("--endpoints", default="/predict", help="Comma-separated endpoints to spread requests over")
+    parser.add_argument("--mode", default="closed", choices=["closed", "open"], help="Closed-loop clients or open-loop arrivals")
+    parser.add_argument("--concurrency", default="1,2,4,8,16", help="Closed mode: comma-separated client counts")
+    parser.add_argument("--rates", default="1,2,4,8", help="Open mode: comma-separated arrival rates (requests/s)")
+    parser.add_argument("--arrival", default="poisson", choices=["poisson", "constant"], help="Open mode: inter-arrival times")
+    parser.add_argument("--connections", type=int, default=32, help="Open mode: keep-alive connections serving the arrivals")
+    parser.add_argument("--lengths", default="8:0.5,32:0.3,128:0.2", help="Text length distribution as words:weight pairs")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per sweep step")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument("--knee-factor", type=float, default=3.0, help="p95 growth over the first step that counts as collapse")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="Error rate that counts as collapse")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for texts and arrivals")
+    parser.add_argument("--output", default=None, help="Optional JSON results file")
+    args = parser.parse_args()
+
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    source = TextSource(parse_lengths(args.lengths), endpoints, args.seed)
+
+    print("🚀 Model Service Load Test")
+    print("=" * 72)
+    if not check_health(args.url, args.timeout):
+        print(f"❌ {args.url}/health is not responding; start the model service first")
+        return 1
+
+    if args.mode == "closed":
+        levels = parse_int_list(args.concurrency)
+        level_name = "clients"
+    else:
+        levels = [float(r) for r in args.rates.split(",") if r.strip()]
+        level_name = "rate/s"
+    print(f"Target: {args.url} {','.join(endpoints)}, {args.mode} loop, {args.duration:.0f}s per step")
+    print(f"{level_name:>8} {'requests':>9} {'ok/s':>8} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+
+    steps = []
+    for level in levels:
+        if args.mode == "closed":
+            step = run_closed_step(args, source, level)
+        else:
+            step = run_open_step(args, source, level)
+        steps.append(step)
+        print(f"{level:>8} {step['requests']:>9} {step['throughput_rps']:>8.1f} {step['error_rate']:>7.1%} "
+              f"{format_ms(step['p50_ms']):>9} {format_ms(step['p95_ms']):>9} {format_ms(step['p99_ms']):>9}")
+        if step["errors"]:
+            print(f"         errors: {step['errors']}")
+
+    knee = find_knee(steps, args.knee_factor, args.max_error_rate)
+    print()
+    if knee is None:
+        print(f"✅ No collapse up to {levels[-1]} {level_name}")
+    elif knee == 0:
+        print(f"⚠️ Already collapsed at the first step ({levels[0]} {level_name})")
+    else:
+        print(f"⚠️ Latency collapses at {levels[knee]} {level_name}; "
+              f"last healthy step: {levels[knee - 1]} {level_name} at {steps[knee - 1]['throughput_rps']:.1f} ok/s")
+
+    write_results({
+        "url": args.url,
+        "endpoints": endpoints,
+        "mode": args.mode,
+        "lengths": args.lengths,
+        "duration_s": args.duration,
+        "knee_factor": args.knee_factor,
+        "max_error_rate": args.max_error_rate,
+        "knee_index": knee,
+        "knee_level": levels[knee] if knee is not None else None,
+        "steps": steps
+    }, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,290 @@
+"""
+Prometheus-style metrics for the Virtual Therapist model service, rendered in the
+text exposition format on /metrics without a client library.
+
+Recording is lock-free: each thread updates its own shard of a metric (a plain
+dict only that thread writes to), and a scrape sums the shards. The only lock is
+taken once per thread and metric, when the thread records its first value. The
+shards of finished threads are folded into a base total (when a scrape runs or
+a new thread records), so a server that starts a thread per request keeps one
+shard per live thread, not one per request served.
+"""
+
+import bisect
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Seconds; covers everything from a cache hit to a long CPU forward pass
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Texts per model forward pass
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _ShardedMetric:
+    """Base for metrics whose values live in one dict per recording thread."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        # (weak reference to the recording thread, its shard)
+        self._shards: List[Tuple[weakref.ref, Dict]] = []
+        # Totals of threads that have finished; replaced, never mutated, so copies stay valid
+        self._base: Dict = {}
+        self._lock = threading.Lock()
+
+    def _shard(self) -> Dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = {}
+            with self._lock:
+                self._fold_finished()
+                self._shards.append((weakref.ref(threading.current_thread()), shard))
+            self._local.shard = shard
+        return shard
+
+    def _fold_finished(self):
+        """Merge the shards of finished threads into the base total (lock held)."""
+        live = []
+        base = None
+        for owner, shard in self._shards:
+            thread = owner()
+            if thread is not None and thread.is_alive():
+                live.append((owner, shard))
+                continue
+            # A finished thread no longer writes to its shard
+            if base is None:
+                base = dict(self._base)
+            for labels, value in shard.items():
+                base[labels] = self._merge(base.get(labels), value)
+        if base is not None:
+            self._shards = live
+            self._base = base
+
+    def _merge(self, total, value):
+        raise NotImplementedError
+
+    def _shard_copies(self) -> List[Dict]:
+        with self._lock:
+            self._fold_finished()
+            shards = [self._base] + [shard for _, shard in self._shards]
+        # dict.copy() is a single C call, so it sees a consistent shard
+        return [shard.copy() for shard in shards]
+
+
+class Counter(_ShardedMetric):
+    """Monotonic counter, optionally split by label values."""
+
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1.0):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0.0) + amount
+
+    def _merge(self, total, value):
+        return value if total is None else total + value
+
+    def values(self) -> Dict[Tuple, float]:
+        totals: Dict[Tuple, float] = {}
+        for shard in self._shard_copies():
+            for labels, value in shard.items():
+                totals[labels] = totals.get(labels, 0.0) + value
+        return totals
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+                for labels, value in sorted(self.values().items())]
+
+
+class Gauge(Counter):
+    """Value that goes up and down (e.g. requests in flight); shards hold per-thread deltas."""
+
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_ShardedMetric):
+    """Cumulative-bucket histogram, optionally split by label values."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels):
+        shard = self._shard()
+        # Per-bucket (not cumulative) counts, the +Inf bucket, then the sum
+        row = shard.get(labels)
+        if row is None:
+            row = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        row[bisect.bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    def _merge(self, total, row):
+        return list(row) if total is None else [a + b for a, b in zip(total, row)]
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def values(self) -> Dict[Tuple, List[float]]:
+        totals: Dict[Tuple, List[float]] = {}
+        for shard in self._shard_copies():
+            for labels, row in shard.items():
+                row = list(row)
+                total = totals.get(labels)
+                if total is None:
+                    totals[labels] = row
+                else:
+                    for i, value in enumerate(row):
+                        total[i] += value
+        return totals
+
+    def render(self) -> List[str]:
+        lines = []
+        for labels, row in sorted(self.values().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), row[:-1]):
+                cumulative += count
+                le = ("le", _format_value(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(row[-1])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    """Metric read from existing state at scrape time, so serving requests never touches it."""
+
+    def __init__(self, name: str, kind: str, help_text: str, fn: Callable, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+
+    def render(self) -> List[str]:
+        values = self.fn()
+        if values is None:
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+                for labels, value in sorted(values.items()) if value is not None]
+
+
+class MetricsRegistry:
+    """Named metrics rendered together; asking for an existing name returns the same metric."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, name: str, factory: Callable[[], object]):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(name, lambda: Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(name, lambda: Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._get_or_create(name, lambda: Histogram(name, help_text, labelnames, buckets))
+
+    def callback(self, name: str, kind: str, help_text: str, fn: Callable, labelnames: Sequence[str] = ()) -> CallbackMetric:
+        """Register fn, returning a number, a {label values: number} dict or None, read at scrape time."""
+        return self._get_or_create(name, lambda: CallbackMetric(name, kind, help_text, fn, labelnames))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry served on /metrics
+REGISTRY = MetricsRegistry()
+
+
+class HttpMetrics:
+    """Request count, latency and in-flight requests of an HTTP entry point, by route."""
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY, prefix: str = "model_service"):
+        self.requests = registry.counter(f"{prefix}_http_requests_total", "HTTP requests by route and status code", ("route", "status"))
+        self.latency = registry.histogram(f"{prefix}_http_request_seconds", "HTTP request latency by route", ("route",))
+        self.in_flight = registry.gauge(f"{prefix}_http_requests_in_flight", "HTTP requests being handled")
+
+    def started(self) -> float:
+        self.in_flight.inc()
+        return time.perf_counter()
+
+    def finished(self, started: float, route: str, status: int):
+        self.in_flight.dec()
+        self.latency.observe(time.perf_counter() - started, route)
+        self.requests.inc(route, str(status))
+
+
+class PipelineMetrics:
+    """
+    Hooks a model pipeline calls while serving: latency per stage (tokenize, encoder,
+    lstm, xgboost, serialize), texts per forward pass and fallbacks after failures.
+    """
+
+    def __init__(self, model: str, registry: MetricsRegistry = REGISTRY, prefix: str = "model_service"):
+        self.model = model
+        self.stages = registry.histogram(f"{prefix}_stage_seconds", "Latency of each pipeline stage", ("model", "stage"))
+        self.batch_sizes = registry.histogram(f"{prefix}_batch_size", "Texts per model forward pass", ("model",), BATCH_SIZE_BUCKETS)
+        self.fallbacks = registry.counter(f"{prefix}_fallbacks_total", "Predictions answered by a fallback after a model failed", ("model", "fallback"))
+
+    def observe_stage(self, stage: str, seconds: float):
+        self.stages.observe(seconds, self.model, stage)
+
+    def observe_batch(self, size: int):
+        self.batch_sizes.observe(size, self.model)
+
+    def count_fallback(self, fallback: str, amount: int = 1):
+        self.fallbacks.inc(self.model, fallback, amount=amount)
@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+Registry of model versions kept under a directory (model/ by default), so one
+service process can serve several of them, such as per-customer fine-tunes,
+chosen per request next to its default models.
+
+Each version is a directory holding its artifacts and a manifest.json:
+
+    model/<name>/<version>/manifest.json
+    {
+      "type": "hybrid",
+      "labels": ["Depression", "ADHD", "Bipolar", "Anxiety"],
+      "architecture": {"hidden_dim": 256, "lstm_layers": 1},
+      "artifacts": {"pytorch": "hybrid_model.safetensors", "xgb": "xgboost_classifier.json"}
+    }
+
+Artifact paths are relative to the version directory. Requests name a version
+as "<name>@<version>", or "<name>" for its latest version (versions compare
+number by number, so "10" is later than "9").
+
+Loaded versions are kept under a RAM budget, measured from their tensors and
+in-memory artifacts, and the least recently used are evicted to make room for
+another. Concurrent first requests for a version share a single load. An
+evicted model leaves the registry at once; requests still running on it keep
+it alive until they finish.
+
+Usage:
+    python model_registry.py list
+    python model_registry.py register --name acme --version 3 --type hybrid \\
+        --pytorch hybrid_model.safetensors --xgb xgboost_classifier.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model")
+DEFAULT_LABELS = ["Depression", "ADHD", "Bipolar", "Anxiety"]
+
+# Artifacts each model type requires, and the ones it may add
+MODEL_ARTIFACTS = {
+    "hybrid": {"required": ("pytorch", "xgb"), "optional": ("int8", "onnx", "tokenizer")},
+    "standard": {"required": ("pytorch",), "optional": ("tokenizer",)}
+}
+# Architecture parameters a manifest may set per model type
+MODEL_ARCHITECTURE = {
+    "hybrid": ("num_labels", "hidden_dim", "lstm_layers"),
+    "standard": ()
+}
+
+# Unknown names trigger a rescan of the directory at most this often
+RESCAN_SECONDS = 1.0
+
+
+def version_key(version: str) -> Tuple:
+    """Sort key comparing the numeric parts of a version as numbers ("v10" after "v9")."""
+    return tuple((0, int(part), "") if part.isdigit() else (1, 0, part) for part in re.findall(r"\d+|[^\d]+", version))
+
+
+def path_bytes(path: str) -> int:
+    """Size of a file, or of every file under a directory."""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for directory, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(directory, name)) for name in files)
+    return total
+
+
+def module_bytes(module) -> int:
+    """Bytes held by a torch module's parameters and buffers (quantized weights included)."""
+    total = 0
+    for entry in module.state_dict().values():
+        # Dynamically quantized Linear layers store a (weight, bias) tuple
+        for tensor in entry if isinstance(entry, tuple) else (entry,):
+            if hasattr(tensor, "element_size"):
+                total += tensor.element_size() * tensor.nelement()
+    return total
+
+
+class ModelVersion:
+    """One registered version: what it is and where its artifacts are."""
+
+    def __init__(self, name: str, version: str, directory: str, manifest: Dict[str, Any]):
+        self.name = name
+        self.version = version
+        self.directory = directory
+        self.kind = manifest.get("type")
+        if self.kind not in MODEL_ARTIFACTS:
+            raise ValueError(f"Unknown model type: {self.kind!r}")
+
+        self.labels = list(manifest.get("labels") or DEFAULT_LABELS)
+        self.architecture = dict(manifest.get("architecture") or {})
+        unknown = set(self.architecture) - set(MODEL_ARCHITECTURE[self.kind])
+        if unknown:
+            raise ValueError(f"Unknown {self.kind} architecture parameters: {', '.join(sorted(unknown))}")
+
+        artifacts = manifest.get("artifacts") or {}
+        allowed = MODEL_ARTIFACTS[self.kind]["required"] + MODEL_ARTIFACTS[self.kind]["optional"]
+        unknown = set(artifacts) - set(allowed)
+        if unknown:
+            raise ValueError(f"Unknown {self.kind} artifacts: {', '.join(sorted(unknown))}")
+        self.artifacts = {key: os.path.join(directory, path) for key, path in artifacts.items()}
+        for key in MODEL_ARTIFACTS[self.kind]["required"]:
+            if not os.path.exists(self.artifacts.get(key, "")):
+                raise ValueError(f"Missing {key} artifact")
+
+    @property
+    def id(self) -> str:
+        return f"{self.name}@{self.version}"
+
+    def artifact_bytes(self) -> int:
+        """Size of the weight artifacts on disk, the estimate used to make room before a load."""
+        return sum(path_bytes(path) for key, path in self.artifacts.items() if key != "tokenizer" and os.path.exists(path))
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "version": self.version,
+            "type": self.kind,
+            "labels": self.labels,
+            "architecture": self.architecture,
+            "artifacts": {key: os.path.relpath(path, self.directory) for key, path in self.artifacts.items()}
+        }
+
+
+class _Load:
+    """A load in progress, shared by every request that needs its result."""
+
+    def __init__(self, reserved: int):
+        self.reserved = reserved
+        self.done = threading.Event()
+        self.model = None
+        self.error: Optional[BaseException] = None
+
+
+class ModelRegistry:
+    """Thread-safe registry of model versions, loaded on demand and evicted LRU under a byte budget."""
+
+    def __init__(self, root: str, load: Callable[[ModelVersion], Any], measure: Callable[[ModelVersion, Any], int],
+                 max_bytes: int = 2 * 1024 ** 3):
+        self.root = root
+        self.load = load
+        self.measure = measure
+        self.max_bytes = max(1, int(max_bytes))
+
+        self._lock = threading.Lock()
+        self._versions: Dict[str, ModelVersion] = {}
+        self._latest: Dict[str, str] = {}
+        self._scanned_at = 0.0
+        # id -> (model, bytes, last used), least recently used first
+        self._resident: "OrderedDict[str, list]" = OrderedDict()
+        self._loading: Dict[str, _Load] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.loads = 0
+        self.load_failures = 0
+        self.evictions = 0
+
+    def scan(self) -> int:
+        """Re-read the manifests under root; returns how many versions are registered."""
+        versions = {}
+        if os.path.isdir(self.root):
+            for name in sorted(os.listdir(self.root)):
+                name_dir = os.path.join(self.root, name)
+                if not os.path.isdir(name_dir):
+                    continue
+                for version in sorted(os.listdir(name_dir)):
+                    directory = os.path.join(name_dir, version)
+                    manifest_path = os.path.join(directory, "manifest.json")
+                    # Versions still being copied in by register() are not visible yet
+                    if version.endswith(".tmp") or not os.path.isfile(manifest_path):
+                        continue
+                    try:
+                        with open(manifest_path) as f:
+                            entry = ModelVersion(name, version, directory, json.load(f))
+                    except Exception as e:
+                        print(f"[analysis_service] ⚠️ Skipping model {name}@{version}: {e}")
+                        continue
+                    versions[entry.id] = entry
+
+        latest = {}
+        for entry in sorted(versions.values(), key=lambda v: version_key(v.version)):
+            latest[entry.name] = entry.id
+        with self._lock:
+            self._versions = versions
+            self._latest = latest
+            self._scanned_at = time.monotonic()
+        return len(versions)
+
+    def versions(self) -> List[ModelVersion]:
+        with self._lock:
+            return list(self._versions.values())
+
+    def resolve(self, ref: str) -> ModelVersion:
+        """The version named by "<name>@<version>" or "<name>" (latest); raises KeyError if none."""
+        for attempt in range(2):
+            with self._lock:
+                entry = self._versions.get(ref) or self._versions.get(self._latest.get(ref, ""))
+                stale = time.monotonic() - self._scanned_at >= RESCAN_SECONDS
+            if entry is not None:
+                return entry
+            # A version copied in since the last scan is picked up without a restart
+            if attempt == 0 and stale:
+                self.scan()
+            else:
+                break
+        raise KeyError(f"Unknown model: {ref}")
+
+    def get(self, ref: str) -> Tuple[ModelVersion, Any]:
+        """(version, loaded model) for ref, loading it if needed; concurrent callers share one load."""
+        entry = self.resolve(ref)
+        with self._lock:
+            resident = self._resident.get(entry.id)
+            if resident is not None:
+                self._resident.move_to_end(entry.id)
+                resident[2] = time.monotonic()
+                self.hits += 1
+                return entry, resident[0]
+            pending = self._loading.get(entry.id)
+            if pending is None:
+                self.misses += 1
+                estimate = entry.artifact_bytes()
+                if estimate > self.max_bytes:
+                    raise MemoryError(f"{entry.id} needs about {estimate} bytes, over the {self.max_bytes} byte budget")
+                pending = self._loading[entry.id] = _Load(estimate)
+                evicted = self._evict(0)
+                leader = True
+            else:
+                self.waits += 1
+                leader = False
+
+        if not leader:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return entry, pending.model
+
+        if evicted:
+            gc.collect()
+        started = time.perf_counter()
+        try:
+            model = self.load(entry)
+            size = int(self.measure(entry, model))
+        except BaseException as e:
+            with self._lock:
+                self.load_failures += 1
+                del self._loading[entry.id]
+            pending.error = e
+            pending.done.set()
+            print(f"[analysis_service] ❌ Could not load model {entry.id}: {e}")
+            raise
+
+        with self._lock:
+            del self._loading[entry.id]
+            self._resident[entry.id] = [model, size, time.monotonic()]
+            self.loads += 1
+            # The estimate was only a guess; settle the budget against the measured size
+            evicted = self._evict(0, keep=entry.id)
+        pending.model = model
+        pending.done.set()
+        if evicted:
+            gc.collect()
+        print(f"[analysis_service] ✅ Loaded model {entry.id} ({size / 1024 ** 2:.0f} MB) in "
+              f"{time.perf_counter() - started:.1f}s; {self._resident_bytes() / 1024 ** 2:.0f} MB resident")
+        return entry, model
+
+    def _resident_bytes(self) -> int:
+        return sum(resident[1] for resident in self._resident.values())
+
+    def _evict(self, needed: int, keep: Optional[str] = None) -> int:
+        """Drop least recently used models until resident, reserved and needed bytes fit (lock held)."""
+        evicted = 0
+        reserved = sum(load.reserved for load in self._loading.values())
+        while self._resident and self._resident_bytes() + reserved + needed > self.max_bytes:
+            victim = next((model_id for model_id in self._resident if model_id != keep), None)
+            if victim is None:
+                break
+            size = self._resident.pop(victim)[1]
+            self.evictions += 1
+            evicted += 1
+            print(f"[analysis_service] Evicted model {victim} ({size / 1024 ** 2:.0f} MB) to stay within the registry budget")
+        return evicted
+
+    def unload(self, ref: str) -> bool:
+        """Evict one version now; returns False if it was not loaded."""
+        entry = self.resolve(ref)
+        with self._lock:
+            dropped = self._resident.pop(entry.id, None) is not None
+        if dropped:
+            gc.collect()
+        return dropped
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            versions = []
+            for entry in sorted(self._versions.values(), key=lambda v: (v.name, version_key(v.version))):
+                resident = self._resident.get(entry.id)
+                info = entry.describe()
+                info["latest"] = self._latest.get(entry.name) == entry.id
+                info["loaded"] = resident is not None
+                info["loading"] = entry.id in self._loading
+                info["bytes"] = resident[1] if resident else None
+                info["idle_seconds"] = now - resident[2] if resident else None
+                versions.append(info)
+            return {
+                "enabled": True,
+                "root": self.root,
+                "max_bytes": self.max_bytes,
+                "resident_bytes": self._resident_bytes(),
+                "loaded": len(self._resident),
+                "hits": self.hits,
+                "misses": self.misses,
+                "waits": self.waits,
+                "loads": self.loads,
+                "load_failures": self.load_failures,
+                "evictions": self.evictions,
+                "versions": versions
+            }
+
+
+def register(root: str, name: str, version: str, kind: str, artifacts: Dict[str, str],
+             labels: List[str], architecture: Dict[str, int]) -> str:
+    """
+    Copy artifacts into <root>/<name>/<version>/ and write its manifest. The directory
+    is filled under a temporary name and renamed last, so a running service never
+    sees a half-copied version. Versions are immutable: an existing one is refused.
+    """
+    for part in (name, version):
+        if not part or part.startswith(".") or "/" in part or "@" in part or os.sep in part:
+            raise ValueError(f"Invalid model name or version: {part!r}")
+    target = os.path.join(root, name, version)
+    if os.path.exists(target):
+        raise ValueError(f"{name}@{version} is already registered at {target}")
+
+    staging = target + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    try:
+        manifest = {"type": kind, "labels": labels, "architecture": architecture, "artifacts": {}}
+        for key, source in artifacts.items():
+            filename = os.path.basename(os.path.normpath(source))
+            if os.path.isdir(source):
+                shutil.copytree(source, os.path.join(staging, filename))
+            else:
+                shutil.copy2(source, os.path.join(staging, filename))
+            manifest["artifacts"][key] = filename
+        with open(os.path.join(staging, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        # Validate before publishing
+        ModelVersion(name, version, staging, manifest)
+        os.rename(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return target
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List or register model versions served per request")
+    parser.add_argument("--root", default=os.getenv("MODEL_REGISTRY_DIR", DEFAULT_ROOT), help="Registry directory")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("list", help="List registered versions")
+
+    register_parser = subparsers.add_parser("register", help="Copy artifacts in as a new version")
+    register_parser.add_argument("--name", required=True, help="Model name, e.g. a customer")
+    register_parser.add_argument("--version", required=True, help="Version of this model")
+    register_parser.add_argument("--type", default="hybrid", choices=list(MODEL_ARTIFACTS), help="Model type")
+    register_parser.add_argument("--pytorch", required=True, help="Weights (.pth/.safetensors) or a Hugging Face directory")
+    register_parser.add_argument("--xgb", default=None, help="XGBoost head (.json), hybrid only")
+    register_parser.add_argument("--int8", default=None, help="Pre-quantized int8 artifact, hybrid only")
+    register_parser.add_argument("--onnx", default=None, help="Exported ONNX graph, hybrid only")
+    register_parser.add_argument("--tokenizer", default=None, help="Tokenizer directory (default: distilbert-base-uncased)")
+    register_parser.add_argument("--labels", default=",".join(DEFAULT_LABELS), help="Comma-separated class labels")
+    register_parser.add_argument("--hidden-dim", type=int, default=None, help="BiLSTM hidden size, hybrid only")
+    register_parser.add_argument("--lstm-layers", type=int, default=None, help="BiLSTM layers, hybrid only")
+
+    args = parser.parse_args()
+    if args.command == "list":
+        registry = ModelRegistry(args.root, load=None, measure=None)
+        if not registry.scan():
+            print(f"No models registered under {args.root}")
+        for info in registry.stats()["versions"]:
+            latest = " (latest)" if info["latest"] else ""
+            size = registry.resolve(info["id"]).artifact_bytes()
+            print(f"{info['id']}{latest}  type={info['type']}  labels={','.join(info['labels'])}  {size / 1e6:.1f} MB")
+        return
+
+    artifacts = {key: getattr(args, key) for key in ("pytorch", "xgb", "int8", "onnx", "tokenizer") if getattr(args, key)}
+    architecture = {}
+    if args.hidden_dim is not None:
+        architecture["hidden_dim"] = args.hidden_dim
+    if args.lstm_layers is not None:
+        architecture["lstm_layers"] = args.lstm_layers
+    labels = [label.strip() for label in args.labels.split(",") if label.strip()]
+    try:
+        target = register(args.root, args.name, args.version, args.type, artifacts, labels, architecture)
+    except ValueError as e:
+        raise SystemExit(f"❌ {e}")
+    print(f"✅ Registered {args.name}@{args.version} at {target}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+ONNX export and onnxruntime execution backend for DistilBERT_BiLSTM_Hybrid.
+The exported graph has dynamic batch and sequence axes and returns the same
+(features, logits) pair as the PyTorch forward pass.
+"""
+
+from typing import Dict, Optional, Tuple
+
+import torch
+
+try:
+    import onnxruntime as ort
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ONNXRUNTIME_AVAILABLE = False
+
+ONNX_OPSET = 17
+ONNX_INPUT_NAMES = ["input_ids", "attention_mask"]
+ONNX_OUTPUT_NAMES = ["features", "logits"]
+ONNX_DYNAMIC_AXES = {
+    "input_ids": {0: "batch", 1: "sequence"},
+    "attention_mask": {0: "batch", 1: "sequence"},
+    "features": {0: "batch"},
+    "logits": {0: "batch"}
+}
+
+
+def export_onnx(model: torch.nn.Module, path: str, opset: int = ONNX_OPSET, sample_length: int = 32,
+                metadata: Optional[Dict[str, str]] = None):
+    """
+    Export DistilBERT_BiLSTM_Hybrid to ONNX with dynamic batch and sequence axes.
+    The packed BiLSTM mode cannot be exported, so the graph always runs the padded LSTM.
+    metadata is stored in the graph's metadata_props (see OnnxHybridSession.metadata).
+    """
+    if getattr(model, "pack_sequences", False):
+        raise ValueError("The packed BiLSTM mode cannot be exported to ONNX")
+    model.eval()
+
+    device = next(model.parameters()).device
+    input_ids = torch.ones((2, sample_length), dtype=torch.long, device=device)
+    attention_mask = torch.ones_like(input_ids)
+    attention_mask[1, sample_length // 2:] = 0
+
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (input_ids, attention_mask),
+            path,
+            input_names=ONNX_INPUT_NAMES,
+            output_names=ONNX_OUTPUT_NAMES,
+            dynamic_axes=ONNX_DYNAMIC_AXES,
+            opset_version=opset,
+            dynamo=False
+        )
+    if metadata:
+        import onnx
+        graph = onnx.load(path)
+        for key, value in metadata.items():
+            entry = graph.metadata_props.add()
+            entry.key, entry.value = key, value
+        onnx.save(graph, path)
+    print(f"✅ Exported ONNX model to {path}")
+
+
+class OnnxHybridSession:
+    """
+    Runs an exported DistilBERT_BiLSTM_Hybrid graph with onnxruntime's CPU
+    graph optimizations; called like the torch module.
+    """
+
+    def __init__(self, path: str, num_threads: Optional[int] = None):
+        if not ONNXRUNTIME_AVAILABLE:
+            raise RuntimeError("onnxruntime is not installed")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.path = path
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.metadata = dict(self.session.get_modelmeta().custom_metadata_map)
+
+    def __call__(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        features, logits = self.session.run(ONNX_OUTPUT_NAMES, {
+            "input_ids": input_ids.cpu().numpy(),
+            "attention_mask": attention_mask.cpu().numpy()
+        })
+        return torch.from_numpy(features), torch.from_numpy(logits)
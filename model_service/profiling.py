@@ -0,0 +1,142 @@
+"""
+On-demand torch profiler capture for the hybrid model.
+
+An admin request arms a capture for the next N predictions that reach the model.
+Each captured batch runs under torch.profiler and is written as a Chrome trace
+(open in chrome://tracing or https://ui.perfetto.dev); when the capture completes,
+the operator statistics of all captured batches are summed into one table.
+
+While no capture is armed the serving path only reads `ProfileCapture.active`.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import torch
+from torch.autograd.profiler_util import EventList
+
+# Upper bound on predictions a single capture may record
+MAX_CAPTURE_PREDICTIONS = 1000
+
+# Operators listed in the aggregated table
+TABLE_ROW_LIMIT = 60
+
+
+class ProfileCapture:
+    """Profiles the next `predictions` calls routed through capture(), one at a time."""
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        # Read without the lock on every prediction; only written under it
+        self.active = False
+        self._lock = threading.Lock()
+        # Held while a batch runs under the profiler: torch allows one profiler at a time
+        self._profiling = threading.Lock()
+        self._remaining = 0
+        self._record_shapes = False
+        self._capture_id = None
+        self._traces: List[str] = []
+        self._operators: Dict[Any, Any] = {}
+        self._captured_texts = 0
+        self.last_capture: Optional[Dict[str, Any]] = None
+
+    def arm(self, predictions: int, record_shapes: bool = False) -> Dict[str, Any]:
+        """Start capturing the next `predictions` predictions; raises if a capture is running."""
+        if predictions < 1 or predictions > MAX_CAPTURE_PREDICTIONS:
+            raise ValueError(f"predictions must be between 1 and {MAX_CAPTURE_PREDICTIONS}")
+        with self._lock:
+            if self.active:
+                raise RuntimeError("A profile capture is already running")
+            os.makedirs(self.output_dir, exist_ok=True)
+            self._remaining = predictions
+            self._record_shapes = record_shapes
+            self._capture_id = time.strftime("%Y%m%d-%H%M%S") + f"-{os.getpid()}"
+            self._traces = []
+            self._operators = {}
+            self._captured_texts = 0
+            self.active = True
+        print(f"[analysis_service] Profiling the next {predictions} predictions (capture {self._capture_id})")
+        return self.status()
+
+    def cancel(self) -> Dict[str, Any]:
+        """Stop an armed capture, writing out whatever was recorded so far."""
+        with self._lock:
+            if not self.active:
+                return self.status()
+            self._remaining = 0
+        self._finish()
+        return self.status()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "capture_id": self._capture_id if self.active else None,
+            "remaining_predictions": self._remaining if self.active else 0,
+            "output_dir": self.output_dir,
+            "last_capture": self.last_capture
+        }
+
+    def capture(self, fn: Callable[[List[str]], Any], texts: List[str]) -> Any:
+        """Run fn(texts), under the profiler if the armed capture still needs predictions."""
+        # Batches arriving while another one is being profiled run unprofiled
+        if not self._profiling.acquire(blocking=False):
+            return fn(texts)
+        try:
+            with self._lock:
+                armed = self.active and self._remaining > 0
+                record_shapes = self._record_shapes
+                trace_path = os.path.join(self.output_dir, f"{self._capture_id}_trace_{len(self._traces)}.json")
+            if not armed:
+                return fn(texts)
+
+            activities = [torch.profiler.ProfilerActivity.CPU]
+            if torch.cuda.is_available():
+                activities.append(torch.profiler.ProfilerActivity.CUDA)
+            with torch.profiler.profile(activities=activities, record_shapes=record_shapes) as profiler:
+                with torch.profiler.record_function(f"hybrid_predict[batch={len(texts)}]"):
+                    result = fn(texts)
+
+            profiler.export_chrome_trace(trace_path)
+            with self._lock:
+                self._traces.append(trace_path)
+                self._captured_texts += len(texts)
+                self._remaining -= len(texts)
+                for operator in profiler.key_averages(group_by_input_shape=record_shapes):
+                    key = (operator.key, str(operator.input_shapes) if record_shapes else None)
+                    if key in self._operators:
+                        self._operators[key].add(operator)
+                    else:
+                        self._operators[key] = operator
+                done = self._remaining <= 0
+        finally:
+            self._profiling.release()
+
+        if done:
+            self._finish()
+        return result
+
+    def _finish(self):
+        """Write the aggregated operator table and disarm."""
+        with self._lock:
+            if not self.active:
+                return
+            operators = list(self._operators.values())
+            table_path = os.path.join(self.output_dir, f"{self._capture_id}_operators.txt")
+            sort_by = "self_cuda_time_total" if torch.cuda.is_available() else "self_cpu_time_total"
+            with open(table_path, "w") as f:
+                f.write(f"Capture {self._capture_id}: {self._captured_texts} predictions in {len(self._traces)} batches\n\n")
+                if operators:
+                    f.write(EventList(operators).table(sort_by=sort_by, row_limit=TABLE_ROW_LIMIT))
+            self.last_capture = {
+                "capture_id": self._capture_id,
+                "predictions": self._captured_texts,
+                "batches": len(self._traces),
+                "traces": list(self._traces),
+                "table": table_path,
+                "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+            }
+            self._operators = {}
+            self.active = False
+        print(f"[analysis_service] Profile capture written to {table_path}")
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Offline tools for the hybrid model's feature store (see feature_store.py).
+
+    info     list the stored encoder versions with their row counts and sizes
+    ingest   run the encoder once over a corpus and store its feature vectors
+    rescore  score every stored vector with an XGBoost head, in vectorized chunks,
+             without loading DistilBERT
+
+rescore writes probabilities.npy (float32 [rows, classes], row i belongs to row i
+of the store's keys.bin) and summary.json (label counts, and how many top labels
+changed when a baseline head is given) to the output directory.
+
+Usage:
+    python rescore_features.py info --store ./features
+    python rescore_features.py ingest --store ./features --texts corpus.txt
+    python rescore_features.py rescore --store ./features --xgb-path new_head.json \\
+        --baseline-xgb-path model/xgboost_classifier.json --output ./rescored
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from feature_store import STORE_DTYPES, FeatureStore
+from xgb_compiled import CompiledXGBoostClassifier
+
+DEFAULT_LABELS = "Depression,ADHD,Bipolar,Anxiety"
+
+
+def read_texts(path: str):
+    """Texts from a .jsonl file (a "text" field per line) or a plain file (one text per line)."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            yield json.loads(line)["text"] if path.endswith(".jsonl") else line
+
+
+def load_head(path: str, engine: str):
+    """An XGBoost head exposing predict_proba: compiled when possible, else the xgboost library."""
+    if engine == "compiled":
+        try:
+            return CompiledXGBoostClassifier.load(path)
+        except Exception as e:
+            print(f"⚠️ Could not compile {path}, using xgboost predict_proba: {e}")
+    import xgboost as xgb
+    head = xgb.XGBClassifier()
+    head.load_model(path)
+    return head
+
+
+def open_store(root: str, encoder_version: str = None) -> FeatureStore:
+    versions = FeatureStore.versions(root)
+    if encoder_version is None:
+        if len(versions) != 1:
+            raise SystemExit(f"Pass --encoder-version, the store holds: {', '.join(versions) or 'nothing'}")
+        encoder_version = versions[0]
+    elif encoder_version not in versions:
+        raise SystemExit(f"No feature store for encoder version {encoder_version} under {root}")
+    return FeatureStore(root, encoder_version)
+
+
+def info(args):
+    versions = FeatureStore.versions(args.store)
+    if not versions:
+        print(f"No feature stores under {args.store}")
+    for version in versions:
+        stats = FeatureStore(args.store, version).stats()
+        print(f"{version}  rows={stats['rows']}  dim={stats['dim']}  dtype={stats['dtype']}  {stats['bytes'] / 1e6:.1f} MB")
+
+
+def ingest(args):
+    # Encode exactly as the service would
+    import inference
+    from hybrid_model import HybridModelInference
+
+    model = HybridModelInference(**inference.hybrid_model_kwargs())
+    store = FeatureStore(args.store, model.encoder_fingerprint, dtype=args.dtype,
+                         lowercase=getattr(model.tokenizer, "do_lower_case", False))
+    model.feature_store = store
+
+    started = time.perf_counter()
+    seen = added = 0
+    batch = []
+    texts = read_texts(args.texts)
+    while True:
+        text = next(texts, None)
+        if text is not None:
+            batch.append(text)
+        if len(batch) == args.batch_size or (text is None and batch):
+            # Texts already in the store are skipped, so an interrupted ingest can be rerun
+            pending = [t for t, stored in zip(batch, store.contains(batch)) if not stored]
+            before = len(store)
+            if pending:
+                model.predict_batch(pending)
+            seen += len(batch)
+            added += len(store) - before
+            batch = []
+            print(f"\r{seen} texts, {added} stored", end="", flush=True)
+        if text is None:
+            break
+    print()
+    print(f"✅ Stored {added} new vectors in {store.directory} ({time.perf_counter() - started:.1f}s)")
+
+
+def rescore(args):
+    store = open_store(args.store, args.encoder_version)
+    if len(store) == 0:
+        raise SystemExit("The feature store is empty")
+    labels = [label.strip() for label in args.labels.split(",") if label.strip()]
+    head = load_head(args.xgb_path, args.engine)
+    baseline = load_head(args.baseline_xgb_path, args.engine) if args.baseline_xgb_path else None
+
+    os.makedirs(args.output, exist_ok=True)
+    probabilities = None
+    label_counts = np.zeros(len(labels), dtype=np.int64)
+    changed = 0
+    started = time.perf_counter()
+    for keys, vectors in store.iter_chunks(args.chunk_rows):
+        probs = np.asarray(head.predict_proba(vectors), dtype=np.float32)
+        if probabilities is None:
+            if probs.shape[1] != len(labels):
+                raise SystemExit(f"The head predicts {probs.shape[1]} classes but {len(labels)} labels were given")
+            probabilities = np.lib.format.open_memmap(
+                os.path.join(args.output, "probabilities.npy"), mode="w+", dtype=np.float32, shape=(len(store), probs.shape[1])
+            )
+            row = 0
+        probabilities[row:row + len(probs)] = probs
+        row += len(probs)
+
+        top = probs.argmax(axis=1)
+        label_counts += np.bincount(top, minlength=len(labels))
+        if baseline is not None:
+            changed += int((np.asarray(baseline.predict_proba(vectors)).argmax(axis=1) != top).sum())
+        print(f"\r{row}/{len(store)} rows", end="", flush=True)
+    probabilities.flush()
+    elapsed = time.perf_counter() - started
+    print()
+
+    summary = {
+        "encoder_version": store.encoder_version,
+        "store_dtype": store.dtype,
+        "rows": len(store),
+        "xgb_path": os.path.abspath(args.xgb_path),
+        "labels": labels,
+        "label_counts": dict(zip(labels, label_counts.tolist())),
+        "baseline_xgb_path": os.path.abspath(args.baseline_xgb_path) if args.baseline_xgb_path else None,
+        "changed_top_labels": changed if baseline is not None else None,
+        "seconds": elapsed
+    }
+    with open(os.path.join(args.output, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"Scored {len(store)} vectors in {elapsed:.2f}s ({len(store) / elapsed:.0f} rows/s)")
+    print("Top labels: " + ", ".join(f"{label}={count}" for label, count in summary["label_counts"].items()))
+    if baseline is not None:
+        print(f"Top label changed for {changed} rows ({changed / len(store):.1%}) against the baseline head")
+    print(f"✅ Results written to {args.output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Feature store tools: ingest a corpus, re-score it with a new XGBoost head")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    info_parser = subparsers.add_parser("info", help="List stored encoder versions")
+    info_parser.add_argument("--store", required=True, help="Feature store root (FEATURE_STORE_DIR)")
+
+    ingest_parser = subparsers.add_parser("ingest", help="Encode a corpus into the store with the service's model settings")
+    ingest_parser.add_argument("--store", required=True, help="Feature store root (FEATURE_STORE_DIR)")
+    ingest_parser.add_argument("--texts", required=True, help="Corpus: one text per line, or .jsonl with a \"text\" field")
+    ingest_parser.add_argument("--dtype", default="float32", choices=list(STORE_DTYPES), help="Storage dtype of a new store")
+    ingest_parser.add_argument("--batch-size", type=int, default=32, help="Texts per forward pass")
+
+    rescore_parser = subparsers.add_parser("rescore", help="Score every stored vector with an XGBoost head")
+    rescore_parser.add_argument("--store", required=True, help="Feature store root (FEATURE_STORE_DIR)")
+    rescore_parser.add_argument("--encoder-version", default=None, help="Encoder version to score (default: the only one)")
+    rescore_parser.add_argument("--xgb-path", required=True, help="XGBoost head to score with (.json)")
+    rescore_parser.add_argument("--baseline-xgb-path", default=None, help="Optional current head to count changed labels against")
+    rescore_parser.add_argument("--engine", default="compiled", choices=("compiled", "xgboost"), help="XGBoost evaluation engine")
+    rescore_parser.add_argument("--labels", default=os.getenv("MODEL_LABELS", DEFAULT_LABELS), help="Comma-separated class labels")
+    rescore_parser.add_argument("--chunk-rows", type=int, default=65536, help="Rows scored per vectorized call")
+    rescore_parser.add_argument("--output", required=True, help="Output directory")
+
+    args = parser.parse_args()
+    {"info": info, "ingest": ingest, "rescore": rescore}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
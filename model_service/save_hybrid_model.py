@@ -9,7 +9,7 @@ import xgboost as xgb
 import os
 import json
 
-def save_hybrid_model(model, xgb_model, save_path="/content/drive/MyDrive/models/"):
+def save_hybrid_model(model, xgb_model, save_path="/content/drive/MyDrive/models/", export_onnx=False):
     """
     Save your trained hybrid model in the format required by Virtual Therapist.
     
@@ -17,6 +17,7 @@ def save_hybrid_model(model, xgb_model, save_path="/content/drive/MyDrive/models
         model: Your trained DistilBERT_BiLSTM_Hybrid model
         xgb_model: Your trained XGBoost model
         save_path: Path to save the models
+        export_onnx: Also export the PyTorch model to ONNX for the onnxruntime backend
     """
     
     # Create save directory if it doesn't exist
@@ -32,10 +33,18 @@ def save_hybrid_model(model, xgb_model, save_path="/content/drive/MyDrive/models
     xgb_model.save_model(xgb_path)
     print(f"✅ XGBoost model saved to: {xgb_path}")
     
+    # Optionally export to ONNX with the graph layout the onnx backend serves (needs onnx_backend.py)
+    onnx_path = None
+    if export_onnx:
+        import onnx_backend
+        onnx_path = os.path.join(save_path, "distilbert_bilstm_hybrid.onnx")
+        onnx_backend.export_onnx(model, onnx_path)
+    
     # Create model info file
     model_info = {
         "pytorch_path": pytorch_path,
         "xgb_path": xgb_path,
+        "onnx_path": onnx_path,
         "labels": ["Anxiety", "Bipolar", "Depression"],
         "model_type": "DistilBERT-BiLSTM-XGBoost Hybrid",
         "num_labels": 3,
@@ -70,6 +79,9 @@ files.download(xgb_path)
 # Download model info
 files.download(info_path)
 
+# Optional: save_hybrid_model(model, xgb_model, export_onnx=True) also writes
+# distilbert_bilstm_hybrid.onnx for HYBRID_BACKEND=onnx (copy onnx_backend.py next to this script first)
+
 print("🎉 All model files have been saved and are ready for download!")
 """
 
@@ -1,9 +1,15 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 from pydantic import BaseModel
+import functools
 import os
+import time
 from dotenv import load_dotenv
 
+import metrics
+from keyword_scorer import KeywordScorer
+
 load_dotenv()
 
 app = FastAPI(title="Virtual Therapist Model Service", version="1.0.0")
@@ -17,6 +23,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+http_metrics = metrics.HttpMetrics()
+keyword_metrics = metrics.PipelineMetrics("fallback_predict")
+prediction_requests = metrics.REGISTRY.counter(
+    "model_service_predictions_total",
+    "Prediction requests by route and the model path that answered them",
+    ("route", "model")
+)
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = http_metrics.started()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        http_metrics.finished(started, route.path if route is not None else "unmatched", status)
+
 class PredictionRequest(BaseModel):
     text: str
 
@@ -26,43 +52,46 @@ class PredictionResponse(BaseModel):
 
 LABELS = ["Anxiety", "Depression", "Stress", "Neutral"]
 
-def fallback_predict(text: str):
-    """Enhanced fallback prediction with better keyword matching."""
-    text_l = text.lower()
-    
+# Keywords per label; matched as whole words, each counted once per text
+KEYWORDS = KeywordScorer({
+    "Anxiety": ["worry", "worries", "worried", "worrying", "anxious", "anxiousness", "anxiety",
+                "panic", "panics", "panicked", "panicking", "nervous", "nervousness",
+                "fear", "fears", "feared", "fearful", "scared", "restless", "restlessness", "uneasy"],
+    "Depression": ["sad", "sadness", "hopeless", "hopelessness", "down", "tired", "tiredness",
+                   "depressed", "depressing", "depression", "empty", "emptiness",
+                   "worthless", "worthlessness", "guilty", "suicidal"],
+    "Stress": ["overwhelmed", "overwhelming", "pressure", "pressures", "pressured", "deadline", "deadlines",
+               "stressed", "stress", "stressing", "stressful", "burnout", "exhausted", "exhausting",
+               "frustrated", "frustrating", "irritated", "tense", "tensed"]
+})
+
+@functools.lru_cache(maxsize=4096)
+def _keyword_scores(counts):
+    """Top label and sorted (label, score) pairs for a tuple of per-label keyword counts."""
     # Initialize scores
     scores = {label: 0.1 for label in LABELS}
-    
-    # Anxiety keywords
-    anxiety_keywords = ["worry", "anxious", "panic", "nervous", "fear", "scared", "worried", "anxiety", "panic", "restless", "uneasy"]
-    anxiety_count = sum(1 for word in anxiety_keywords if word in text_l)
-    if anxiety_count > 0:
-        scores["Anxiety"] += 0.3 + (anxiety_count * 0.1)
-    
-    # Depression keywords
-    depression_keywords = ["sad", "hopeless", "down", "tired", "depressed", "depression", "empty", "worthless", "guilty", "suicidal", "hopeless"]
-    depression_count = sum(1 for word in depression_keywords if word in text_l)
-    if depression_count > 0:
-        scores["Depression"] += 0.3 + (depression_count * 0.1)
-    
-    # Stress keywords
-    stress_keywords = ["overwhelmed", "pressure", "deadline", "stressed", "stress", "burnout", "exhausted", "frustrated", "irritated", "tense"]
-    stress_count = sum(1 for word in stress_keywords if word in text_l)
-    if stress_count > 0:
-        scores["Stress"] += 0.3 + (stress_count * 0.1)
+    for label, count in zip(KEYWORDS.labels, counts):
+        if count > 0:
+            scores[label] += 0.3 + (count * 0.1)
     
     # Neutral if no strong indicators
-    if anxiety_count == 0 and depression_count == 0 and stress_count == 0:
-        scores["Neutral"] = 0.7
-    else:
-        scores["Neutral"] = 0.1
+    scores["Neutral"] = 0.1 if any(counts) else 0.7
     
     # Normalize scores
     total = sum(max(v, 0.001) for v in scores.values())
     norm = {k: max(v, 0.001) / total for k, v in scores.items()}
     top = max(norm.items(), key=lambda kv: kv[1])[0]
     
-    return top, [{"label": k, "score": float(v)} for k, v in sorted(norm.items(), key=lambda kv: -kv[1])]
+    return top, tuple((k, float(v)) for k, v in sorted(norm.items(), key=lambda kv: -kv[1]))
+
+def keyword_result(counts):
+    """Prediction from the number of distinct keywords matched per label (KEYWORDS order)."""
+    top, scores = _keyword_scores(tuple(counts))
+    return top, [{"label": label, "score": score} for label, score in scores]
+
+def fallback_predict(text: str):
+    """Enhanced fallback prediction with better keyword matching."""
+    return keyword_result(KEYWORDS.count(text))
 
 @app.get("/health")
 async def health():
@@ -76,7 +105,10 @@ async def predict(request: PredictionRequest):
             raise HTTPException(status_code=400, detail="Text is too short")
 
         # Use enhanced fallback prediction
+        started = time.perf_counter()
         top, scores = fallback_predict(text)
+        keyword_metrics.observe_stage("keywords", time.perf_counter() - started)
+        prediction_requests.inc("/predict", "fallback_predict")
         return {"topPattern": top, "confidenceScores": scores}
     except HTTPException:
         raise
@@ -94,6 +126,11 @@ async def model_info():
         "model_type": "Enhanced Fallback Prediction"
     }
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus text-format metrics."""
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", "5001"))
@@ -10,6 +10,16 @@ import shutil
 import argparse
 from pathlib import Path
 
+def copy_atomic(source, target):
+    """
+    Copy source over target via a temporary file and a rename, so a running service
+    watching target (HOT_RELOAD_WATCH_SECONDS) never reads a half-written file and
+    memory-mapped weights of the model it is serving stay intact.
+    """
+    tmp_target = Path(str(target) + ".tmp")
+    shutil.copy2(source, tmp_target)
+    os.replace(tmp_target, target)
+
 def upload_hybrid_model(pytorch_path, xgb_path, model_name="hybrid_model"):
     """Upload hybrid model files to the model directory."""
     model_dir = Path(__file__).parent / "model"
@@ -26,7 +36,7 @@ def upload_hybrid_model(pytorch_path, xgb_path, model_name="hybrid_model"):
         success = False
     else:
         try:
-            shutil.copy2(pytorch_path, pytorch_target)
+            copy_atomic(pytorch_path, pytorch_target)
             print(f"✅ Successfully uploaded PyTorch model to {pytorch_target}")
         except Exception as e:
             print(f"❌ Error uploading PyTorch model: {e}")
@@ -38,7 +48,7 @@ def upload_hybrid_model(pytorch_path, xgb_path, model_name="hybrid_model"):
         success = False
     else:
         try:
-            shutil.copy2(xgb_path, xgb_target)
+            copy_atomic(xgb_path, xgb_target)
             print(f"✅ Successfully uploaded XGBoost model to {xgb_target}")
         except Exception as e:
             print(f"❌ Error uploading XGBoost model: {e}")
@@ -46,7 +56,35 @@ def upload_hybrid_model(pytorch_path, xgb_path, model_name="hybrid_model"):
     
     return success
 
-def update_env_file():
+def convert_to_safetensors_model(pth_name="distilbert_bilstm_hybrid.pth"):
+    """Convert the uploaded PyTorch model to memory-mapped .safetensors; the .pth copy is kept."""
+    try:
+        from checkpoints import convert_to_safetensors
+        target = convert_to_safetensors(str(Path(__file__).parent / "model" / pth_name))
+        print(f"✅ Converted PyTorch model to {target}")
+        return True
+    except Exception as e:
+        print(f"⚠️ Could not convert PyTorch model to safetensors, the service will load the .pth: {e}")
+        return False
+
+def export_onnx_model(pytorch_path, onnx_name="distilbert_bilstm_hybrid.onnx"):
+    """Export the uploaded PyTorch weights to ONNX for the onnxruntime backend."""
+    onnx_target = Path(__file__).parent / "model" / onnx_name
+    try:
+        from checkpoints import load_checkpoint, unwrap_state_dict
+        from hybrid_model import DEFAULT_BASE_CONFIG, DistilBERT_BiLSTM_Hybrid, load_base_config
+        from onnx_backend import export_onnx
+        
+        model = DistilBERT_BiLSTM_Hybrid(num_labels=4, hidden_dim=256, lstm_layers=1, dropout_prob=0.3,
+                                         base_config=load_base_config(DEFAULT_BASE_CONFIG))
+        model.load_state_dict(unwrap_state_dict(load_checkpoint(pytorch_path)))
+        export_onnx(model, str(onnx_target))
+        return True
+    except Exception as e:
+        print(f"❌ Error exporting ONNX model: {e}")
+        return False
+
+def update_env_file(onnx_exported=False, safetensors_converted=False):
     """Update the .env file with hybrid model paths."""
     env_file = Path(__file__).parent / ".env"
     
@@ -61,6 +99,10 @@ def update_env_file():
         "HYBRID_PYTORCH_PATH": "./model/distilbert_bilstm_hybrid.pth",
         "HYBRID_XGB_PATH": "./model/xgboost_classifier.json"
     }
+    if safetensors_converted:
+        updates["HYBRID_PYTORCH_PATH"] = "./model/distilbert_bilstm_hybrid.safetensors"
+    if onnx_exported:
+        updates["HYBRID_ONNX_PATH"] = "./model/distilbert_bilstm_hybrid.onnx"
     
     for key, value in updates.items():
         updated = False
@@ -83,6 +125,8 @@ def main():
     parser = argparse.ArgumentParser(description="Upload hybrid model to Virtual Therapist Analysis Service")
     parser.add_argument("--pytorch-path", required=True, help="Path to your PyTorch model file (.pth)")
     parser.add_argument("--xgb-path", required=True, help="Path to your XGBoost model file (.json)")
+    parser.add_argument("--no-safetensors", action="store_true", help="Keep serving the pickled .pth instead of converting it")
+    parser.add_argument("--export-onnx", action="store_true", help="Also export the model to ONNX for HYBRID_BACKEND=onnx")
     
     args = parser.parse_args()
     
@@ -91,8 +135,16 @@ def main():
     
     success = upload_hybrid_model(args.pytorch_path, args.xgb_path)
     
+    safetensors_converted = False
+    if success and not args.no_safetensors:
+        safetensors_converted = convert_to_safetensors_model()
+    
+    onnx_exported = False
+    if success and args.export_onnx:
+        onnx_exported = export_onnx_model(args.pytorch_path)
+    
     if success:
-        update_env_file()
+        update_env_file(onnx_exported, safetensors_converted)
         print("\n🎉 Hybrid model upload completed successfully!")
         print("\nNext steps:")
         print("1. Restart the analysis service: python app.py")
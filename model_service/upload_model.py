@@ -29,6 +29,17 @@ def upload_pytorch_model(model_file_path, model_name="mental_health_model_final.
         print(f"❌ Error uploading model: {e}")
         return False
 
+def convert_to_safetensors_model(model_name):
+    """Convert an uploaded .pth model to memory-mapped .safetensors; returns the new name or None."""
+    try:
+        from checkpoints import convert_to_safetensors
+        target = convert_to_safetensors(str(Path(__file__).parent / "model" / model_name))
+        print(f"✅ Converted model to {target}")
+        return os.path.basename(target)
+    except Exception as e:
+        print(f"⚠️ Could not convert model to safetensors, the service will load the .pth: {e}")
+        return None
+
 def upload_huggingface_model(model_dir_path, model_name="custom_model"):
     """Upload a Hugging Face model directory to the model directory."""
     model_dir = Path(__file__).parent / "model"
@@ -82,6 +93,7 @@ def main():
     parser.add_argument("--model-path", required=True, help="Path to your trained model file or directory")
     parser.add_argument("--model-name", default="mental_health_model_final.pth", help="Name for the model file (default: mental_health_model_final.pth)")
     parser.add_argument("--type", choices=["pytorch", "huggingface"], default="pytorch", help="Type of model (default: pytorch)")
+    parser.add_argument("--no-safetensors", action="store_true", help="Keep serving the pickled .pth instead of converting it")
     
     args = parser.parse_args()
     
@@ -91,7 +103,10 @@ def main():
     if args.type == "pytorch":
         success = upload_pytorch_model(args.model_path, args.model_name)
         if success:
-            model_path = os.path.join("model", args.model_name)
+            model_name = args.model_name
+            if not args.no_safetensors:
+                model_name = convert_to_safetensors_model(args.model_name) or args.model_name
+            model_path = os.path.join("model", model_name)
             update_env_file(model_path)
     else:  # huggingface
         success = upload_huggingface_model(args.model_path, args.model_name)
@@ -0,0 +1,171 @@
+"""
+Compiled XGBoost head for the hybrid model.
+Loads `xgboost_classifier.json` once and evaluates every tree at the same time
+with array-backed NumPy gathers, so class probabilities for a whole batch come
+out of one vectorized pass without building a DMatrix.
+"""
+
+import json
+import math
+from typing import Dict, List
+
+import numpy as np
+
+SUPPORTED_OBJECTIVES = ("multi:softprob", "multi:softmax", "binary:logistic")
+
+# Trees are stored as complete binary trees, so memory grows as 2 ** depth;
+# deeper (e.g. lossguide) ensembles are left to the xgboost library.
+MAX_COMPILED_DEPTH = 12
+
+
+def _parse_base_score(value) -> List[float]:
+    """base_score is a scalar ("5E-1") in XGBoost < 3 and a per-class vector ("[...]") from 3.0 on."""
+    value = str(value).strip()
+    if value.startswith("["):
+        return [float(v) for v in value.strip("[]").split(",") if v.strip()]
+    return [float(value)]
+
+
+class CompiledXGBoostClassifier:
+    """
+    Array-backed evaluation of an XGBoost gbtree classifier.
+    Every row walks every tree in lockstep for max_depth steps over complete-tree
+    arrays, then leaf values are summed per class with one matrix product.
+    """
+
+    def __init__(self, model: Dict):
+        learner = model["learner"]
+        objective = learner["objective"]["name"]
+        if objective not in SUPPORTED_OBJECTIVES:
+            raise ValueError(f"Unsupported XGBoost objective: {objective}")
+        booster = learner["gradient_booster"]
+        if booster.get("name") != "gbtree":
+            raise ValueError(f"Unsupported XGBoost booster: {booster.get('name')}")
+
+        params = learner["learner_model_param"]
+        self.objective = objective
+        self.num_features = int(params["num_feature"])
+        self.num_classes = max(int(params.get("num_class", "0")), 1)
+        self.n_classes_ = self.num_classes if self.num_classes > 1 else 2
+
+        trees = booster["model"]["trees"]
+        tree_info = booster["model"]["tree_info"]
+
+        # Respect early stopping the same way XGBClassifier.predict_proba does
+        best_iteration = learner.get("attributes", {}).get("best_iteration")
+        indptr = booster["model"].get("iteration_indptr")
+        if best_iteration is not None and indptr:
+            limit = int(indptr[int(best_iteration) + 1])
+            trees, tree_info = trees[:limit], tree_info[:limit]
+
+        for tree in trees:
+            if any(int(t) != 0 for t in tree.get("split_type", [])):
+                raise ValueError("Categorical splits are not supported by the compiled XGBoost head")
+
+        # Every tree is laid out as a complete binary tree of depth max_depth, so a
+        # row's position after each step is 2 * pos + 1 + go_right and only the
+        # split feature and threshold need to be gathered.
+        self.num_trees = len(trees)
+        depth = max((self._tree_depth(tree["left_children"], tree["right_children"]) for tree in trees), default=0)
+        if depth > MAX_COMPILED_DEPTH:
+            raise ValueError(f"Trees of depth {depth} exceed the compiled head limit of {MAX_COMPILED_DEPTH}")
+        self.max_depth = depth
+        self.num_internal = (1 << depth) - 1
+        num_leaves = 1 << depth
+
+        self.feature = np.zeros((self.num_trees, max(self.num_internal, 1)), dtype=np.int64)
+        # Padding nodes below an early leaf always go left: +inf threshold, missing goes left
+        self.threshold = np.full((self.num_trees, max(self.num_internal, 1)), np.inf, dtype=np.float32)
+        self.default_left = np.ones((self.num_trees, max(self.num_internal, 1)), dtype=bool)
+        self.leaf_value = np.zeros((self.num_trees, num_leaves), dtype=np.float32)
+
+        for t, tree in enumerate(trees):
+            left, right = tree["left_children"], tree["right_children"]
+            stack = [(0, 0, 0)]
+            while stack:
+                node, pos, level = stack.pop()
+                if left[node] == -1:
+                    # Leaf: its value sits on the leftmost complete-tree leaf below pos.
+                    # For leaf nodes XGBoost stores the (learning-rate scaled) value in split_conditions.
+                    for _ in range(depth - level):
+                        pos = 2 * pos + 1
+                    self.leaf_value[t, pos - self.num_internal] = tree["split_conditions"][node]
+                    continue
+                self.feature[t, pos] = tree["split_indices"][node]
+                self.threshold[t, pos] = tree["split_conditions"][node]
+                self.default_left[t, pos] = bool(tree["default_left"][node])
+                stack.append((left[node], 2 * pos + 1, level + 1))
+                stack.append((right[node], 2 * pos + 2, level + 1))
+
+        self.feature = self.feature.ravel()
+        self.threshold = self.threshold.ravel()
+        self.default_left = self.default_left.ravel()
+        self.leaf_value = self.leaf_value.ravel()
+        self._internal_offset = (np.arange(self.num_trees, dtype=np.int64) * max(self.num_internal, 1))[None, :]
+        self._leaf_offset = (np.arange(self.num_trees, dtype=np.int64) * num_leaves - self.num_internal)[None, :]
+
+        # One-hot map from tree to the class (output group) it contributes to
+        self.num_groups = self.num_classes if self.num_classes > 1 else 1
+        self.tree_group = np.zeros((self.num_trees, self.num_groups), dtype=np.float32)
+        self.tree_group[np.arange(self.num_trees), np.asarray(tree_info, dtype=np.int64)] = 1.0
+
+        base_score = _parse_base_score(params.get("base_score", "0.5"))
+        if objective == "binary:logistic":
+            # Binary base_score is a probability; trees add to its logit
+            base_score = [math.log(p / (1.0 - p)) for p in base_score]
+        if len(base_score) == 1:
+            base_score = base_score * self.num_groups
+        self.base_margin = np.asarray(base_score[:self.num_groups], dtype=np.float32)
+
+    @staticmethod
+    def _tree_depth(left: List[int], right: List[int]) -> int:
+        depth = 0
+        frontier = [0]
+        while frontier:
+            children = []
+            for node in frontier:
+                if left[node] != -1:
+                    children.extend((left[node], right[node]))
+            if children:
+                depth += 1
+            frontier = children
+        return depth
+
+    @classmethod
+    def load(cls, path: str) -> "CompiledXGBoostClassifier":
+        """Compile the trees of an XGBoost JSON model file."""
+        with open(path, "r") as f:
+            return cls(json.load(f))
+
+    def predict_margin(self, X) -> np.ndarray:
+        """Raw per-class margins, shape [n_rows, num_groups]."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        flat = X.ravel()
+        row_base = (np.arange(X.shape[0], dtype=np.int64) * X.shape[1])[:, None]
+        has_missing = bool(np.isnan(flat).any())
+        pos = np.zeros((X.shape[0], self.num_trees), dtype=np.int64)
+
+        for _ in range(self.max_depth):
+            node = pos + self._internal_offset
+            value = flat.take(row_base + self.feature.take(node))
+            go_right = ~(value < self.threshold.take(node))
+            if has_missing:
+                go_right &= ~(np.isnan(value) & self.default_left.take(node))
+            pos = 2 * pos + 1 + go_right
+
+        return self.leaf_value.take(pos + self._leaf_offset) @ self.tree_group + self.base_margin
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Class probabilities, matching XGBClassifier.predict_proba."""
+        margin = self.predict_margin(X)
+        if self.objective == "binary:logistic":
+            positive = 1.0 / (1.0 + np.exp(-margin[:, 0]))
+            return np.stack([1.0 - positive, positive], axis=1).astype(np.float32)
+        shifted = np.exp(margin - margin.max(axis=1, keepdims=True))
+        return (shifted / shifted.sum(axis=1, keepdims=True)).astype(np.float32)
+
+    def predict(self, X) -> np.ndarray:
+        """Predicted class indices."""
+        return np.argmax(self.predict_proba(X), axis=1)